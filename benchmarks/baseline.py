@@ -0,0 +1,63 @@
+"""Saved baselines for the benchmarks that record one: ``--save``, ``--baseline`` and ``--tolerance``.
+
+A run is printed as JSON. With ``--save`` it becomes the new baseline;
+otherwise it is compared with the saved one and the exit status is 1 on a
+regression beyond ``--tolerance``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+BASELINES = Path(__file__).with_name("baselines")
+
+
+def add_arguments(parser: argparse.ArgumentParser, name: str) -> None:
+    """Add the baseline options; the default baseline is ``baselines/<name>.json``."""
+    parser.add_argument("--baseline", type=Path, default=BASELINES / f"{name}.json")
+    parser.add_argument("--save", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+
+
+def compare(
+    result: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    higher: Sequence[str] = (),
+    lower: Sequence[str] = (),
+) -> List[str]:
+    """Regressions of ``result`` against ``baseline`` larger than ``tolerance`` (a fraction).
+
+    ``higher`` are the metrics where more is better (throughput), ``lower``
+    those where less is (latency, memory).
+    """
+    problems = []
+    for key in higher:
+        if result[key] < baseline[key] * (1 - tolerance):
+            problems.append(f"{key} {result[key]} < baseline {baseline[key]}")
+    for key in lower:
+        if result[key] > baseline[key] * (1 + tolerance):
+            problems.append(f"{key} {result[key]} > baseline {baseline[key]}")
+    return problems
+
+
+def report(
+    result: Dict[str, Any], args: argparse.Namespace, higher: Sequence[str] = (), lower: Sequence[str] = ()
+) -> int:
+    """Print ``result``, then save it or check it against the baseline; return the exit status."""
+    print(json.dumps(result, indent=2))
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    problems = compare(result, baseline, args.tolerance, higher, lower)
+    for problem in problems:
+        print(f"REGRESSION: {problem}", file=sys.stderr)
+    return 1 if problems else 0
@@ -0,0 +1,126 @@
+"""Measure bulk normalization and import throughput against the per-row formatters.
+
+A synthetic legacy list (phones in mixed formats, yes/no and recommendation
+answers in assorted spellings) is normalized twice: row by row with
+``normalize_row`` and column-wise with ``normalize_frame``. The valid rows
+are then journaled through a real ``SurveyStorage`` in a temporary
+directory, in batches. Results are checked to be identical.
+
+Run with ``python -m benchmarks.bench_bulk_import --rows 200000``. Add
+``--save`` to record the result as the baseline, and later runs are compared
+against it (the exit status is 1 on a regression beyond ``--tolerance``).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import platform
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from benchmarks import baseline
+from services.bulk_import import import_rows, normalize_frame, normalize_row, prepare
+from services.dedup import SubmissionIndex
+from services.outbox import Outbox
+from services.replicator import SheetsReplicator
+from services.stats import SurveyStats
+from services.storage import SurveyStorage
+from tests.conftest import NullSheets
+
+HIGHER = ("vectorized_rows_per_second", "import_rows_per_second")
+
+_PHONE_FORMATS = ("+998 {op} {a} {b} {c}", "998{op}{a}{b}{c}", "{op}{a}{b}{c}", "8 ({op}) {a}-{b}-{c}", "({op}) {a} {b} {c}", "n/a")
+_YES_NO = ("Ha", "Yo‘q", "yes", "No", " ha ", "YO'Q", "yoq", "")
+_RECOMMEND = ("Ha", "Albatta", "absolutely", "NO", "yes", "Yo'q", "")
+
+
+def legacy_frame(rows: int, seed: int = 7) -> pd.DataFrame:
+    rng = random.Random(seed)
+    records = []
+    for idx in range(rows):
+        phone = rng.choice(_PHONE_FORMATS).format(
+            op=rng.choice(("90", "91", "93", "97", "99")),
+            a=f"{rng.randrange(1000):03d}",
+            b=f"{rng.randrange(100):02d}",
+            c=f"{rng.randrange(100):02d}",
+        )
+        records.append(
+            {
+                "date": f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+                "time": f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:00",
+                "telegram_user_id": str(2_000_000 + idx),
+                "phone": phone,
+                "first_name": "Alumni",
+                "student_university_id": f"SE{idx:06d}",
+                "is_employed": rng.choice(_YES_NO),
+                "share_with_employer": rng.choice(_YES_NO),
+                "region": rng.choice(("toshkent_shahri", "samarqand", "buxoro")),
+                "uni_rating": str(rng.randrange(1, 6)),
+                "recommend_answer": rng.choice(_RECOMMEND),
+            }
+        )
+    return pd.DataFrame.from_records(records)
+
+
+async def _import(valid: pd.DataFrame, workdir: Path, batch_size: int) -> int:
+    outbox = Outbox(workdir / "outbox.sqlite3")
+    storage = SurveyStorage(
+        outbox=outbox,
+        replicator=SheetsReplicator(outbox, NullSheets()),
+        dedup_index=SubmissionIndex(capacity=len(valid)),
+        dedup_policy="reject",
+        stats=SurveyStats(),
+    )
+    try:
+        return await import_rows(storage, valid, batch_size)
+    finally:
+        outbox.close()
+
+
+def run_bench(rows: int, batch_size: int = 500) -> Dict[str, Any]:
+    frame = legacy_frame(rows)
+    records: List[Dict[str, Any]] = frame.to_dict("records")
+
+    started = time.perf_counter()
+    expected = [normalize_row(record) for record in records]
+    per_row = time.perf_counter() - started
+
+    started = time.perf_counter()
+    normalized = normalize_frame(frame)
+    vectorized = time.perf_counter() - started
+    if normalized.to_numpy().tolist() != expected:
+        raise AssertionError("vectorized normalization differs from the per-row formatters")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        valid, _ = prepare(frame)
+        journaled = asyncio.run(_import(valid, Path(tmp), batch_size))
+        imported = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "per_row_rows_per_second": round(rows / per_row),
+        "vectorized_rows_per_second": round(rows / vectorized),
+        "speedup": round(per_row / vectorized, 2),
+        "import_rows_per_second": round(journaled / imported),
+        "journaled": journaled,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    baseline.add_arguments(parser, "bulk_import")
+    args = parser.parse_args(argv)
+    return baseline.report(run_bench(args.rows, args.batch_size), args, HIGHER)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
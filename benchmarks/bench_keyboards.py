@@ -0,0 +1,52 @@
+"""Compare building keyboard markups per call with the cached shared instances.
+
+Run with ``python -m benchmarks.bench_keyboards``.
+"""
+from __future__ import annotations
+
+import timeit
+
+import keyboards
+from i18n import LANGUAGES, language_choices, t
+
+NUMBER = 2_000
+
+
+def _calls(module_funcs):
+    language_keyboard, contact_keyboard, yes_no_inline, region_keyboard, rating_keyboard, recommendation_keyboard = module_funcs
+
+    def run() -> None:
+        for lang in LANGUAGES:
+            language_keyboard()
+            contact_keyboard(t(lang, "share_contact"))
+            yes_no_inline("employed", t(lang, "button_yes"), t(lang, "button_no"))
+            region_keyboard()
+            rating_keyboard()
+            recommendation_keyboard(t(lang, "button_yes"), t(lang, "button_no"), t(lang, "button_absolutely"))
+
+    return run
+
+
+def main() -> None:
+    funcs = (
+        keyboards.language_keyboard,
+        keyboards.contact_keyboard,
+        keyboards.yes_no_inline,
+        keyboards.region_keyboard,
+        keyboards.rating_keyboard,
+        keyboards.recommendation_keyboard,
+    )
+    uncached = _calls(
+        (lambda: keyboards._language_keyboard.__wrapped__(language_choices()),)
+        + tuple(func.__wrapped__ for func in funcs[1:])
+    )
+    cached = _calls(funcs)
+    calls = NUMBER * len(LANGUAGES) * len(funcs)
+
+    for name, run in (("rebuild per call", uncached), ("cached", cached)):
+        seconds = min(timeit.repeat(run, number=NUMBER, repeat=3))
+        print(f"{name:>17}: {seconds / calls * 1e6:8.2f} µs per markup")
+
+
+if __name__ == "__main__":
+    main()
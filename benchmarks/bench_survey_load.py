@@ -0,0 +1,147 @@
+"""Replay synthetic survey sessions through the real routers and report throughput and latency.
+
+Every simulated user walks the whole ``Reg`` flow (messages and callback
+queries) against a Dispatcher wired like ``main()``, with a fake Bot session,
+a no-op Sheets sink and an in-memory Excel backup. The journal is a real
+SQLite outbox in a temporary directory. Users run concurrently; each one
+waits for its previous update before sending the next. A run in which any
+session ends without its row journaled, or any user gets an error reply,
+fails instead of reporting numbers.
+
+Run with ``python -m benchmarks.bench_survey_load --users 2000``. Add
+``--save`` to record the result as the baseline, and later runs are compared
+against it (the exit status is 1 on a regression beyond ``--tolerance``).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+
+from i18n import languages, t
+from benchmarks import baseline
+from middlewares import ActivityMiddleware, LoggingContextMiddleware
+from services.dedup import SubmissionIndex
+from services.outbox import Outbox
+from services.reminders import SessionScheduler
+from services.replicator import SheetsReplicator
+from services.stats import SurveyStats
+from services.storage import SurveyStorage
+from tests.conftest import FakeSession, NullSheets, make_dispatcher, survey_updates
+
+# Metrics checked against the baseline: more is better, less is better.
+HIGHER = ("updates_per_second",)
+LOWER = ("p50_ms", "p99_ms", "bytes_per_session")
+
+_ERROR_KEYS = ("error_persist", "student_id_lookup_error")
+
+
+class MemoryExcel:
+    def __init__(self) -> None:
+        self.rows: List[Sequence[object]] = []
+
+    async def append(self, row: Sequence[object]) -> None:
+        self.rows.append(row)
+
+
+def _percentile(samples: Sequence[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _replay(users: int, workdir: Path, updates_per_user: Optional[int] = None) -> Dict[str, Any]:
+    storage = MemoryStorage()
+    dp = make_dispatcher(storage)
+    dp.update.outer_middleware(ActivityMiddleware(SessionScheduler(storage, ttl=3600)))
+    dp.update.outer_middleware(LoggingContextMiddleware())
+    session = FakeSession()
+    bot = Bot(token="42:TEST", session=session)
+    outbox = Outbox(workdir / "outbox.sqlite3")
+    replicator = SheetsReplicator(outbox, NullSheets(), batch_size=200, flush_interval=0.5)
+    survey_storage = SurveyStorage(
+        outbox=outbox,
+        replicator=replicator,
+        excel_backup=MemoryExcel(),  # type: ignore[arg-type]
+        dedup_index=SubmissionIndex(capacity=users),
+        dedup_policy="append",
+        stats=SurveyStats(),
+    )
+    sessions = [survey_updates(1_000_000 + idx)[:updates_per_user] for idx in range(users)]
+    latencies: List[float] = []
+
+    async def walk(updates: List[Dict[str, Any]]) -> None:
+        for update in updates:
+            started = time.perf_counter()
+            await dp.feed_raw_update(bot, update, survey_storage=survey_storage)
+            latencies.append(time.perf_counter() - started)
+
+    replicator.start()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(walk(updates) for updates in sessions))
+        elapsed = time.perf_counter() - started
+        journaled = len(await outbox.rows())
+    finally:
+        await replicator.close()
+        outbox.close()
+    error_texts = {t(lang, key) for lang in languages() for key in _ERROR_KEYS}
+    errors = sum(isinstance(method, SendMessage) and method.text in error_texts for method in session.requests)
+    return {"elapsed": elapsed, "latencies": latencies, "storage": storage, "journaled": journaled, "errors": errors}
+
+
+async def _bytes_per_session(users: int, workdir: Path) -> float:
+    """Memory held per user parked halfway through the survey (FSM record plus bookkeeping)."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = await _replay(users, workdir, updates_per_user=7)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    grown = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    assert len(result["storage"].storage) == users
+    return grown / users
+
+
+def run_load(users: int, memory_users: int = 500) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(_replay(users, Path(tmp) / "load"))
+        if result["journaled"] != users or result["errors"]:
+            raise RuntimeError(
+                f"Only {result['journaled']} of {users} sessions were journaled "
+                f"and {result['errors']} user(s) got an error reply; latencies would be meaningless"
+            )
+        per_session = asyncio.run(_bytes_per_session(min(users, memory_users), Path(tmp) / "memory"))
+    latencies = result["latencies"]
+    return {
+        "users": users,
+        "updates": len(latencies),
+        "seconds": round(result["elapsed"], 3),
+        "updates_per_second": round(len(latencies) / result["elapsed"], 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "bytes_per_session": round(per_session),
+        "python": platform.python_version(),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    baseline.add_arguments(parser, "survey_load")
+    args = parser.parse_args(argv)
+    return baseline.report(run_load(args.users), args, HIGHER, LOWER)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
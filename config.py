@@ -3,7 +3,7 @@ from __future__ import annotations
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import FrozenSet, Optional
 
 from dotenv import load_dotenv
 
@@ -15,6 +15,65 @@ class Settings:
     google_sheet_id: str
     google_worksheet_name: Optional[str]
     local_excel_file: Optional[Path]
+    local_excel_compact_interval: float = 300.0
+    parquet_archive_dir: Optional[Path] = None
+    parquet_row_group_size: int = 10_000
+    parquet_flush_interval: float = 300.0
+    sheets_header_cache: Path = Path("data/sheets_header.cache")
+    outbox_file: Path = Path("data/outbox.sqlite3")
+    sheets_batch_size: int = 50
+    sheets_flush_interval: float = 2.0
+    sheets_retry_base: float = 1.0
+    sheets_retry_max: float = 300.0
+    sheets_workers: int = 4
+    sheets_queue: int = 100
+    sheets_timeout: float = 60.0
+    sheets_connect_timeout: float = 5.0
+    sheets_read_timeout: float = 30.0
+    sheets_http_retries: int = 3
+    sheets_token_refresh_margin: float = 300.0
+    file_workers: int = 2
+    file_queue: int = 1000
+    file_timeout: float = 30.0
+    fsm_storage: str = "memory"
+    fsm_sqlite_file: Path = Path("data/fsm.sqlite3")
+    redis_url: Optional[str] = None
+    fsm_ttl: Optional[int] = 7 * 24 * 3600
+    reminder_after: Optional[float] = None
+    roster_file: Optional[Path] = None
+    roster_id_column: Optional[str] = None
+    roster_reload_interval: float = 30.0
+    dedup_policy: str = "reject"
+    dedup_warm_source: str = "journal"
+    dedup_capacity: int = 50_000
+    i18n_catalog_dir: Optional[Path] = None
+    admin_ids: FrozenSet[int] = frozenset()
+    stats_snapshot_file: Path = Path("data/stats.json")
+    stats_snapshot_interval: float = 60.0
+    broadcast_dir: Path = Path("data/broadcasts")
+    broadcast_source: str = "journal"
+    broadcast_rate: float = 20.0
+    broadcast_concurrency: int = 8
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_file: Optional[Path] = None
+    log_debug_sample: float = 0.1
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+    throttle_rate: float = 1.0
+    throttle_burst: float = 5.0
+    telegram_send_rate: float = 30.0
+    telegram_max_retries: int = 3
+    update_concurrency: int = 100
+    shards: int = 0
+    shard_persist_timeout: float = 30.0
+    run_mode: str = "polling"
+    drop_pending_updates: bool = False
+    webhook_url: Optional[str] = None
+    webhook_path: str = "/webhook"
+    webhook_secret: Optional[str] = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
 
 
 def load_config() -> Settings:
@@ -27,6 +86,44 @@ def load_config() -> Settings:
     worksheet_name = os.getenv("GOOGLE_WORKSHEET_NAME")
     local_excel = os.getenv("LOCAL_EXCEL_FILE")
     local_excel_path = Path(local_excel) if local_excel else None
+    parquet_dir = os.getenv("PARQUET_ARCHIVE_DIR")
+
+    roster_file = os.getenv("ROSTER_FILE")
+    catalog_dir = os.getenv("I18N_CATALOG_DIR")
+    dedup_policy = (os.getenv("DEDUP_POLICY") or "reject").lower()
+    if dedup_policy not in ("reject", "overwrite", "append"):
+        raise RuntimeError("Environment variable DEDUP_POLICY must be 'reject', 'overwrite' or 'append'")
+    dedup_warm_source = (os.getenv("DEDUP_WARM_SOURCE") or "journal").lower()
+    if dedup_warm_source not in ("journal", "sheet"):
+        raise RuntimeError("Environment variable DEDUP_WARM_SOURCE must be 'journal' or 'sheet'")
+    broadcast_source = (os.getenv("BROADCAST_SOURCE") or "journal").lower()
+    if broadcast_source not in ("journal", "sheet"):
+        raise RuntimeError("Environment variable BROADCAST_SOURCE must be 'journal' or 'sheet'")
+    log_level = (os.getenv("LOG_LEVEL") or "INFO").upper()
+    if log_level not in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
+        raise RuntimeError("Environment variable LOG_LEVEL must be DEBUG, INFO, WARNING, ERROR or CRITICAL")
+    log_format = (os.getenv("LOG_FORMAT") or "json").lower()
+    if log_format not in ("json", "text"):
+        raise RuntimeError("Environment variable LOG_FORMAT must be 'json' or 'text'")
+    log_file = os.getenv("LOG_FILE")
+    run_mode = (os.getenv("RUN_MODE") or "polling").lower()
+    if run_mode not in ("polling", "webhook"):
+        raise RuntimeError("Environment variable RUN_MODE must be 'polling' or 'webhook'")
+    webhook_url = os.getenv("WEBHOOK_URL")
+    webhook_secret = os.getenv("WEBHOOK_SECRET")
+    sheets_timeout = _float_env("SHEETS_TIMEOUT", 60.0)
+    sheets_connect_timeout = _float_env("SHEETS_CONNECT_TIMEOUT", 5.0)
+    sheets_read_timeout = _float_env("SHEETS_READ_TIMEOUT", 30.0)
+    if sheets_timeout and sheets_timeout < sheets_connect_timeout + sheets_read_timeout:
+        raise RuntimeError(
+            "Environment variable SHEETS_TIMEOUT must be at least SHEETS_CONNECT_TIMEOUT + SHEETS_READ_TIMEOUT (or 0)"
+        )
+    shards = _int_env("SHARDS", 0)
+    if shards > 1 and run_mode != "polling":
+        raise RuntimeError("Environment variable SHARDS requires RUN_MODE=polling")
+    if run_mode == "webhook":
+        webhook_url = _require_env("WEBHOOK_URL")
+        webhook_secret = _require_env("WEBHOOK_SECRET")
 
     return Settings(
         bot_token=bot_token,
@@ -34,6 +131,65 @@ def load_config() -> Settings:
         google_sheet_id=sheet_id,
         google_worksheet_name=worksheet_name,
         local_excel_file=local_excel_path.expanduser() if local_excel_path else None,
+        local_excel_compact_interval=_float_env("LOCAL_EXCEL_COMPACT_INTERVAL", 300.0),
+        parquet_archive_dir=Path(parquet_dir).expanduser() if parquet_dir else None,
+        parquet_row_group_size=_int_env("PARQUET_ROW_GROUP_SIZE", 10_000),
+        parquet_flush_interval=_float_env("PARQUET_FLUSH_INTERVAL", 300.0),
+        sheets_header_cache=Path(os.getenv("SHEETS_HEADER_CACHE") or "data/sheets_header.cache").expanduser(),
+        outbox_file=Path(os.getenv("OUTBOX_FILE") or "data/outbox.sqlite3").expanduser(),
+        sheets_batch_size=_int_env("SHEETS_BATCH_SIZE", 50),
+        sheets_flush_interval=_float_env("SHEETS_FLUSH_INTERVAL", 2.0),
+        sheets_retry_base=_float_env("SHEETS_RETRY_BASE", 1.0),
+        sheets_retry_max=_float_env("SHEETS_RETRY_MAX", 300.0),
+        sheets_workers=_int_env("SHEETS_WORKERS", 4),
+        sheets_queue=_int_env("SHEETS_QUEUE", 100),
+        sheets_timeout=sheets_timeout,
+        sheets_connect_timeout=sheets_connect_timeout,
+        sheets_read_timeout=sheets_read_timeout,
+        sheets_http_retries=_int_env("SHEETS_HTTP_RETRIES", 3),
+        sheets_token_refresh_margin=_float_env("SHEETS_TOKEN_REFRESH_MARGIN", 300.0),
+        file_workers=_int_env("FILE_WORKERS", 2),
+        file_queue=_int_env("FILE_QUEUE", 1000),
+        file_timeout=_float_env("FILE_TIMEOUT", 30.0),
+        fsm_storage=(os.getenv("FSM_STORAGE") or "memory").lower(),
+        fsm_sqlite_file=Path(os.getenv("FSM_SQLITE_FILE") or "data/fsm.sqlite3").expanduser(),
+        redis_url=os.getenv("REDIS_URL") or None,
+        fsm_ttl=_int_env("FSM_TTL", 7 * 24 * 3600) or None,
+        reminder_after=_float_env("REMINDER_AFTER", 0.0) or None,
+        roster_file=Path(roster_file).expanduser() if roster_file else None,
+        roster_id_column=os.getenv("ROSTER_ID_COLUMN") or None,
+        roster_reload_interval=_float_env("ROSTER_RELOAD_INTERVAL", 30.0),
+        dedup_policy=dedup_policy,
+        dedup_warm_source=dedup_warm_source,
+        dedup_capacity=_int_env("DEDUP_CAPACITY", 50_000),
+        i18n_catalog_dir=Path(catalog_dir).expanduser() if catalog_dir else None,
+        admin_ids=_int_set_env("ADMIN_IDS"),
+        stats_snapshot_file=Path(os.getenv("STATS_SNAPSHOT_FILE") or "data/stats.json").expanduser(),
+        stats_snapshot_interval=_float_env("STATS_SNAPSHOT_INTERVAL", 60.0),
+        broadcast_dir=Path(os.getenv("BROADCAST_DIR") or "data/broadcasts").expanduser(),
+        broadcast_source=broadcast_source,
+        broadcast_rate=_float_env("BROADCAST_RATE", 20.0),
+        broadcast_concurrency=_int_env("BROADCAST_CONCURRENCY", 8),
+        log_level=log_level,
+        log_format=log_format,
+        log_file=Path(log_file).expanduser() if log_file else None,
+        log_debug_sample=_float_env("LOG_DEBUG_SAMPLE", 0.1),
+        metrics_host=os.getenv("METRICS_HOST") or "127.0.0.1",
+        metrics_port=_int_env("METRICS_PORT", 0),
+        throttle_rate=_float_env("THROTTLE_RATE", 1.0),
+        throttle_burst=_float_env("THROTTLE_BURST", 5.0),
+        telegram_send_rate=_float_env("TELEGRAM_SEND_RATE", 30.0),
+        telegram_max_retries=_int_env("TELEGRAM_MAX_RETRIES", 3),
+        update_concurrency=_int_env("UPDATE_CONCURRENCY", 100),
+        shards=shards,
+        shard_persist_timeout=_float_env("SHARD_PERSIST_TIMEOUT", 30.0),
+        run_mode=run_mode,
+        drop_pending_updates=_bool_env("DROP_PENDING_UPDATES", False),
+        webhook_url=webhook_url.rstrip("/") if webhook_url else None,
+        webhook_path=os.getenv("WEBHOOK_PATH") or "/webhook",
+        webhook_secret=webhook_secret,
+        webhook_host=os.getenv("WEBHOOK_HOST") or "0.0.0.0",
+        webhook_port=_int_env("WEBHOOK_PORT", 8080),
     )
 
 
@@ -42,3 +198,40 @@ def _require_env(key: str) -> str:
     if not value:
         raise RuntimeError(f"Environment variable {key} is required")
     return value
+
+
+def _int_env(key: str, default: int) -> int:
+    value = os.getenv(key)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise RuntimeError(f"Environment variable {key} must be an integer") from exc
+
+
+def _float_env(key: str, default: float) -> float:
+    value = os.getenv(key)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise RuntimeError(f"Environment variable {key} must be a number") from exc
+
+
+def _bool_env(key: str, default: bool) -> bool:
+    value = os.getenv(key)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _int_set_env(key: str) -> FrozenSet[int]:
+    value = os.getenv(key)
+    if not value:
+        return frozenset()
+    try:
+        return frozenset(int(item) for item in value.replace(";", ",").split(",") if item.strip())
+    except ValueError as exc:
+        raise RuntimeError(f"Environment variable {key} must be a comma-separated list of integers") from exc
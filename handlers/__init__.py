@@ -1,4 +1,5 @@
+from .admin import router as admin_router
 from .start import router as start_router
 from .survey import router as survey_router
 
-__all__ = ["start_router", "survey_router"]
+__all__ = ["admin_router", "start_router", "survey_router"]
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from typing import FrozenSet, Optional
+
+from aiogram import Bot, Router
+from aiogram.filters import Command, CommandObject, Filter
+from aiogram.types import BufferedInputFile, Message
+
+from services.analytics import SurveyReport, build_report, iter_journal_rows
+from services.broadcast import Broadcaster
+from services.reminders import SessionScheduler
+from services.storage import SurveyStorage
+
+
+class AdminFilter(Filter):
+    """Passes only for users listed in ``ADMIN_IDS``."""
+
+    async def __call__(self, message: Message, admin_ids: FrozenSet[int] = frozenset()) -> bool:
+        return message.from_user is not None and message.from_user.id in admin_ids
+
+
+router = Router(name="admin")
+router.message.filter(AdminFilter())
+
+
+@router.message(Command("export"))
+async def handle_export(message: Message, survey_storage: SurveyStorage) -> None:
+    # The journal is streamed in chunks in a worker thread, so polling keeps running.
+    report = await asyncio.to_thread(lambda: build_report(iter_journal_rows(survey_storage.journal_path)).to_csv())
+    filename = f"survey-report-{datetime.utcnow():%Y%m%d-%H%M%S}.csv"
+    await message.answer_document(BufferedInputFile(report.encode("utf-8"), filename=filename))
+
+
+def format_stats(report: SurveyReport, scheduler: Optional[SessionScheduler] = None) -> str:
+    rate = report.employment_rate
+    lines = [
+        f"Responses: {report.total}",
+        f"Employed: {rate:.0%}" if rate is not None else "Employed: -",
+        "Ratings: " + ", ".join(f"{key}★ {report.ratings[key]}" for key in sorted(report.ratings)),
+        "Recommend: " + ", ".join(f"{key} {count}" for key, count in report.recommendations.most_common()),
+        "Languages: " + ", ".join(f"{key} {count}" for key, count in report.languages.most_common()),
+        "",
+        "Regions:",
+    ]
+    means = report.mean_rating_by_region()
+    for region, count in report.regions.most_common():
+        mean = f" (avg {means[region]:.1f})" if region in means else ""
+        lines.append(f"{region}: {count}{mean}")
+    if scheduler is not None:
+        lines += ["", f"In progress: {len(scheduler)}", "Abandoned:"]
+        lines += [f"{state}: {count}" for state, count in scheduler.abandoned.most_common()]
+    return "\n".join(lines)
+
+
+@router.message(Command("stats"))
+async def handle_stats(
+    message: Message,
+    survey_storage: SurveyStorage,
+    session_scheduler: Optional[SessionScheduler] = None,
+) -> None:
+    if survey_storage.stats is None:
+        await message.answer("Stats are not enabled.")
+        return
+    await message.answer(format_stats(survey_storage.stats.report, session_scheduler))
+
+
+@router.message(Command("broadcast"))
+async def handle_broadcast(message: Message, command: CommandObject, bot: Bot, broadcaster: Broadcaster) -> None:
+    text = (command.args or "").strip()
+    if not text:
+        await message.answer("Usage: /broadcast <text>")
+        return
+    progress = broadcaster.create(text, notify_chat_id=message.chat.id)
+    broadcaster.start(bot, progress)
+    await message.answer(f"Broadcast {progress.broadcast_id} started.")
+
+
+@router.message(Command("broadcasts"))
+async def handle_broadcasts(message: Message, broadcaster: Broadcaster) -> None:
+    lines = [progress.summary() for progress in broadcaster.status()[-10:]]
+    await message.answer("\n".join(lines) or "No broadcasts yet.")
@@ -5,11 +5,12 @@ from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
-from i18n import LANGUAGES, t
-from keyboards import LANGUAGE_LABEL_TO_CODE, contact_keyboard, language_keyboard
+from i18n import Translator, resolve_language, t, translator
+from keyboards import contact_keyboard, language_keyboard
+from services.storage import SurveyStorage
 from states import Reg
 
-router = Router()
+router = Router(name="start")
 
 
 def _resolve_language(value: str | None) -> str | None:
@@ -18,17 +19,15 @@ def _resolve_language(value: str | None) -> str | None:
     value = value.strip()
     if not value:
         return None
-    if value in LANGUAGE_LABEL_TO_CODE:
-        return LANGUAGE_LABEL_TO_CODE[value]
-    normalized = value.lower()
-    if normalized in LANGUAGES:
-        return normalized
-    return None
+    return resolve_language(value)
 
 
 @router.message(CommandStart())
-async def handle_start(message: Message, state: FSMContext) -> None:
+async def handle_start(message: Message, state: FSMContext, tr: Translator, survey_storage: SurveyStorage) -> None:
     await state.clear()
+    if survey_storage.rejects(message.from_user.id):
+        await message.answer(tr("already_submitted"))
+        return
     await message.answer(t("uz", "start_choose_language"), reply_markup=language_keyboard())
     await state.set_state(Reg.language)
 
@@ -41,9 +40,10 @@ async def handle_language_choice(message: Message, state: FSMContext) -> None:
         return
 
     await state.update_data(language=language)
+    tr = translator(language)
     await message.answer(
-        t(language, "ask_contact"),
-        reply_markup=contact_keyboard(t(language, "share_contact")),
+        tr("ask_contact"),
+        reply_markup=contact_keyboard(tr("share_contact")),
     )
     await state.set_state(Reg.contact)
 
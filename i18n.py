@@ -1,8 +1,18 @@
 from __future__ import annotations
 
-from typing import Dict
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
 
 LANGUAGES = ("uz", "ru", "en")
+BASE_LANGUAGE = "uz"
+
+LANGUAGE_LABELS: Dict[str, str] = {
+    "uz": "🇺🇿 O‘zbek",
+    "ru": "🇷🇺 Русский",
+    "en": "🇬🇧 English",
+}
 
 TRANSLATIONS: Dict[str, Dict[str, str]] = {
     "uz": {
@@ -31,6 +41,8 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "invalid_rating": "Bahoni faqat 1 dan 5 gacha tanlang.",
         "student_id_not_found": "Bunday Student ID topilmadi. ID raqamingizni tekshirib, qayta kiriting.",
         "student_id_lookup_error": "Student ID tekshirishda xatolik yuz berdi. Keyinroq urinib ko'ring.",
+        "already_submitted": "Siz so‘rovnomada allaqachon qatnashgansiz. Rahmat!",
+        "reminder": "So‘rovnoma hali tugamadi. Davom ettirish uchun oxirgi savolga javob bering.",
     },
     "ru": {
         "start_choose_language": "Выберите язык",
@@ -58,6 +70,8 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "invalid_rating": "Укажите оценку от 1 до 5.",
         "student_id_not_found": "Такой Student ID не найден. Проверьте и введите еще раз.",
         "student_id_lookup_error": "Ошибка при проверке Student ID. Попробуйте позже.",
+        "already_submitted": "Вы уже прошли этот опрос. Спасибо!",
+        "reminder": "Опрос ещё не завершён. Ответьте на последний вопрос, чтобы продолжить.",
     },
     "en": {
         "start_choose_language": "Choose a language",
@@ -85,10 +99,110 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "invalid_rating": "Please choose a rating between 1 and 5.",
         "student_id_not_found": "We couldn't find this Student ID. Please double-check and enter again.",
         "student_id_lookup_error": "Something went wrong while checking the Student ID. Please try again later.",
+        "already_submitted": "You have already completed this survey. Thank you!",
+        "reminder": "You haven't finished the survey yet. Answer the last question to continue.",
     },
 }
 
 
+class CatalogError(ValueError):
+    """A translation catalog is missing keys or is malformed."""
+
+
+class Translator:
+    """Translation lookup bound to one language's compiled table."""
+
+    __slots__ = ("language", "_table")
+
+    def __init__(self, language: str, table: Dict[str, str]) -> None:
+        self.language = language
+        self._table = table
+
+    def __call__(self, key: str) -> str:
+        return self._table.get(key, key)
+
+
+def compile_catalog(translations: Mapping[str, Mapping[str, str]], base: str = BASE_LANGUAGE) -> Dict[str, Dict[str, str]]:
+    """Validate ``translations`` against the ``base`` language and return flat, interned tables.
+
+    Every language must define exactly the keys of the base language; the
+    first problem found raises :class:`CatalogError`.
+    """
+    if base not in translations:
+        raise CatalogError(f"Base language {base!r} is missing from the catalog")
+    expected = set(translations[base])
+    compiled: Dict[str, Dict[str, str]] = {}
+    for lang, strings in translations.items():
+        missing = expected - set(strings)
+        if missing:
+            raise CatalogError(f"Language {lang!r} is missing keys: {', '.join(sorted(missing))}")
+        unknown = set(strings) - expected
+        if unknown:
+            raise CatalogError(f"Language {lang!r} has keys unknown to {base!r}: {', '.join(sorted(unknown))}")
+        compiled[lang] = {sys.intern(key): sys.intern(str(strings[key])) for key in translations[base]}
+    return compiled
+
+
+def load_catalogs(directory: Path) -> Tuple[str, ...]:
+    """Add languages from ``<code>.json`` files in ``directory`` and recompile; return the new codes.
+
+    Each file holds ``{"label": "<button label>", "strings": {key: text}}``.
+    """
+    translations: Dict[str, Mapping[str, str]] = dict(TRANSLATIONS)
+    labels = dict(LANGUAGE_LABELS)
+    added = []
+    for path in sorted(directory.glob("*.json")):
+        code = path.stem.lower()
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            strings, label = payload["strings"], payload["label"]
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            raise CatalogError(f"Cannot read catalog {path}: {exc}") from exc
+        translations[code] = strings
+        labels[code] = str(label)
+        added.append(code)
+    _install(compile_catalog(translations), labels)
+    return tuple(added)
+
+
+def _install(catalog: Dict[str, Dict[str, str]], labels: Dict[str, str]) -> None:
+    global _CATALOG, _BASE_TABLE, _LABELS, _LABEL_TO_CODE
+    _CATALOG = catalog
+    _BASE_TABLE = catalog[BASE_LANGUAGE]
+    _LABELS = labels
+    _LABEL_TO_CODE = {label: code for code, label in labels.items()}
+
+
+def languages() -> Tuple[str, ...]:
+    return tuple(_CATALOG)
+
+
+def language_choices() -> Tuple[Tuple[str, str], ...]:
+    """``(button label, code)`` pairs for every loaded language."""
+    return tuple((_LABELS.get(code, code), code) for code in _CATALOG)
+
+
+def resolve_language(value: str) -> Optional[str]:
+    """Map a language button label or code to a loaded language code."""
+    if value in _LABEL_TO_CODE:
+        return _LABEL_TO_CODE[value]
+    normalized = value.lower()
+    return normalized if normalized in _CATALOG else None
+
+
+def translator(lang: str) -> Translator:
+    table = _CATALOG.get(lang)
+    if table is None:
+        return Translator(BASE_LANGUAGE, _BASE_TABLE)
+    return Translator(lang, table)
+
+
 def t(lang: str, key: str) -> str:
-    base_lang = lang if lang in TRANSLATIONS else "uz"
-    return TRANSLATIONS[base_lang].get(key, TRANSLATIONS["uz"].get(key, key))
+    return _CATALOG.get(lang, _BASE_TABLE).get(key, key)
+
+
+_CATALOG: Dict[str, Dict[str, str]] = {}
+_BASE_TABLE: Dict[str, str] = {}
+_LABELS: Dict[str, str] = {}
+_LABEL_TO_CODE: Dict[str, str] = {}
+_install(compile_catalog(TRANSLATIONS), dict(LANGUAGE_LABELS))
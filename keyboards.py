@@ -1,40 +1,80 @@
 from __future__ import annotations
 
-from typing import Dict, Tuple
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
-from aiogram.types import InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from pydantic import ConfigDict, field_serializer
 
+from i18n import language_choices
 
-LANGUAGE_CHOICES: Tuple[Tuple[str, str], ...] = (
-    ("🇺🇿 O‘zbek", "uz"),
-    ("🇷🇺 Русский", "ru"),
-    ("🇬🇧 English", "en"),
-)
+
+# Markups depend only on their labels, so each is built once and shared between
+# handlers. The frozen subclasses keep rows as tuples of frozen buttons, so no
+# handler can change a shared copy; rows are sent to Telegram as plain lists.
+class FrozenInlineKeyboardButton(InlineKeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenKeyboardButton(KeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+    inline_keyboard: Tuple[Tuple[FrozenInlineKeyboardButton, ...], ...]  # type: ignore[assignment]
+
+    @field_serializer("inline_keyboard")
+    def _rows_as_lists(self, rows: Tuple[Tuple[FrozenInlineKeyboardButton, ...], ...]) -> List[List[InlineKeyboardButton]]:
+        return [list(row) for row in rows]
 
 
-LANGUAGE_LABEL_TO_CODE: Dict[str, str] = {label: code for label, code in LANGUAGE_CHOICES}
+class FrozenReplyKeyboardMarkup(ReplyKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+    keyboard: Tuple[Tuple[FrozenKeyboardButton, ...], ...]  # type: ignore[assignment]
+
+    @field_serializer("keyboard")
+    def _rows_as_lists(self, rows: Tuple[Tuple[FrozenKeyboardButton, ...], ...]) -> List[List[KeyboardButton]]:
+        return [list(row) for row in rows]
+
+
+def _freeze(markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    rows = tuple(
+        tuple(FrozenInlineKeyboardButton(**button.model_dump(exclude_none=True)) for button in row)
+        for row in markup.inline_keyboard
+    )
+    return FrozenInlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def language_keyboard() -> ReplyKeyboardMarkup:
-    buttons = [KeyboardButton(text=label) for label, _ in LANGUAGE_CHOICES]
-    return ReplyKeyboardMarkup(keyboard=[buttons], resize_keyboard=True, one_time_keyboard=True)
+    return _language_keyboard(language_choices())
+
+
+@lru_cache(maxsize=8)
+def _language_keyboard(choices: Tuple[Tuple[str, str], ...]) -> ReplyKeyboardMarkup:
+    buttons = tuple(FrozenKeyboardButton(text=label) for label, _ in choices)
+    return FrozenReplyKeyboardMarkup(keyboard=(buttons,), resize_keyboard=True, one_time_keyboard=True)
 
 
+@lru_cache(maxsize=32)
 def contact_keyboard(label: str) -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=label, request_contact=True)]],
+    return FrozenReplyKeyboardMarkup(
+        keyboard=((FrozenKeyboardButton(text=label, request_contact=True),),),
         resize_keyboard=True,
         one_time_keyboard=True,
     )
 
 
+@lru_cache(maxsize=64)
 def yes_no_inline(prefix: str, yes_label: str, no_label: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text=yes_label, callback_data=f"{prefix}:yes")
     builder.button(text=no_label, callback_data=f"{prefix}:no")
     builder.adjust(2)
-    return builder.as_markup()
+    return _freeze(builder.as_markup())
 
 
 REGION_CHOICES: Tuple[Tuple[str, str], ...] = (
@@ -59,26 +99,29 @@ REGION_CHOICES: Tuple[Tuple[str, str], ...] = (
 REGION_SLUG_TO_LABEL: Dict[str, str] = {slug: label for label, slug in REGION_CHOICES}
 
 
+@lru_cache(maxsize=None)
 def region_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for label, slug in REGION_CHOICES:
         builder.button(text=label, callback_data=f"region:{slug}")
     builder.adjust(2, 3)
-    return builder.as_markup()
+    return _freeze(builder.as_markup())
 
 
+@lru_cache(maxsize=None)
 def rating_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for rating in range(1, 6):
         builder.button(text=str(rating), callback_data=f"rating:{rating}")
     builder.adjust(5)
-    return builder.as_markup()
+    return _freeze(builder.as_markup())
 
 
+@lru_cache(maxsize=32)
 def recommendation_keyboard(yes_label: str, no_label: str, absolutely_label: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text=yes_label, callback_data="recommend:yes")
     builder.button(text=no_label, callback_data="recommend:no")
     builder.button(text=absolutely_label, callback_data="recommend:absolutely")
     builder.adjust(3)
-    return builder.as_markup()
+    return _freeze(builder.as_markup())
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional
+
+from config import Settings
+
+update_id_var: ContextVar[Optional[int]] = ContextVar("update_id", default=None)
+user_id_var: ContextVar[Optional[int]] = ContextVar("user_id", default=None)
+state_var: ContextVar[Optional[str]] = ContextVar("fsm_state", default=None)
+
+CONTEXT_FIELDS = ("update_id", "user_id", "fsm_state", "elapsed_ms")
+
+_TRACEBACKS = logging.Formatter()
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current update context onto the record before it leaves the event loop thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "update_id", None) is None:
+            record.update_id = update_id_var.get()
+        if getattr(record, "user_id", None) is None:
+            record.user_id = user_id_var.get()
+        if getattr(record, "fsm_state", None) is None:
+            record.fsm_state = state_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a ``rate`` fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float, rng: Callable[[], float] = random.random) -> None:
+        super().__init__()
+        self._rate = rate
+        self._rng = rng
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self._rate >= 1:
+            return True
+        return self._rate > 0 and self._rng() < self._rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the update context fields when they are set."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                payload[name] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _LoopQueueHandler(QueueHandler):
+    """Like :class:`QueueHandler`, but keeps the traceback apart from the message for :class:`JsonFormatter`."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info:
+            # Traceback objects cannot be formatted later on another thread; render them now.
+            record.exc_text = _TRACEBACKS.formatException(record.exc_info)
+        record.message = record.getMessage()
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+def setup_logging(settings: Settings, stream: Optional[IO[str]] = None) -> QueueListener:
+    """Route every log record through a queue to a listener thread that does the actual I/O.
+
+    Returns the started listener; call ``stop()`` on it at shutdown to flush.
+    """
+    handlers: List[logging.Handler] = [logging.StreamHandler(stream or sys.stderr)]
+    if settings.log_file:
+        Path(settings.log_file).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.FileHandler(settings.log_file, encoding="utf-8"))
+    if settings.log_format == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _LoopQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.log_debug_sample))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.log_level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
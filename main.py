@@ -1,45 +1,420 @@
 from __future__ import annotations
 
 import asyncio
+import dataclasses
 import logging
+import signal
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.exceptions import TelegramUnauthorizedError
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import load_config
-from handlers import start_router, survey_router
-from services.google_sheets import GoogleSheetsClient
+from config import Settings, load_config
+from handlers import admin_router, start_router, survey_router
+from i18n import load_catalogs
+from logging_config import setup_logging
+from middlewares import (
+    ActivityMiddleware,
+    FSMCacheMiddleware,
+    HandlerMetricsMiddleware,
+    LoggingContextMiddleware,
+    OutboundRateLimiter,
+    StaleCallbackMiddleware,
+    TelegramMetricsMiddleware,
+    ThrottlingMiddleware,
+)
+from services.broadcast import Broadcaster, journal_recipients, sheet_recipients
+from services.dedup import SubmissionIndex
+from services.excel_backup import ExcelBackup
+from services.executors import BoundedExecutor
+from services.fsm_storage import KeyedEventIsolation, build_fsm_storage
+from services.google_sheets import HEADERS, GoogleSheetsClient
+from services.metrics import start_metrics_server
+from services.outbox import Outbox
+from services.roster import StudentRoster
+from services.reminders import SessionScheduler
+from services.replicator import SheetsReplicator
+from services.sharding import RemoteSurveyStorage, ShardChannel, ShardPool, polling_updates, serve_shard
+from services.sheets_http import SheetsHTTPOptions
+from services.stats import SurveyStats
 from services.storage import SurveyStorage
+from states import CALLBACK_STATES
+from webhook import run_webhook
 
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:  # pyarrow is optional
+    from services.parquet_archive import ParquetArchive
 
+Serve = Callable[[Bot, Dict[str, Any]], Awaitable[None]]
 
-async def main() -> None:
-    config = load_config()
 
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+async def _warm_dedup_index(index: SubmissionIndex, rows: Awaitable[List[List[str]]]) -> None:
+    try:
+        logging.info("Dedup index warmed with %d submission(s)", index.warm(await rows))
+    except Exception as exc:
+        logging.error("Failed to warm the dedup index: %s", exc)
+
 
-    sheets_client = GoogleSheetsClient(
-        service_account_file=config.google_service_account_file,
-        sheet_id=config.google_sheet_id,
-        worksheet_name=config.google_worksheet_name,
+def build_dispatcher(config: Settings, storage: BaseStorage) -> Tuple[Dispatcher, SessionScheduler]:
+    # Updates run as concurrent tasks; the per-user lock keeps each user's updates in order.
+    dp = Dispatcher(storage=storage, events_isolation=KeyedEventIsolation(), disable_fsm=True)
+    session_scheduler = SessionScheduler(
+        storage,
+        remind_after=config.reminder_after,
+        ttl=config.fsm_ttl,
+        events_isolation=dp.fsm.events_isolation,
     )
-    survey_storage = SurveyStorage(sheets_client=sheets_client, local_excel_file=config.local_excel_file)
+    # Throttle and drop stale button presses before the FSM middleware, so neither touches storage.
+    dp.update.outer_middleware(ThrottlingMiddleware(rate=config.throttle_rate, burst=config.throttle_burst))
+    dp.update.outer_middleware(StaleCallbackMiddleware(session_scheduler, CALLBACK_STATES))
+    FSMCacheMiddleware.setup(dp)
+    dp.update.outer_middleware(ActivityMiddleware(session_scheduler))
+    dp.update.outer_middleware(LoggingContextMiddleware())
+    HandlerMetricsMiddleware.setup(dp)
 
+    # Admin commands go first so they work even while the admin is mid-survey.
+    dp.include_router(admin_router)
     dp.include_router(start_router)
     dp.include_router(survey_router)
+    return dp, session_scheduler
+
+
+def sheets_http_options(config: Settings) -> SheetsHTTPOptions:
+    return SheetsHTTPOptions(
+        pool_size=config.sheets_workers,
+        connect_timeout=config.sheets_connect_timeout,
+        read_timeout=config.sheets_read_timeout,
+        max_retries=config.sheets_http_retries,
+        deadline=config.sheets_timeout or None,
+        token_refresh_margin=config.sheets_token_refresh_margin,
+    )
+
+
+def open_parquet_archive(config: Settings, executor: BoundedExecutor) -> "ParquetArchive":
+    try:
+        from services.parquet_archive import ParquetArchive
+    except ImportError as exc:
+        raise RuntimeError("PARQUET_ARCHIVE_DIR requires the 'pyarrow' package (pip install .[parquet])") from exc
+    return ParquetArchive(
+        config.parquet_archive_dir,  # type: ignore[arg-type]
+        row_group_size=config.parquet_row_group_size,
+        flush_interval=config.parquet_flush_interval,
+        executor=executor,
+    )
+
+
+@asynccontextmanager
+async def open_survey_storage(
+    config: Settings, warm_in_background: bool = True
+) -> AsyncIterator[Tuple[SurveyStorage, GoogleSheetsClient]]:
+    """The journal, Sheets replication, Excel backup, dedup index and stats, started and closed together.
 
+    Everything is closed in reverse order of opening, each step even if an
+    earlier one raised; a close error is raised after the remaining steps ran.
+    """
+    async with AsyncExitStack() as stack:
+        # Separate pools: a stalled Google API must not hold up journal and backup writes.
+        # No pool timeout for Sheets: SHEETS_TIMEOUT bounds each request, retries included, in
+        # the HTTP client. Abandoning a call that is still running would let the replicator
+        # send the same batch again while the first append may yet land.
+        sheets_executor = BoundedExecutor("sheets", config.sheets_workers, config.sheets_queue)
+        stack.callback(sheets_executor.shutdown, wait=False)
+        file_executor = BoundedExecutor("files", config.file_workers, config.file_queue, config.file_timeout)
+        stack.callback(file_executor.shutdown)
+        # One writer (SQLite serializes them anyway) and no timeout: a journal write
+        # that timed out would still commit after the user was told it failed.
+        journal_executor = BoundedExecutor("journal", 1, config.file_queue, blocking=True)
+        stack.callback(journal_executor.shutdown)
+        # Two workers, so an append never queues behind a compaction rewriting the workbook.
+        excel_executor = BoundedExecutor("excel", 2, config.file_queue, config.file_timeout)
+        stack.callback(excel_executor.shutdown)
+        sheets_client = GoogleSheetsClient.create(
+            service_account_file=config.google_service_account_file,
+            sheet_id=config.google_sheet_id,
+            worksheet_name=config.google_worksheet_name,
+            header_cache_file=config.sheets_header_cache,
+            executor=sheets_executor,
+            http_options=sheets_http_options(config),
+        )
+        stack.push_async_callback(sheets_client.close)
+        outbox = Outbox(config.outbox_file, journal_executor)
+        stack.callback(outbox.close)
+        replicator = SheetsReplicator(
+            outbox,
+            sheets_client,
+            batch_size=config.sheets_batch_size,
+            flush_interval=config.sheets_flush_interval,
+            retry_base=config.sheets_retry_base,
+            retry_max=config.sheets_retry_max,
+        )
+        excel_backup = (
+            ExcelBackup(
+                config.local_excel_file,
+                HEADERS,
+                compact_interval=config.local_excel_compact_interval,
+                executor=excel_executor,
+            )
+            if config.local_excel_file
+            else None
+        )
+        archive = open_parquet_archive(config, file_executor) if config.parquet_archive_dir else None
+        dedup_index = SubmissionIndex(capacity=config.dedup_capacity)
+        warm_task: Optional[asyncio.Task[None]] = None
+        if config.dedup_warm_source == "journal":
+            await _warm_dedup_index(dedup_index, outbox.rows())
+        elif warm_in_background:
+            # Reading the sheet waits for the Google connection; do not hold up startup for it.
+            warm_task = asyncio.create_task(_warm_dedup_index(dedup_index, sheets_client.get_rows()))
+        else:
+            await _warm_dedup_index(dedup_index, sheets_client.get_rows())
+        stats = SurveyStats(config.stats_snapshot_file, config.stats_snapshot_interval)
+        logging.info("Survey stats caught up with %d journal row(s)", await asyncio.to_thread(stats.load, outbox.path))
+        survey_storage = SurveyStorage(
+            outbox=outbox,
+            replicator=replicator,
+            excel_backup=excel_backup,
+            dedup_index=dedup_index,
+            dedup_policy=config.dedup_policy,
+            stats=stats,
+            archive=archive,
+        )
+
+        if archive:
+            archive.start()
+            stack.push_async_callback(archive.close)
+        if excel_backup:
+            excel_backup.start()
+            stack.push_async_callback(excel_backup.close)
+        stats.start()
+        stack.push_async_callback(stats.close)
+        replicator.start()
+        # Closed before the journal: its final drain still reads and updates it.
+        stack.push_async_callback(replicator.close)
+        if warm_task:
+            stack.callback(warm_task.cancel)
+        yield survey_storage, sheets_client
+
+
+async def run_bot(
+    config: Settings,
+    session_scheduler: SessionScheduler,
+    survey_storage: Any,
+    sheets_client: GoogleSheetsClient,
+    serve: Serve,
+    resume_broadcasts: bool = True,
+) -> None:
+    """Open the Bot and run ``serve`` with the handlers' workflow data until it returns."""
+    student_roster = (
+        StudentRoster(config.roster_file, config.roster_id_column, config.roster_reload_interval)
+        if config.roster_file
+        else None
+    )
+    broadcaster = Broadcaster(
+        config.broadcast_dir,
+        (lambda: sheet_recipients(sheets_client))
+        if config.broadcast_source == "sheet"
+        else (lambda: journal_recipients(survey_storage.journal_path)),
+        rate=config.broadcast_rate,
+        concurrency=config.broadcast_concurrency,
+    )
+    workflow_data = {
+        "survey_storage": survey_storage,
+        "student_roster": student_roster,
+        "admin_ids": config.admin_ids,
+        "session_scheduler": session_scheduler,
+        "broadcaster": broadcaster,
+    }
+
+    if student_roster:
+        await student_roster.start()
     try:
         async with Bot(token=config.bot_token) as bot:
-            await bot.delete_webhook(drop_pending_updates=True)
-            await dp.start_polling(bot, survey_storage=survey_storage)
+            bot.session.middleware(
+                OutboundRateLimiter(rate=config.telegram_send_rate, max_retries=config.telegram_max_retries)
+            )
+            # Registered after the limiter, so it measures the API call and not the wait for a token.
+            bot.session.middleware(TelegramMetricsMiddleware())
+            session_scheduler.start(bot)
+            if resume_broadcasts:
+                broadcaster.resume(bot)
+            try:
+                await serve(bot, workflow_data)
+            finally:
+                # Stop senders while the bot session is still open, so nothing is miscounted as failed.
+                await session_scheduler.close()
+                await broadcaster.close()
     except TelegramUnauthorizedError:
         logging.error(
             "Telegram returned Unauthorized. Please double-check TELEGRAM_BOT_TOKEN is correct and not revoked."
         )
+    finally:
+        if student_roster:
+            await student_roster.close()
+
+
+async def run_single(config: Settings) -> None:
+    dp, session_scheduler = build_dispatcher(config, build_fsm_storage(config))
+
+    async def serve(bot: Bot, workflow_data: Dict[str, Any]) -> None:
+        if config.run_mode == "webhook":
+            await run_webhook(dp, bot, config, **workflow_data)
+        else:
+            await bot.delete_webhook(drop_pending_updates=config.drop_pending_updates)
+            await dp.start_polling(bot, tasks_concurrency_limit=config.update_concurrency, **workflow_data)
+
+    metrics_runner = await start_metrics_server(config.metrics_host, config.metrics_port) if config.metrics_port else None
+    try:
+        async with open_survey_storage(config) as (survey_storage, sheets_client):
+            await run_bot(config, session_scheduler, survey_storage, sheets_client, serve)
+    finally:
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+async def run_front(config: Settings) -> None:
+    """Poll Telegram and route updates to ``SHARDS`` worker processes; serve their storage writes."""
+    # Only used to learn which update types the routers handle.
+    dp, _ = build_dispatcher(config, MemoryStorage())
+    metrics_runner = await start_metrics_server(config.metrics_host, config.metrics_port) if config.metrics_port else None
+    try:
+        # Workers copy the dedup index on startup, so it must be complete before they start.
+        async with open_survey_storage(config, warm_in_background=False) as (survey_storage, _):
+            pool = ShardPool(config.shards, run_shard, survey_storage)
+            pool.start()
+            logging.info("Started %d shard worker(s)", config.shards)
+            try:
+                async with Bot(token=config.bot_token) as bot:
+                    await bot.delete_webhook(drop_pending_updates=config.drop_pending_updates)
+                    await _route_until_stopped(pool, polling_updates(bot, dp.resolve_used_update_types()))
+            except TelegramUnauthorizedError:
+                logging.error(
+                    "Telegram returned Unauthorized. Please double-check TELEGRAM_BOT_TOKEN is correct and not revoked."
+                )
+            finally:
+                # Workers drain their queues and finish in-flight updates before this returns.
+                await pool.close()
+    finally:
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+async def _route_until_stopped(pool: ShardPool, updates: AsyncIterator[Dict[str, Any]]) -> None:
+    """Route updates until a signal arrives, polling fails or a worker keeps dying."""
+
+    async def route() -> None:
+        async for update in updates:
+            pool.dispatch(update)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    routing = asyncio.create_task(route())
+    watching = asyncio.create_task(pool.watch())
+    stopping = asyncio.create_task(stop.wait())
+    tasks = (routing, watching, stopping)
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in (routing, watching):
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()  # type: ignore[misc]
+
+
+def shard_settings(config: Settings, index: int) -> Settings:
+    """Settings of one worker: its own SQLite FSM file and metrics port, and a share of the outbound and broadcast rates."""
+    sqlite_file = config.fsm_sqlite_file
+    return dataclasses.replace(
+        config,
+        fsm_sqlite_file=sqlite_file.with_name(f"{sqlite_file.stem}-{index}{sqlite_file.suffix}"),
+        metrics_port=config.metrics_port + 1 + index if config.metrics_port else 0,
+        telegram_send_rate=config.telegram_send_rate / config.shards,
+        # Split like the send rate, so a broadcast stays below this worker's outbound limit.
+        broadcast_rate=config.broadcast_rate / config.shards,
+    )
+
+
+async def _run_shard(channel: ShardChannel) -> None:
+    config = shard_settings(load_config(), channel.index)
+    log_listener = setup_logging(config)
+    try:
+        if config.i18n_catalog_dir:
+            load_catalogs(config.i18n_catalog_dir)
+        dp, session_scheduler = build_dispatcher(config, build_fsm_storage(config))
+        survey_storage = RemoteSurveyStorage(channel, config.outbox_file, config.shard_persist_timeout)
+        await survey_storage.start()
+        # Not connected unless a broadcast reads recipients from the sheet.
+        sheets_client = GoogleSheetsClient(
+            config.google_service_account_file,
+            config.google_sheet_id,
+            config.google_worksheet_name,
+            http_options=sheets_http_options(config),
+        )
+
+        async def serve(bot: Bot, workflow_data: Dict[str, Any]) -> None:
+            await serve_shard(channel, dp, bot, config.update_concurrency, **workflow_data)
+
+        metrics_runner = (
+            await start_metrics_server(config.metrics_host, config.metrics_port) if config.metrics_port else None
+        )
+        try:
+            # Only the first worker resumes broadcasts, so each one is resumed once.
+            await run_bot(
+                config, session_scheduler, survey_storage, sheets_client, serve, resume_broadcasts=channel.index == 0
+            )
+        finally:
+            await survey_storage.close()
+            await sheets_client.close()
+            if metrics_runner:
+                await metrics_runner.cleanup()
+    finally:
+        log_listener.stop()
+
+
+def run_shard(channel: ShardChannel) -> None:
+    """Entry point of a worker process."""
+    # Ctrl+C reaches the whole process group; let the front process decide when workers stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_run_shard(channel))
+
+
+@asynccontextmanager
+async def open_import_storage() -> AsyncIterator[SurveyStorage]:
+    """The bot's storage for a bulk import, with the dedup index fully warmed first."""
+    async with open_survey_storage(load_config(), warm_in_background=False) as (storage, _):
+        yield storage
+
+
+def import_main(argv: Sequence[str]) -> int:
+    """``python main.py import ...``: journal a legacy CSV/XLSX through the bot's storage."""
+    from services.bulk_import import main as bulk_import_main  # pandas is only needed here
+
+    return bulk_import_main(argv, open_import_storage)
+
+
+async def main() -> None:
+    config = load_config()
+    log_listener = setup_logging(config)
+    try:
+        if config.i18n_catalog_dir:
+            logging.info("Loaded extra languages: %s", ", ".join(load_catalogs(config.i18n_catalog_dir)) or "none")
+        if config.shards > 1:
+            await run_front(config)
+        else:
+            await run_single(config)
+    finally:
+        log_listener.stop()
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["import"]:
+        raise SystemExit(import_main(sys.argv[2:]))
     asyncio.run(main())
@@ -0,0 +1,18 @@
+from .activity import ActivityMiddleware
+from .fsm_cache import CachedFSMContext, FSMCacheMiddleware
+from .logging_context import LoggingContextMiddleware
+from .metrics import HandlerMetricsMiddleware, TelegramMetricsMiddleware
+from .stale_callbacks import StaleCallbackMiddleware
+from .throttling import OutboundRateLimiter, ThrottlingMiddleware
+
+__all__ = [
+    "ActivityMiddleware",
+    "CachedFSMContext",
+    "FSMCacheMiddleware",
+    "HandlerMetricsMiddleware",
+    "LoggingContextMiddleware",
+    "OutboundRateLimiter",
+    "StaleCallbackMiddleware",
+    "TelegramMetricsMiddleware",
+    "ThrottlingMiddleware",
+]
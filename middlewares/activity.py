@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from middlewares.fsm_cache import CachedFSMContext
+from services.reminders import SessionScheduler
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """Reports each session's state after the handler to the :class:`SessionScheduler`.
+
+    Register it as an outer update middleware after :class:`FSMCacheMiddleware`,
+    so it sees the buffered state without another storage read.
+    """
+
+    def __init__(self, scheduler: SessionScheduler) -> None:
+        self._scheduler = scheduler
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            state = data.get("state")
+            if isinstance(state, CachedFSMContext):
+                self._scheduler.touch(state.key, await state.get_state(), state.language)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject
+
+from i18n import BASE_LANGUAGE, translator
+from services.fsm_storage import RecordStorage
+from services.metrics import FSM_STORAGE_CALLS
+
+
+class CachedFSMContext(FSMContext):
+    """FSM context that reads the record once and buffers every change until :meth:`flush`."""
+
+    def __init__(self, storage: BaseStorage, key: StorageKey, records: bool = False) -> None:
+        super().__init__(storage=storage, key=key)
+        self._records = records
+        self._state: Optional[str] = None
+        self._data: Dict[str, Any] = {}
+        self._state_dirty = False
+        self._data_dirty = False
+
+    @property
+    def language(self) -> str:
+        return self._data.get("language") or BASE_LANGUAGE
+
+    async def load(self) -> None:
+        if self._records:
+            FSM_STORAGE_CALLS.inc("get_record")
+            self._state, self._data = await self.storage.get_record(self.key)  # type: ignore[attr-defined]
+        else:
+            FSM_STORAGE_CALLS.inc("get_state")
+            self._state = await self.storage.get_state(self.key)
+            FSM_STORAGE_CALLS.inc("get_data")
+            self._data = await self.storage.get_data(self.key)
+        self._state_dirty = self._data_dirty = False
+
+    async def flush(self) -> None:
+        if not (self._state_dirty or self._data_dirty):
+            return
+        if self._records:
+            FSM_STORAGE_CALLS.inc("set_record")
+            await self.storage.set_record(self.key, self._state, self._data)  # type: ignore[attr-defined]
+        else:
+            if self._state_dirty:
+                FSM_STORAGE_CALLS.inc("set_state")
+                await self.storage.set_state(self.key, self._state)
+            if self._data_dirty:
+                FSM_STORAGE_CALLS.inc("set_data")
+                await self.storage.set_data(self.key, self._data)
+        self._state_dirty = self._data_dirty = False
+
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_dirty = True
+
+    async def get_state(self) -> Optional[str]:
+        return self._state
+
+    async def set_data(self, data: Mapping[str, Any]) -> None:
+        self._data = dict(data)
+        self._data_dirty = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        return self._data.copy()
+
+    async def get_value(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        return self._data.get(key, default)
+
+    async def update_data(self, data: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        self._data.update(kwargs)
+        self._data_dirty = True
+        return self._data.copy()
+
+
+class FSMCacheMiddleware(FSMContextMiddleware):
+    """Drop-in replacement for aiogram's FSM middleware with one read and one write per update.
+
+    Handlers receive a :class:`CachedFSMContext` as ``state``, the user's
+    language as ``language`` and a translator bound to it as ``tr``; buffered changes are written back after the
+    handler returns.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._records = isinstance(self.storage, RecordStorage)
+
+    @classmethod
+    def setup(cls, dispatcher: Dispatcher) -> "FSMCacheMiddleware":
+        """Install on a dispatcher created with ``disable_fsm=True``."""
+        middleware = cls(
+            storage=dispatcher.fsm.storage,
+            events_isolation=dispatcher.fsm.events_isolation,
+            strategy=dispatcher.fsm.strategy,
+        )
+        dispatcher.fsm = middleware
+        dispatcher.update.outer_middleware(middleware)
+        return middleware
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        bot: Bot = data["bot"]
+        context = self.resolve_event_context(bot, data)
+        data["fsm_storage"] = self.storage
+        if context is None:
+            return await handler(event, data)
+        async with self.events_isolation.lock(key=context.key):
+            await context.load()  # type: ignore[attr-defined]
+            data.update(
+                {
+                    "state": context,
+                    "raw_state": await context.get_state(),
+                    "language": context.language,  # type: ignore[attr-defined]
+                    "tr": translator(context.language),  # type: ignore[attr-defined]
+                }
+            )
+            try:
+                return await handler(event, data)
+            finally:
+                await context.flush()  # type: ignore[attr-defined]
+
+    def get_context(
+        self,
+        bot: Bot,
+        chat_id: int,
+        user_id: int,
+        thread_id: Optional[int] = None,
+        business_connection_id: Optional[str] = None,
+        destiny: str = DEFAULT_DESTINY,
+    ) -> FSMContext:
+        key = StorageKey(
+            user_id=user_id,
+            chat_id=chat_id,
+            bot_id=bot.id,
+            thread_id=thread_id,
+            business_connection_id=business_connection_id,
+            destiny=destiny,
+        )
+        return CachedFSMContext(storage=self.storage, key=key, records=self._records)
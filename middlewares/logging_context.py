@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+
+from logging_config import state_var, update_id_var, user_id_var
+
+logger = logging.getLogger(__name__)
+
+
+class LoggingContextMiddleware(BaseMiddleware):
+    """Tags every log record emitted while handling an update with its update ID, user ID and FSM state.
+
+    Register it as an outer update middleware after :class:`FSMCacheMiddleware`.
+    Each update also produces a DEBUG record with its handling time, which is
+    subject to debug sampling.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        tokens = (
+            update_id_var.set(event.update_id if isinstance(event, Update) else None),
+            user_id_var.set(user.id if user else None),
+            state_var.set(data.get("raw_state")),
+        )
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+            logger.debug("Update handled in %.1f ms", elapsed_ms, extra={"elapsed_ms": elapsed_ms})
+            for var, token in zip((update_id_var, user_id_var, state_var), tokens):
+                var.reset(token)
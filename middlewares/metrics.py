@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot, Router
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.fsm.context import FSMContext
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+
+from services.metrics import (
+    HANDLER_ERRORS,
+    HANDLER_LATENCY,
+    SURVEY_STATE_ENTERED,
+    TELEGRAM_ERRORS,
+    TELEGRAM_LATENCY,
+    track,
+)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware timing each handler by router, event type and FSM state.
+
+    It also counts state transitions, which gives the survey funnel: the gap
+    between two consecutive states is the number of users who dropped off.
+    Install with :meth:`setup` after :class:`FSMCacheMiddleware`.
+    """
+
+    def __init__(self, event: str) -> None:
+        self._event = event
+
+    @classmethod
+    def setup(cls, router: Router) -> None:
+        router.message.middleware(cls("message"))
+        router.callback_query.middleware(cls("callback_query"))
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        event_router: Optional[Router] = data.get("event_router")
+        before: Optional[str] = data.get("raw_state")
+        labels = (event_router.name if event_router else "", self._event, before or "")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except BaseException:
+            HANDLER_ERRORS.inc(*labels)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, *labels)
+            state: Optional[FSMContext] = data.get("state")
+            if state is not None:
+                after = await state.get_state()
+                if after and after != before:
+                    SURVEY_STATE_ENTERED.inc(after)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Bot session middleware recording Bot API latency and failures per method."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with track(TELEGRAM_LATENCY, TELEGRAM_ERRORS, type(method).__name__):
+            return await make_request(bot, method)
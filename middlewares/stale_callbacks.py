@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Mapping, Set, Tuple
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import TelegramObject, Update
+
+from services.metrics import STALE_CALLBACKS
+from services.reminders import SessionScheduler
+
+
+class StaleCallbackMiddleware(BaseMiddleware):
+    """Answers and drops button presses for questions the user has already moved past.
+
+    Each callback prefix maps to the state that asks its question. The
+    user's current state comes from the :class:`SessionScheduler`, which keeps
+    it in memory anyway, so a stale press costs neither a storage read nor a
+    wait for the user's lock. A second press on the same keyboard while the
+    first is still being handled is dropped as well. Users the scheduler does
+    not know (e.g. after a restart) go through as usual.
+
+    Register it as an outer update middleware before :class:`FSMCacheMiddleware`.
+    """
+
+    def __init__(self, scheduler: SessionScheduler, states: Mapping[str, State]) -> None:
+        self._scheduler = scheduler
+        self._states = {prefix: state.state for prefix, state in states.items()}
+        self._pressing: Set[Tuple[StorageKey, str]] = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        callback = event.callback_query if isinstance(event, Update) else None
+        prefix = (callback.data or "").split(":", 1)[0] if callback is not None else ""
+        expected = self._states.get(prefix)
+        if expected is None:
+            return await handler(event, data)
+        dispatcher: Dispatcher = data["dispatcher"]
+        bot: Bot = data["bot"]
+        context = dispatcher.fsm.resolve_event_context(bot, data)
+        if context is None:
+            return await handler(event, data)
+        pressing = (context.key, prefix)
+        current = self._scheduler.state(context.key)
+        if pressing in self._pressing or (current is not None and current != expected):
+            STALE_CALLBACKS.inc(prefix)
+            await callback.answer()  # type: ignore[union-attr]
+            return None
+        self._pressing.add(pressing)
+        try:
+            return await handler(event, data)
+        finally:
+            self._pressing.discard(pressing)
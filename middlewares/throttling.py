@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update, User
+
+logger = logging.getLogger(__name__)
+
+Clock = Callable[[], float]
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, at most ``capacity`` banked."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available; takes it right away when possible."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def idle(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Drops updates from users who exceed ``rate`` updates per second (with bursts of ``burst``).
+
+    Register it as an outer update middleware before the FSM middleware so
+    flooded updates never reach storage. Dropped button presses are still
+    answered, so the button stops spinning. Buckets are kept in order of last
+    use; once the table holds ``max_users`` entries, idle buckets are dropped
+    from the least recently used end, or the oldest one if none is idle, so
+    a new user costs O(1) however many are flooding.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: float = 5.0, max_users: int = 10_000, clock: Clock = time.monotonic) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._max_users = max_users
+        self._clock = clock
+        self._buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self.dropped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        now = self._clock()
+        bucket = self._buckets.get(user.id)
+        if bucket is None:
+            if len(self._buckets) >= self._max_users:
+                self._evict(now)
+            bucket = self._buckets[user.id] = TokenBucket(self._rate, self._burst, now)
+        else:
+            self._buckets.move_to_end(user.id)
+        if not bucket.consume(now):
+            self.dropped += 1
+            if isinstance(event, Update) and event.callback_query is not None:
+                await event.callback_query.answer()
+            return None
+        return await handler(event, data)
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets and next(iter(buckets.values())).idle(now):
+            buckets.popitem(last=False)
+        if len(buckets) >= self._max_users:
+            # Nobody idle: forget the user seen longest ago.
+            buckets.popitem(last=False)
+
+
+class OutboundRateLimiter(BaseRequestMiddleware):
+    """Bot session middleware that paces every API call to ``rate`` per second.
+
+    Calls that hit flood control (HTTP 429) are retried after the
+    ``retry_after`` Telegram asks for, up to ``max_retries`` times.
+    """
+
+    def __init__(self, rate: float = 30.0, burst: float = 30.0, max_retries: int = 3, clock: Clock = time.monotonic) -> None:
+        self._clock = clock
+        self._bucket = TokenBucket(rate, burst, clock())
+        self._max_retries = max_retries
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        attempt = 0
+        while True:
+            delay = self._bucket.delay(self._clock())
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                attempt += 1
+                if attempt > self._max_retries:
+                    raise
+                logger.warning("Flood control on %s, retrying in %ss", type(method).__name__, exc.retry_after)
+                await asyncio.sleep(exc.retry_after)
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+from collections import Counter
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from openpyxl import load_workbook
+
+from services.google_sheets import HEADERS, format_bool_uz
+
+DEFAULT_CHUNK_SIZE = 500
+
+_COLUMN = {name: idx for idx, name in enumerate(HEADERS)}
+_YES = format_bool_uz(True)
+_NO = format_bool_uz(False)
+
+
+def iter_journal_rows(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, skip: int = 0) -> Iterator[List[str]]:
+    """Stream rows from the outbox journal in keyset-paginated chunks over a read-only connection.
+
+    The first ``skip`` rows (in submission order) are passed over without being decoded.
+    The generator may be advanced from different worker threads, one at a time.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        last_id = 0
+        if skip:
+            found = conn.execute("SELECT id FROM outbox ORDER BY id LIMIT 1 OFFSET ?", (skip - 1,)).fetchone()
+            if found is None:
+                return
+            last_id = found[0]
+        while True:
+            chunk = conn.execute(
+                "SELECT id, row FROM outbox WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, chunk_size),
+            ).fetchall()
+            if not chunk:
+                return
+            for _, payload in chunk:
+                yield json.loads(payload)
+            last_id = chunk[-1][0]
+    finally:
+        conn.close()
+
+
+def count_journal_rows(path: Path) -> int:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        (count,) = conn.execute("SELECT COUNT(*) FROM outbox").fetchone()
+    finally:
+        conn.close()
+    return count
+
+
+def iter_excel_rows(path: Path) -> Iterator[List[str]]:
+    """Stream rows from the Excel backup (read-only mode), then from its uncompacted segments."""
+    if path.exists():
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            next(rows, None)
+            for row in rows:
+                yield ["" if cell is None else str(cell) for cell in row]
+        finally:
+            workbook.close()
+    # Rows set aside by a running (or failed) compaction come before the live segment.
+    for suffix in (".compacting.csv", ".segment.csv"):
+        segment = path.with_name(path.name + suffix)
+        if segment.exists():
+            with segment.open("r", encoding="utf-8", newline="") as handle:
+                yield from csv.reader(handle)
+
+
+@dataclass
+class SurveyReport:
+    """Aggregates over rows laid out as :data:`HEADERS`, updated one row at a time."""
+
+    total: int = 0
+    regions: Counter = field(default_factory=Counter)
+    ratings: Counter = field(default_factory=Counter)
+    rating_sum_by_region: Counter = field(default_factory=Counter)
+    rating_count_by_region: Counter = field(default_factory=Counter)
+    employment: Counter = field(default_factory=Counter)
+    recommendations: Counter = field(default_factory=Counter)
+    languages: Counter = field(default_factory=Counter)
+
+    def add(self, row: Sequence[str]) -> None:
+        def value(name: str) -> str:
+            idx = _COLUMN[name]
+            return str(row[idx]).strip() if idx < len(row) and row[idx] is not None else ""
+
+        self.total += 1
+        region = value("region") or "-"
+        self.regions[region] += 1
+        rating = value("uni_rating")
+        if rating in ("1", "2", "3", "4", "5"):
+            self.ratings[rating] += 1
+            self.rating_sum_by_region[region] += int(rating)
+            self.rating_count_by_region[region] += 1
+        employed = value("is_employed")
+        if employed == _YES:
+            self.employment["employed"] += 1
+        elif employed == _NO:
+            self.employment["not_employed"] += 1
+        self.recommendations[value("recommend_answer") or "-"] += 1
+        self.languages[value("language") or "-"] += 1
+
+    @property
+    def employment_rate(self) -> Optional[float]:
+        answered = self.employment["employed"] + self.employment["not_employed"]
+        return self.employment["employed"] / answered if answered else None
+
+    def mean_rating_by_region(self) -> Dict[str, float]:
+        return {
+            region: self.rating_sum_by_region[region] / count
+            for region, count in self.rating_count_by_region.items()
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"total": self.total}
+        for name in _COUNTERS:
+            data[name] = dict(getattr(self, name))
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "SurveyReport":
+        report = cls(total=int(data.get("total", 0)))
+        for name in _COUNTERS:
+            getattr(report, name).update(data.get(name) or {})
+        return report
+
+    def to_csv(self) -> str:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["metric", "key", "value"])
+        writer.writerow(["total", "", self.total])
+        rate = self.employment_rate
+        writer.writerow(["employment_rate", "", f"{rate:.4f}" if rate is not None else ""])
+        for name, counter in (
+            ("employment", self.employment),
+            ("rating", self.ratings),
+            ("recommend_answer", self.recommendations),
+            ("language", self.languages),
+            ("region", self.regions),
+        ):
+            for key in sorted(counter):
+                writer.writerow([name, key, counter[key]])
+        for region, mean in sorted(self.mean_rating_by_region().items()):
+            writer.writerow(["mean_rating_by_region", region, f"{mean:.2f}"])
+        return buffer.getvalue()
+
+
+_COUNTERS = tuple(f.name for f in fields(SurveyReport) if f.name != "total")
+
+
+def build_report(rows: Iterable[Sequence[str]]) -> SurveyReport:
+    report = SurveyReport()
+    for row in rows:
+        report.add(row)
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarize survey responses into a small CSV report.")
+    parser.add_argument("--source", choices=("journal", "excel"), default="journal")
+    parser.add_argument("--path", type=Path, help="journal (.sqlite3) or Excel backup (.xlsx) to read")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--out", type=Path, help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.source == "journal":
+        rows = iter_journal_rows(args.path or Path("data/outbox.sqlite3"), args.chunk_size)
+    else:
+        if args.path is None:
+            parser.error("--path is required for --source excel")
+        rows = iter_excel_rows(args.path)
+    report = build_report(rows).to_csv()
+    if args.out:
+        args.out.write_text(report, encoding="utf-8")
+    else:
+        sys.stdout.write(report)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
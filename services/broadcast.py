@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from middlewares.throttling import Clock, TokenBucket
+from services.analytics import DEFAULT_CHUNK_SIZE, iter_journal_rows
+from services.google_sheets import HEADERS, GoogleSheetsClient
+
+logger = logging.getLogger(__name__)
+
+DELIVERED = "delivered"
+BLOCKED = "blocked"
+FAILED = "failed"
+
+RecipientSource = Callable[[], AsyncIterator[int]]
+
+_USER_ID_COLUMN = HEADERS.index("telegram_user_id")
+
+
+def _user_ids(rows: Iterable[Sequence[str]]) -> Iterable[int]:
+    for row in rows:
+        value = row[_USER_ID_COLUMN] if len(row) > _USER_ID_COLUMN else ""
+        try:
+            yield int(value)
+        except (TypeError, ValueError):
+            continue
+
+
+async def journal_recipients(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[int]:
+    """Telegram user IDs from the outbox journal, read chunk by chunk in a worker thread."""
+    rows = iter_journal_rows(path, chunk_size)
+    while True:
+        chunk = await asyncio.to_thread(lambda: list(islice(rows, chunk_size)))
+        if not chunk:
+            return
+        for user_id in _user_ids(chunk):
+            yield user_id
+
+
+async def sheet_recipients(client: GoogleSheetsClient) -> AsyncIterator[int]:
+    """Telegram user IDs from the worksheet (one bulk read); includes rows written before the journal existed."""
+    for user_id in _user_ids(await client.get_rows()):
+        yield user_id
+
+
+@dataclass(slots=True)
+class BroadcastProgress:
+    broadcast_id: str
+    text: str
+    notify_chat_id: Optional[int] = None
+    # Every recipient before this position (in source order) has been handled.
+    position: int = 0
+    delivered: int = 0
+    blocked: int = 0
+    failed: int = 0
+    done: bool = False
+    started_at: str = field(default_factory=lambda: datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
+
+    def summary(self) -> str:
+        status = "done" if self.done else "running"
+        return (
+            f"Broadcast {self.broadcast_id} ({status}): "
+            f"delivered {self.delivered}, blocked {self.blocked}, failed {self.failed}"
+        )
+
+
+class Broadcaster:
+    """Sends one text to every distinct recipient with a bounded worker pool.
+
+    Sends are paced by a token bucket at ``rate`` messages per second, set
+    below the global outbound limit so survey replies keep their share.
+    Progress is checkpointed to ``<checkpoint_dir>/<id>.json`` every
+    ``checkpoint_every`` recipients and when the broadcast stops, and unfinished
+    broadcasts are resumed from their checkpoint by :meth:`resume`. Recipients
+    that were in flight during a crash may get the message twice.
+    """
+
+    def __init__(
+        self,
+        checkpoint_dir: Path,
+        recipients: RecipientSource,
+        rate: float = 20.0,
+        concurrency: int = 8,
+        max_retries: int = 3,
+        checkpoint_every: int = 100,
+        clock: Clock = time.monotonic,
+    ) -> None:
+        self._checkpoint_dir = checkpoint_dir
+        self._recipients = recipients
+        self._concurrency = max(concurrency, 1)
+        self._max_retries = max_retries
+        self._checkpoint_every = max(checkpoint_every, 1)
+        self._clock = clock
+        self._bucket = TokenBucket(rate, 1.0, clock())
+        self._running: Dict[str, asyncio.Task[BroadcastProgress]] = {}
+        self._progress: Dict[str, BroadcastProgress] = {}
+
+    def create(self, text: str, notify_chat_id: Optional[int] = None) -> BroadcastProgress:
+        progress = BroadcastProgress(f"{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}", text, notify_chat_id)
+        self.save(progress)
+        return progress
+
+    def start(self, bot: Bot, progress: BroadcastProgress) -> asyncio.Task[BroadcastProgress]:
+        task = self._running.get(progress.broadcast_id)
+        if task is None:
+            self._progress[progress.broadcast_id] = progress
+            task = asyncio.create_task(self.run(bot, progress), name=f"broadcast-{progress.broadcast_id}")
+            self._running[progress.broadcast_id] = task
+            task.add_done_callback(lambda _: self._running.pop(progress.broadcast_id, None))
+        return task
+
+    def resume(self, bot: Bot) -> List[BroadcastProgress]:
+        """Restart every broadcast whose checkpoint is not marked done."""
+        resumed = [progress for progress in self.checkpoints() if not progress.done]
+        for progress in resumed:
+            logger.info("Resuming broadcast %s at recipient %d", progress.broadcast_id, progress.position)
+            self.start(bot, progress)
+        return resumed
+
+    def status(self) -> List[BroadcastProgress]:
+        """Live progress of broadcasts started here, then the checkpoints of the rest."""
+        merged = {progress.broadcast_id: progress for progress in self.checkpoints()}
+        merged.update(self._progress)
+        return sorted(merged.values(), key=lambda progress: progress.broadcast_id)
+
+    async def close(self) -> None:
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, bot: Bot, progress: BroadcastProgress) -> BroadcastProgress:
+        queue: asyncio.Queue[Optional[tuple[int, int]]] = asyncio.Queue(maxsize=self._concurrency * 2)
+        finished: Set[int] = set()
+        handled = 0
+
+        async def worker() -> None:
+            nonlocal handled
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                index, chat_id = item
+                outcome = await self._send(bot, chat_id, progress.text)
+                setattr(progress, outcome, getattr(progress, outcome) + 1)
+                finished.add(index)
+                while progress.position in finished:
+                    finished.discard(progress.position)
+                    progress.position += 1
+                handled += 1
+                if handled % self._checkpoint_every == 0:
+                    self.save(progress)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self._concurrency)]
+        try:
+            seen: Set[int] = set()
+            index = 0
+            async for chat_id in self._recipients():
+                if chat_id in seen:
+                    continue
+                seen.add(chat_id)
+                if index >= progress.position:
+                    await queue.put((index, chat_id))
+                index += 1
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            progress.done = True
+        finally:
+            for task in workers:
+                task.cancel()
+            self.save(progress)
+        logger.info(progress.summary())
+        if progress.notify_chat_id is not None:
+            try:
+                await bot.send_message(progress.notify_chat_id, progress.summary())
+            except Exception as exc:
+                logger.warning("Failed to report broadcast %s: %s", progress.broadcast_id, exc)
+        return progress
+
+    async def _send(self, bot: Bot, chat_id: int, text: str) -> str:
+        attempt = 0
+        while True:
+            delay = self._bucket.delay(self._clock())
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                await bot.send_message(chat_id, text)
+                return DELIVERED
+            except TelegramForbiddenError:
+                return BLOCKED
+            except TelegramRetryAfter as exc:
+                retry_in: float = exc.retry_after
+            except (TelegramNetworkError, TelegramServerError) as exc:
+                retry_in = 2.0**attempt
+                logger.warning("Broadcast send to %s failed: %s", chat_id, exc)
+            except Exception as exc:
+                logger.warning("Broadcast send to %s failed: %s", chat_id, exc)
+                return FAILED
+            attempt += 1
+            if attempt > self._max_retries:
+                return FAILED
+            await asyncio.sleep(retry_in)
+
+    def checkpoints(self) -> List[BroadcastProgress]:
+        if not self._checkpoint_dir.exists():
+            return []
+        found = []
+        for path in sorted(self._checkpoint_dir.glob("*.json")):
+            try:
+                found.append(BroadcastProgress(**json.loads(path.read_text(encoding="utf-8"))))
+            except (OSError, ValueError, TypeError) as exc:
+                logger.warning("Ignoring unreadable broadcast checkpoint %s: %s", path, exc)
+        return found
+
+    def save(self, progress: BroadcastProgress) -> None:
+        self._checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        path = self._checkpoint_dir / f"{progress.broadcast_id}.json"
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(progress), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncContextManager, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from services.google_sheets import HEADERS, format_bool_uz, format_phone, format_recommend_answer, parse_bool_uz
+from services.storage import SurveyStorage
+
+DEFAULT_BATCH_SIZE = 500
+
+BOOL_COLUMNS = ("is_employed", "share_with_employer")
+_RATINGS = ("", "1", "2", "3", "4", "5")
+_COLUMN = {name: idx for idx, name in enumerate(HEADERS)}
+# A pattern string rather than a compiled regex, so the pyarrow string engine runs it
+# natively; an ASCII class means the same to it and to Python's ``re``.
+_NON_DIGITS = "[^0-9]"
+
+StorageFactory = Callable[[], AsyncContextManager[SurveyStorage]]
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """``series`` as strings, with missing values as empty strings."""
+    if isinstance(series.dtype, pd.StringDtype):
+        return series.fillna("")
+    return series.astype(object).where(series.notna(), "").astype(str)
+
+
+def normalize_phones(series: pd.Series) -> pd.Series:
+    """Vectorized :func:`format_phone`."""
+    raw = _text(series)
+    digits = raw.str.replace(_NON_DIGITS, "", regex=True)
+    length = digits.str.len()
+    trunk = digits.str.startswith("8") & (length == 12)
+    digits = digits.mask(trunk, "998" + digits.str.slice(1))
+    local = (length == 9) & digits.str.slice(0, 1).isin(["9", "8"])
+    digits = digits.mask(local, "998" + digits)
+    full = (digits.str.len() == 12) & digits.str.startswith("998")
+    formatted = digits.str.replace(r"^(...)(..)(...)(..)(..)$", r"+\1 \2 \3 \4 \5", regex=True)
+    return formatted.where(full, raw)
+
+
+def _map_distinct(series: pd.Series, func: Callable[[str], str]) -> pd.Series:
+    """Apply ``func`` once per distinct value and broadcast the results back."""
+    codes, uniques = pd.factorize(_text(series))
+    mapped = pd.array([func(value) for value in uniques], dtype=str)
+    return pd.Series(mapped.take(codes), index=series.index)
+
+
+def normalize_bools(series: pd.Series) -> pd.Series:
+    """``format_bool_uz(parse_bool_uz(value))`` for every value: ``Ha``, ``Yo‘q`` or empty."""
+    return _map_distinct(series, lambda value: format_bool_uz(parse_bool_uz(value)))
+
+
+def normalize_recommendations(series: pd.Series) -> pd.Series:
+    """Vectorized recommendation formatter (``Ha``/``Yo‘q``/``Albatta``, others kept as given)."""
+    return _map_distinct(series, format_recommend_answer)
+
+
+def normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Rows laid out as :data:`HEADERS`, as strings, with phone and answers normalized.
+
+    Missing columns are added empty; extra columns are dropped.
+    """
+    result = pd.DataFrame({name: _text(frame[name]) if name in frame else "" for name in HEADERS}, index=frame.index)
+    result["phone"] = normalize_phones(result["phone"])
+    for name in BOOL_COLUMNS:
+        result[name] = normalize_bools(result[name])
+    result["recommend_answer"] = normalize_recommendations(result["recommend_answer"])
+    return result
+
+
+def normalize_row(row: Dict[str, Optional[str]]) -> List[str]:
+    """Per-row reference for :func:`normalize_frame`, using the scalar formatters."""
+    values = [row.get(name) or "" for name in HEADERS]
+    values[_COLUMN["phone"]] = format_phone(row.get("phone"))
+    for name in BOOL_COLUMNS:
+        values[_COLUMN[name]] = format_bool_uz(parse_bool_uz(row.get(name)))
+    values[_COLUMN["recommend_answer"]] = format_recommend_answer(row.get("recommend_answer"))
+    return values
+
+
+def validate_frame(frame: pd.DataFrame, source: Optional[pd.DataFrame] = None) -> pd.Series:
+    """Per-row problem description (empty string for a valid row) of a normalized frame.
+
+    ``source`` is the frame before normalization, used to tell an empty yes/no
+    answer from one that was not understood.
+    """
+    problems = pd.Series("", index=frame.index, dtype=object)
+
+    def flag(mask: pd.Series, message: str) -> None:
+        nonlocal problems
+        problems = problems.mask(mask, problems + message + "; ")
+
+    flag(~frame["telegram_user_id"].str.fullmatch(r"[0-9]+"), "telegram_user_id is not a number")
+    flag(~frame["uni_rating"].isin(_RATINGS), "uni_rating is not 1-5")
+    stamps = frame["date"] + " " + frame["time"]
+    dated = (frame["date"] != "") | (frame["time"] != "")
+    parsed = pd.to_datetime(stamps.where(dated, None), format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    flag(dated & parsed.isna(), "date/time is not YYYY-MM-DD HH:MM:SS")
+    if source is not None:
+        for name in BOOL_COLUMNS:
+            if name in source:
+                unknown = _map_distinct(source[name], lambda value: "x" if value.strip() and parse_bool_uz(value) is None else "")
+                flag(unknown != "", f"{name} is not yes/no")
+    return problems.str.rstrip("; ")
+
+
+def read_table(path: Path) -> pd.DataFrame:
+    """Every cell of a CSV or XLSX file as a string, empty cells as empty strings."""
+    if path.suffix.lower() in (".xlsx", ".xlsm"):
+        return pd.read_excel(path, dtype=str, keep_default_na=False, engine="openpyxl")
+    return pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+
+def import_key(row: Sequence[str]) -> str:
+    """Idempotency key of an imported row, so importing the same file twice journals it once."""
+    return "import:" + hashlib.sha256("\x1f".join(row).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    invalid: int = 0
+    journaled: int = 0
+    # Valid rows that were not journaled: already in the journal, or refused by the dedup policy.
+    skipped: int = 0
+    # (line in the input, problem) of every invalid row.
+    problems: List[Tuple[int, str]] = field(default_factory=list)
+
+
+def prepare(frame: pd.DataFrame, now: Optional[datetime] = None) -> Tuple[pd.DataFrame, ImportResult]:
+    """Normalize and validate; return the valid rows and the counts so far.
+
+    Rows without a date and time get ``now`` (UTC), as if submitted today.
+    """
+    normalized = normalize_frame(frame)
+    problems = validate_frame(normalized, frame)
+    invalid = problems != ""
+    result = ImportResult(rows=len(frame), invalid=int(invalid.sum()))
+    # +2: one for the header line, one because lines count from 1.
+    result.problems = [(position + 2, problem) for position, problem in enumerate(problems) if problem]
+    valid = normalized[~invalid.to_numpy()].copy()
+    stamp = now or datetime.utcnow()
+    undated = (valid["date"] == "") & (valid["time"] == "")
+    valid.loc[undated, "date"] = stamp.strftime("%Y-%m-%d")
+    valid.loc[undated, "time"] = stamp.strftime("%H:%M:%S")
+    return valid, result
+
+
+async def import_rows(storage: SurveyStorage, valid: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Journal rows returned by :func:`prepare` through ``storage``, ``batch_size`` rows per transaction."""
+    rows = valid.to_numpy().tolist()
+    user_column, student_column = _COLUMN["telegram_user_id"], _COLUMN["student_university_id"]
+    journaled = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        journaled += await storage.persist_rows(
+            [(import_key(row), row, int(row[user_column]), row[student_column] or None) for row in batch]
+        )
+    return journaled
+
+
+async def import_frame(
+    storage: SurveyStorage, frame: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE, now: Optional[datetime] = None
+) -> ImportResult:
+    """Normalize, validate and journal ``frame`` through ``storage`` in batches of ``batch_size`` rows."""
+    valid, result = prepare(frame, now)
+    result.journaled = await import_rows(storage, valid, batch_size)
+    result.skipped = len(valid) - result.journaled
+    return result
+
+
+async def _import_with(open_storage: StorageFactory, valid: pd.DataFrame, batch_size: int) -> Tuple[int, str]:
+    async with open_storage() as storage:
+        return await import_rows(storage, valid, batch_size), storage.dedup_policy
+
+
+def main(argv: Optional[Sequence[str]] = None, open_storage: Optional[StorageFactory] = None) -> int:
+    """Command line entry point; journaling needs ``open_storage``, which opens the bot's storage."""
+    parser = argparse.ArgumentParser(description="Normalize survey rows from a CSV/XLSX file and journal them.")
+    parser.add_argument("--path", type=Path, required=True, help="CSV or XLSX with HEADERS column names")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only normalize and validate")
+    parser.add_argument("--out", type=Path, help="write the normalized valid rows here as CSV")
+    args = parser.parse_args(argv)
+    if not args.dry_run and open_storage is None:
+        parser.error("journaling needs the bot's storage: run `python main.py import ...`, or pass --dry-run")
+
+    valid, result = prepare(read_table(args.path))
+    if args.out:
+        valid.to_csv(args.out, index=False)
+    policy = None
+    if open_storage is not None and not args.dry_run:
+        result.journaled, policy = asyncio.run(_import_with(open_storage, valid, args.batch_size))
+        result.skipped = len(valid) - result.journaled
+    for line, problem in result.problems:
+        print(f"line {line}: {problem}", file=sys.stderr)
+    print(f"{result.rows} row(s), {result.invalid} invalid, {result.journaled} journaled, {result.skipped} skipped")
+    if result.skipped and not result.journaled:
+        message = "Nothing was journaled: every valid row is already in the journal or was refused by the dedup policy"
+        if policy == "reject":
+            message += " (DEDUP_POLICY=reject skips users who already submitted; DEDUP_POLICY=overwrite replaces their rows)"
+        print(message, file=sys.stderr)
+        return 1
+    return 1 if result.invalid else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
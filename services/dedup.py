@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+import math
+from typing import Iterable, Optional, Sequence, Set, Tuple
+
+from services.google_sheets import HEADERS
+from services.roster import normalize_student_id
+
+DEDUP_POLICIES = ("reject", "overwrite", "append")
+
+_USER_ID_COLUMN = HEADERS.index("telegram_user_id")
+_STUDENT_ID_COLUMN = HEADERS.index("student_university_id")
+
+
+def _digest(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over 64-bit digests (double hashing)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self._size = max(bits, 8)
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def _positions(self, digest: int) -> Iterable[int]:
+        h1 = digest & 0xFFFFFFFF
+        h2 = (digest >> 32) | 1
+        for idx in range(self._hashes):
+            yield (h1 + idx * h2) % self._size
+
+    def add(self, digest: int) -> None:
+        for pos in self._positions(digest):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest: int) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+class SubmissionIndex:
+    """Index of who already submitted, keyed on Telegram user ID and normalized student ID.
+
+    Keys are stored as 64-bit digests: the bloom filter answers most misses
+    without touching the set, and the set rules out bloom false positives.
+    """
+
+    def __init__(self, capacity: int = 50_000, error_rate: float = 0.001) -> None:
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._digests: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def add(self, user_id: Optional[int | str], student_id: Optional[str]) -> None:
+        self.add_digests(self.digests(user_id, student_id))
+
+    def contains(self, user_id: Optional[int | str], student_id: Optional[str] = None) -> bool:
+        return self.contains_digests(self.digests(user_id, student_id))
+
+    def digests(self, user_id: Optional[int | str], student_id: Optional[str]) -> Tuple[int, ...]:
+        """Digests of a submission's keys, to check and add them without hashing twice."""
+        return tuple(_digest(key) for key in self._keys(user_id, student_id))
+
+    def add_digests(self, digests: Iterable[int]) -> None:
+        for digest in digests:
+            self._bloom.add(digest)
+            self._digests.add(digest)
+
+    def contains_digests(self, digests: Iterable[int]) -> bool:
+        return any(digest in self._bloom and digest in self._digests for digest in digests)
+
+    def warm(self, rows: Iterable[Sequence[str]]) -> int:
+        """Index rows laid out as :data:`HEADERS`; return how many were read."""
+        count = 0
+        for row in rows:
+            user_id = row[_USER_ID_COLUMN] if len(row) > _USER_ID_COLUMN else None
+            student_id = row[_STUDENT_ID_COLUMN] if len(row) > _STUDENT_ID_COLUMN else None
+            self.add(user_id, student_id)
+            count += 1
+        return count
+
+    @staticmethod
+    def _keys(user_id: Optional[int | str], student_id: Optional[str]) -> Iterable[str]:
+        if user_id not in (None, ""):
+            yield f"tg:{user_id}"
+        normalized = normalize_student_id(student_id)
+        if normalized:
+            yield f"sid:{normalized}"
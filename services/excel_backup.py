@@ -1,19 +1,163 @@
 from __future__ import annotations
 
+import asyncio
+import csv
+import logging
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Sequence
+from typing import Iterator, List, Optional, Sequence
 
-import pandas as pd
+from openpyxl import Workbook, load_workbook
 
+from services.executors import BoundedExecutor, default_executor
+from services.metrics import EXCEL_LATENCY, track
 
-def append_to_excel(path: Path, headers: Sequence[str], row: Sequence[object]) -> None:
-    data = {header: [row[idx] if idx < len(row) else ""] for idx, header in enumerate(headers)}
-    df = pd.DataFrame(data)
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
 
-    if path.exists():
-        existing = pd.read_excel(path)
-        combined = pd.concat([existing, df], ignore_index=True)
-        combined.to_excel(path, index=False)
-    else:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_excel(path, index=False)
+logger = logging.getLogger(__name__)
+
+
+class ExcelBackup:
+    """Local ``.xlsx`` backup fed by an append-only CSV segment.
+
+    ``append`` writes one CSV line to ``<path>.segment.csv`` in constant time.
+    Segment rows are folded into the workbook by :meth:`compact`, which runs in
+    a worker thread every ``compact_interval`` seconds and once more on close.
+    Appends hold an exclusive lock (a thread lock plus ``flock`` on
+    ``<path>.lock``) so concurrent writers never interleave. Compaction only
+    holds it to move the segment aside to ``<path>.compacting.csv``; the
+    workbook rewrite runs under a separate lock, so appends never wait for
+    it. File work runs on ``executor``, which should have a spare worker
+    for compaction.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        headers: Sequence[str],
+        compact_interval: float = 300.0,
+        executor: Optional[BoundedExecutor] = None,
+    ) -> None:
+        self._path = path
+        self._executor = executor or default_executor("excel")
+        self._headers = list(headers)
+        self._segment = path.with_name(path.name + ".segment.csv")
+        self._compacting = path.with_name(path.name + ".compacting.csv")
+        self._lock_file = path.with_name(path.name + ".lock")
+        self._compact_lock_file = path.with_name(path.name + ".compact.lock")
+        self._compact_interval = compact_interval
+        self._thread_lock = threading.Lock()
+        self._compact_thread_lock = threading.Lock()
+        self._task: Optional[asyncio.Task[None]] = None
+        self._closing = asyncio.Event()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def segment_path(self) -> Path:
+        return self._segment
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing.clear()
+            self._task = asyncio.create_task(self._run(), name="excel-backup-compactor")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._closing.set()
+            await self._task
+            self._task = None
+        await self._compact()
+
+    async def append(self, row: Sequence[object]) -> None:
+        with track(EXCEL_LATENCY, None, "append"):
+            await self._executor.run(self.append_sync, row)
+
+    def append_sync(self, row: Sequence[object]) -> None:
+        self.append_rows_sync([row])
+
+    async def append_rows(self, rows: Sequence[Sequence[object]]) -> None:
+        with track(EXCEL_LATENCY, None, "append_rows"):
+            await self._executor.run(self.append_rows_sync, rows)
+
+    def append_rows_sync(self, rows: Sequence[Sequence[object]]) -> None:
+        """Append several rows to the segment with a single fsync."""
+        width = len(self._headers)
+        with self._locked():
+            with self._segment.open("a", encoding="utf-8", newline="") as handle:
+                csv.writer(handle).writerows([row[idx] if idx < len(row) else "" for idx in range(width)] for row in rows)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def compact(self) -> int:
+        """Move segment rows into the workbook and return how many were moved."""
+        with self._locked(self._compact_thread_lock, self._compact_lock_file):
+            # Rows left aside by a compaction that failed are folded in first;
+            # the segment waits for the next round rather than being mixed in.
+            if not self._compacting.exists():
+                with self._locked():
+                    if not self._segment.exists():
+                        return 0
+                    os.replace(self._segment, self._compacting)
+            rows = self._read_rows(self._compacting)
+            if not rows:
+                self._compacting.unlink()
+                return 0
+            if self._path.exists():
+                workbook = load_workbook(self._path)
+                sheet = workbook.active
+            else:
+                workbook = Workbook()
+                sheet = workbook.active
+                sheet.append(self._headers)
+            for row in rows:
+                sheet.append(row)
+            tmp_path = self._path.with_name(self._path.name + ".tmp")
+            workbook.save(tmp_path)
+            os.replace(tmp_path, self._path)
+            self._compacting.unlink()
+        return len(rows)
+
+    async def _run(self) -> None:
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self._compact_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing.is_set():
+                return
+            try:
+                await self._compact()
+            except Exception as exc:
+                logger.warning("Failed to compact Excel backup: %s", exc)
+
+    async def _compact(self) -> int:
+        with track(EXCEL_LATENCY, None, "compact"):
+            return await self._executor.run(self.compact)
+
+    @staticmethod
+    def _read_rows(path: Path) -> List[List[str]]:
+        with path.open("r", encoding="utf-8", newline="") as handle:
+            return [row for row in csv.reader(handle)]
+
+    @contextmanager
+    def _locked(self, thread_lock: Optional[threading.Lock] = None, lock_file: Optional[Path] = None) -> Iterator[None]:
+        """Hold ``thread_lock`` and ``flock`` on ``lock_file`` (by default, the append lock)."""
+        with thread_lock or self._thread_lock:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with (lock_file or self._lock_file).open("a") as lock_handle:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
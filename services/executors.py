@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from services.metrics import EXECUTOR_INFLIGHT, EXECUTOR_REJECTED, EXECUTOR_TIMEOUTS, EXECUTOR_WAIT
+
+T = TypeVar("T")
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """The pool already has ``max_workers + max_queue`` calls in flight."""
+
+
+class BoundedExecutor:
+    """Dedicated thread pool for one kind of blocking I/O, with a bounded backlog.
+
+    Unlike ``asyncio.to_thread`` it does not share the loop's default executor,
+    so a stalled Google API cannot hold up file writes (or aiogram's own
+    sync callbacks). Once ``max_workers + max_queue`` calls are in flight, a
+    new call is refused with :class:`ExecutorSaturatedError`, or, with
+    ``blocking=True``, waits for a free slot (for writes that must not be
+    dropped, like the journal). Calls wait at most ``timeout`` seconds once
+    submitted. Cancelling the awaiting task (or hitting the timeout)
+    drops a call that has not started yet; a call already running finishes
+    in the background but its result is discarded.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 4,
+        max_queue: int = 100,
+        timeout: Optional[float] = None,
+        blocking: bool = False,
+    ) -> None:
+        self.name = name
+        self._blocking = blocking
+        self._slots = asyncio.Semaphore(max_workers + max_queue)
+        self._timeout = timeout or None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"io-{name}")
+        self._inflight = 0
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if self._slots.locked() and not self._blocking:
+            EXECUTOR_REJECTED.inc(self.name)
+            raise ExecutorSaturatedError(f"I/O pool {self.name!r} is saturated ({self._inflight} calls in flight)")
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        started: list[float] = []
+
+        def call() -> T:
+            started.append(time.perf_counter())
+            return func(*args, **kwargs)
+
+        try:
+            future: Future[T] = self._pool.submit(contextvars.copy_context().run, call)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._acquire()
+
+        def done(_: Future[T]) -> None:
+            # Released when the thread is really done (or the call was dropped), not when the caller gives up.
+            try:
+                loop.call_soon_threadsafe(self._release, submitted, started)
+            except RuntimeError:  # the loop is already closed
+                pass
+
+        future.add_done_callback(done)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self._timeout)
+        except asyncio.TimeoutError:
+            EXECUTOR_TIMEOUTS.inc(self.name)
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _acquire(self) -> None:
+        self._inflight += 1
+        EXECUTOR_INFLIGHT.inc(self.name)
+
+    def _release(self, submitted: float, started: list[float]) -> None:
+        self._inflight -= 1
+        self._slots.release()
+        EXECUTOR_INFLIGHT.dec(self.name)
+        if started:
+            EXECUTOR_WAIT.observe(started[0] - submitted, self.name)
+
+
+def default_executor(name: str, blocking: bool = False) -> BoundedExecutor:
+    """Small private pool for components constructed without one (tests, scripts)."""
+    return BoundedExecutor(name, max_workers=1, max_queue=1_000, blocking=blocking)
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import Any, Mapping, Optional
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+from services.fsm_storage import Record
+
+
+class RedisRecordStorage(RedisStorage):
+    """``RedisStorage`` that reads with one ``MGET`` and writes with one pipelined transaction."""
+
+    async def get_record(self, key: StorageKey) -> Record:
+        state, data = await self.redis.mget(self.key_builder.build(key, "state"), self.key_builder.build(key, "data"))
+        if isinstance(state, bytes):
+            state = state.decode("utf-8")
+        if data is None:
+            return state, {}
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return state, self.json_loads(data)
+
+    async def set_record(self, key: StorageKey, state: Optional[str], data: Mapping[str, Any]) -> None:
+        state_key = self.key_builder.build(key, "state")
+        data_key = self.key_builder.build(key, "data")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if state is None:
+                pipe.delete(state_key)
+            else:
+                pipe.set(state_key, state, ex=self.state_ttl)
+            if data:
+                pipe.set(data_key, self.json_dumps(dict(data)), ex=self.data_ttl)
+            else:
+                pipe.delete(data_key)
+            await pipe.execute()
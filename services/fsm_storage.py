@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional, Protocol, Tuple, runtime_checkable
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import Settings
+
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+
+@runtime_checkable
+class RecordStorage(Protocol):
+    """Storage that can read and write state and data in a single round-trip."""
+
+    async def get_record(self, key: StorageKey) -> Record: ...
+
+    async def set_record(self, key: StorageKey, state: Optional[str], data: Mapping[str, Any]) -> None: ...
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fsm_updated_at ON fsm(updated_at);
+"""
+
+
+class SQLiteStorage(BaseStorage):
+    """Single-node FSM storage backed by a WAL-mode SQLite file.
+
+    Records untouched for ``ttl`` seconds are treated as empty and purged at
+    most once per ``purge_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: Optional[float] = None,
+        purge_interval: float = 60.0,
+        key_builder: Optional[KeyBuilder] = None,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._ttl = ttl
+        self._purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._key_builder = key_builder or DefaultKeyBuilder()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await asyncio.to_thread(self._write, self._key_builder.build(key), "state", value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await asyncio.to_thread(self._read, self._key_builder.build(key))
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        payload = json.dumps(dict(data), ensure_ascii=False)
+        await asyncio.to_thread(self._write, self._key_builder.build(key), "data", payload)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await asyncio.to_thread(self._read, self._key_builder.build(key))
+        return json.loads(record[1]) if record else {}
+
+    async def get_record(self, key: StorageKey) -> Record:
+        record = await asyncio.to_thread(self._read, self._key_builder.build(key))
+        if record is None:
+            return None, {}
+        return record[0], json.loads(record[1])
+
+    async def set_record(self, key: StorageKey, state: Optional[str], data: Mapping[str, Any]) -> None:
+        payload = json.dumps(dict(data), ensure_ascii=False)
+        await asyncio.to_thread(self._write_record, self._key_builder.build(key), state, payload)
+
+    async def purge_expired(self) -> int:
+        return await asyncio.to_thread(self._purge)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _read(self, key: str) -> Optional[tuple[Optional[str], str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT state, data, updated_at FROM fsm WHERE key = ?", (key,)).fetchone()
+        if row is None or self._expired(row[2]):
+            return None
+        return row[0], row[1]
+
+    def _write(self, key: str, column: str, value: Optional[str]) -> None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT updated_at FROM fsm WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._expired(row[0]):
+                # Do not let a fresh write resurrect the other column of an expired record.
+                self._conn.execute("DELETE FROM fsm WHERE key = ?", (key,))
+            self._conn.execute(
+                f"INSERT INTO fsm (key, {column}, updated_at) VALUES (?, ?, ?) "
+                f"ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, updated_at = excluded.updated_at",
+                (key, value, now),
+            )
+        self._maybe_purge(now)
+
+    def _write_record(self, key: str, state: Optional[str], payload: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+                "updated_at = excluded.updated_at",
+                (key, state, payload, now),
+            )
+        self._maybe_purge(now)
+
+    def _maybe_purge(self, now: float) -> None:
+        if now >= self._next_purge:
+            self._next_purge = now + self._purge_interval
+            self._purge()
+
+    def _purge(self) -> int:
+        if self._ttl is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM fsm WHERE updated_at < ?", (time.time() - self._ttl,))
+        return cursor.rowcount
+
+    def _expired(self, updated_at: float) -> bool:
+        return self._ttl is not None and updated_at < time.time() - self._ttl
+
+
+class _KeyLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class KeyedEventIsolation(BaseEventIsolation):
+    """Per-key FIFO locks that only exist while the key has updates in flight.
+
+    Updates of one user run one at a time in arrival order; different users
+    never wait for each other. A lock is dropped as soon as its last holder or
+    waiter leaves, so memory follows the number of busy users, not everyone
+    who ever wrote (unlike aiogram's ``SimpleEventIsolation``).
+    """
+
+    def __init__(self) -> None:
+        self._locks: Dict[StorageKey, _KeyLock] = {}
+
+    @property
+    def active_keys(self) -> int:
+        """Keys that currently hold or wait for their lock."""
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyLock()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[key]
+
+    async def close(self) -> None:
+        self._locks.clear()
+
+
+def build_fsm_storage(settings: Settings) -> BaseStorage:
+    """Create the FSM storage selected by ``settings.fsm_storage``."""
+    backend = settings.fsm_storage
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(settings.fsm_sqlite_file, ttl=settings.fsm_ttl)
+    if backend == "redis":
+        if not settings.redis_url:
+            raise RuntimeError("REDIS_URL is required when FSM_STORAGE=redis")
+        try:
+            from services.fsm_redis import RedisRecordStorage
+        except ImportError as exc:
+            raise RuntimeError("FSM_STORAGE=redis requires the 'redis' package (pip install .[redis])") from exc
+        return RedisRecordStorage.from_url(settings.redis_url, state_ttl=settings.fsm_ttl, data_ttl=settings.fsm_ttl)
+    raise RuntimeError(f"Unsupported FSM_STORAGE backend: {backend}")
@@ -1,13 +1,30 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import hashlib
+import logging
 from datetime import datetime
 from pathlib import Path
-from typing import List, Mapping, Optional, Sequence
+from typing import Dict, List, Mapping, Optional, Sequence
 
 import gspread
+from google.auth.credentials import Credentials
+from google.oauth2 import service_account
 from gspread import Spreadsheet, Worksheet
 
+from services.executors import BoundedExecutor, default_executor
+from services.metrics import SHEETS_ERRORS, SHEETS_LATENCY, SHEETS_RETRIES, SHEETS_TOKEN_REFRESHES, track
+from services.sheets_http import (
+    SCOPES,
+    SheetsHTTPClient,
+    SheetsHTTPOptions,
+    SheetsSession,
+    seconds_until_refresh,
+)
+
+logger = logging.getLogger(__name__)
+
 HEADERS: List[str] = [
     "date",
     "time",
@@ -35,10 +52,27 @@ def format_bool_uz(value: bool | None) -> str:
     return "Ha" if value else "Yo‘q"
 
 
+_TRUE_WORDS = frozenset({"ha", "yes", "true", "1"})
+_FALSE_WORDS = frozenset({"yo‘q", "yo'q", "yoq", "no", "false", "0"})
+
+
+def parse_bool_uz(value: str | None) -> bool | None:
+    """Inverse of :func:`format_bool_uz` that also accepts English and ``true``/``1`` style answers."""
+    if not value:
+        return None
+    normalized = value.strip().lower()
+    if normalized in _TRUE_WORDS:
+        return True
+    if normalized in _FALSE_WORDS:
+        return False
+    return None
+
+
 def format_phone(raw: str | None) -> str:
     if not raw:
         return ""
-    digits = "".join(ch for ch in raw if ch.isdigit())
+    # ASCII digits only: "٩" or "²" are not part of a phone number Sheets can use.
+    digits = "".join(ch for ch in raw if "0" <= ch <= "9")
 
     if digits.startswith("998") and len(digits) == 12:
         pass
@@ -58,7 +92,7 @@ def format_phone(raw: str | None) -> str:
     return raw
 
 
-def _format_recommend_answer(value: str | None) -> str:
+def format_recommend_answer(value: str | None) -> str:
     if not value:
         return ""
     normalized = value.strip().lower()
@@ -87,7 +121,7 @@ def build_row(data: Mapping[str, object], user_id: int, username: Optional[str])
     share_with = data.get("share_with_employer")
     region = data.get("region", "") or ""
     uni_rating = data.get("uni_rating")
-    recommend = _format_recommend_answer(data.get("recommend_answer"))
+    recommend = format_recommend_answer(data.get("recommend_answer"))
     uni_improvement = data.get("uni_improvement_suggestions", "") or ""
 
     return [
@@ -111,27 +145,216 @@ def build_row(data: Mapping[str, object], user_id: int, username: Optional[str])
     ]
 
 
+def schema_hash(headers: Sequence[str]) -> str:
+    return hashlib.sha256("\x1f".join(headers).encode("utf-8")).hexdigest()
+
+
 class GoogleSheetsClient:
-    def __init__(self, service_account_file: str | Path, sheet_id: str, worksheet_name: Optional[str] = None) -> None:
+    """gspread-backed client that connects lazily, off the event loop.
+
+    Construction does no network I/O. :meth:`start` (or the :meth:`create`
+    factory) begins connecting and validating the header in the background;
+    every request awaits that connection first and retries it if it failed.
+    Blocking gspread calls run on ``executor``, a pool reserved for Sheets.
+    A validated header is remembered in ``header_cache_file`` by schema hash,
+    so restarts with an unchanged schema skip reading row 1.
+
+    Requests share one keep-alive session (see :mod:`services.sheets_http`)
+    and the access token is refreshed in the background ``token_refresh_margin``
+    seconds before it expires, so no write waits for a token round trip.
+    ``credentials`` replaces the service account file, e.g. in tests.
+    """
+
+    def __init__(
+        self,
+        service_account_file: str | Path,
+        sheet_id: str,
+        worksheet_name: Optional[str] = None,
+        header_cache_file: Optional[Path] = None,
+        executor: Optional[BoundedExecutor] = None,
+        http_options: Optional[SheetsHTTPOptions] = None,
+        credentials: Optional[Credentials] = None,
+    ) -> None:
+        self._service_account_file = service_account_file
+        self._executor = executor or default_executor("sheets")
         self._sheet_id = sheet_id
         self._worksheet_name = worksheet_name
-        self._client = gspread.service_account(filename=str(service_account_file))
-        self._worksheet = self._open_worksheet()
-        self._ensure_header()
-
-    def _open_worksheet(self) -> Worksheet:
-        spreadsheet: Spreadsheet = self._client.open_by_key(self._sheet_id)
-        if self._worksheet_name:
-            return spreadsheet.worksheet(self._worksheet_name)
-        return spreadsheet.sheet1
-
-    def _ensure_header(self) -> None:
-        values = self._worksheet.row_values(1)
+        self._header_cache_file = header_cache_file
+        self._http_options = http_options or SheetsHTTPOptions()
+        self._credentials = credentials
+        self._session: Optional[SheetsSession] = None
+        self._worksheet: Optional[Worksheet] = None
+        self._connecting: Optional[asyncio.Task[Worksheet]] = None
+        self._refreshing: Optional[asyncio.Task[None]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def create(
+        cls,
+        service_account_file: str | Path,
+        sheet_id: str,
+        worksheet_name: Optional[str] = None,
+        header_cache_file: Optional[Path] = None,
+        executor: Optional[BoundedExecutor] = None,
+        http_options: Optional[SheetsHTTPOptions] = None,
+        credentials: Optional[Credentials] = None,
+    ) -> "GoogleSheetsClient":
+        """Build a client and start connecting in the background; must be called inside a running loop."""
+        client = cls(service_account_file, sheet_id, worksheet_name, header_cache_file, executor, http_options, credentials)
+        client.start()
+        return client
+
+    @property
+    def ready(self) -> bool:
+        return self._worksheet is not None
+
+    def start(self) -> None:
+        if self._connecting is None:
+            self._loop = asyncio.get_running_loop()
+            self._connecting = asyncio.create_task(self._executor.run(self._connect), name="google-sheets-connect")
+            self._connecting.add_done_callback(self._on_connected)
+
+    async def wait_ready(self) -> Worksheet:
+        if self._worksheet is not None:
+            return self._worksheet
+        self.start()
+        assert self._connecting is not None
+        return await asyncio.shield(self._connecting)
+
+    def _on_connected(self, task: asyncio.Task[Worksheet]) -> None:
+        if task.cancelled() or task.exception() is not None:
+            # Let the next request start a fresh attempt.
+            self._connecting = None
+            if not task.cancelled():
+                logger.warning("Failed to connect to Google Sheets: %s", task.exception())
+            return
+        self._worksheet = task.result()
+        logger.info("Google Sheets worksheet is ready")
+        if self._refreshing is None and self._session is not None:
+            self._refreshing = asyncio.create_task(self._refresh_tokens(), name="google-sheets-token-refresh")
+
+    async def close(self) -> None:
+        """Stop the token refresh and close the pooled connections."""
+        for task in (self._refreshing, self._connecting):
+            if task is not None and not task.done():
+                task.cancel()
+        self._refreshing = None
+        if self._session is not None:
+            self._session.close()
+
+    async def _refresh_tokens(self) -> None:
+        credentials, session = self._credentials, self._session
+        assert credentials is not None and session is not None
+        while True:
+            delay = seconds_until_refresh(credentials, self._http_options.token_refresh_margin)
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+            try:
+                await self._executor.run(session.refresh_token)
+            except Exception as exc:
+                SHEETS_TOKEN_REFRESHES.inc("error")
+                # The session still refreshes on demand if the token runs out before the next try.
+                logger.warning("Failed to refresh the Google access token: %s", exc)
+                await asyncio.sleep(self._http_options.backoff_max)
+            else:
+                SHEETS_TOKEN_REFRESHES.inc("ok")
+
+    def _connect(self) -> Worksheet:
+        if self._credentials is None:
+            self._credentials = service_account.Credentials.from_service_account_file(
+                str(self._service_account_file), scopes=SCOPES
+            )
+        if self._session is None:
+            self._session = SheetsSession(self._credentials, self._http_options)
+        if not self._credentials.valid:
+            self._session.refresh_token()
+        client = gspread.Client(
+            self._credentials,
+            session=self._session,
+            http_client=functools.partial(
+                SheetsHTTPClient,
+                options=self._http_options,
+                # Requests run on the Sheets pool; metrics are updated on the loop.
+                on_retry=functools.partial(self._loop.call_soon_threadsafe, SHEETS_RETRIES.inc),  # type: ignore[union-attr]
+            ),
+        )
+        spreadsheet: Spreadsheet = client.open_by_key(self._sheet_id)
+        worksheet = spreadsheet.worksheet(self._worksheet_name) if self._worksheet_name else spreadsheet.sheet1
+        self._ensure_header(worksheet)
+        return worksheet
+
+    def _ensure_header(self, worksheet: Worksheet) -> None:
+        cache_key = f"{self._sheet_id}:{self._worksheet_name or ''}:{schema_hash(HEADERS)}"
+        if self._header_cache_file and self._read_header_cache() == cache_key:
+            return
+        values = worksheet.row_values(1)
         if not values:
-            self._worksheet.append_row(HEADERS, value_input_option="USER_ENTERED")
+            worksheet.append_row(HEADERS, value_input_option="USER_ENTERED")
         elif values != HEADERS:
-            self._worksheet.delete_rows(1)
-            self._worksheet.insert_row(HEADERS, 1, value_input_option="USER_ENTERED")
+            worksheet.delete_rows(1)
+            worksheet.insert_row(HEADERS, 1, value_input_option="USER_ENTERED")
+        if self._header_cache_file:
+            self._header_cache_file.parent.mkdir(parents=True, exist_ok=True)
+            self._header_cache_file.write_text(cache_key, encoding="utf-8")
+
+    def _read_header_cache(self) -> Optional[str]:
+        try:
+            return self._header_cache_file.read_text(encoding="utf-8").strip()  # type: ignore[union-attr]
+        except OSError:
+            return None
 
     async def append_row(self, values: Sequence[str]) -> None:
-        await asyncio.to_thread(self._worksheet.append_row, list(values), value_input_option="USER_ENTERED")
+        worksheet = await self.wait_ready()
+        with track(SHEETS_LATENCY, SHEETS_ERRORS, "append_row"):
+            await self._executor.run(worksheet.append_row, list(values), value_input_option="USER_ENTERED")
+
+    async def append_rows(self, rows: Sequence[Sequence[str]]) -> None:
+        if not rows:
+            return
+        worksheet = await self.wait_ready()
+        with track(SHEETS_LATENCY, SHEETS_ERRORS, "append_rows"):
+            await self._executor.run(
+                worksheet.append_rows,
+                [list(row) for row in rows],
+                value_input_option="USER_ENTERED",
+            )
+
+    async def get_rows(self) -> List[List[str]]:
+        """Every data row of the worksheet (header excluded) in a single request."""
+        worksheet = await self.wait_ready()
+        with track(SHEETS_LATENCY, SHEETS_ERRORS, "get_rows"):
+            values = await self._executor.run(worksheet.get_all_values)
+        return values[1:]
+
+    async def replace_rows(self, rows: Sequence[Sequence[str]]) -> None:
+        """Overwrite the last row of each row's Telegram user, or append the row if there is none.
+
+        One read of the user ID column, then at most one ``batch_update`` and
+        one append, however many rows there are. Of several rows for the same
+        user, the last one wins.
+        """
+        if not rows:
+            return
+        worksheet = await self.wait_ready()
+        with track(SHEETS_LATENCY, SHEETS_ERRORS, "replace_rows"):
+            await self._executor.run(self._replace_rows, worksheet, [list(row) for row in rows])
+
+    @staticmethod
+    def _replace_rows(worksheet: Worksheet, rows: List[List[str]]) -> None:
+        column = HEADERS.index("telegram_user_id")
+        # Later rows overwrite earlier ones, so each user maps to their last row.
+        last_rows = {value: idx for idx, value in enumerate(worksheet.col_values(column + 1), start=1) if idx > 1}
+        latest: Dict[str, List[str]] = {}
+        for values in rows:
+            latest[values[column]] = values
+        updates = [
+            {"range": f"A{last_rows[user_id]}", "values": [values]}
+            for user_id, values in latest.items()
+            if user_id in last_rows
+        ]
+        appends = [values for user_id, values in latest.items() if user_id not in last_rows]
+        if updates:
+            worksheet.batch_update(updates, value_input_option="USER_ENTERED")
+        if appends:
+            worksheet.append_rows(appends, value_input_option="USER_ENTERED")
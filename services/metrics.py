@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter keyed by label values.
+
+    Updates happen on the event loop thread only, so there is no lock: a
+    series is one slot in a list that is bumped in place.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        slot = self._series.get(labels)
+        if slot is None:
+            slot = self._series[labels] = [0.0]
+        slot[0] += amount
+
+    def value(self, *labels: str) -> float:
+        slot = self._series.get(labels)
+        return slot[0] if slot else 0.0
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for labels, (value,) in sorted(self._series.items()):
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. work currently queued."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        slot = self._series.get(labels)
+        if slot is None:
+            slot = self._series[labels] = [0.0]
+        slot[0] = value
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Histogram with fixed buckets; each series preallocates its bucket counts."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: one count per bucket, then +Inf, sum and count.
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        slot = self._series.get(labels)
+        if slot is None:
+            slot = self._series[labels] = [0.0] * (len(self.buckets) + 3)
+        slot[bisect_left(self.buckets, value)] += 1
+        slot[-2] += value
+        slot[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        slot = self._series.get(labels)
+        return int(slot[-1]) if slot else 0
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for labels, slot in sorted(self._series.items()):
+            cumulative = 0.0
+            for bound, hits in zip((*self.buckets, float("inf")), slot):
+                cumulative += hits
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _label_text(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {slot[-2]:.6f}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {slot[-1]:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())  # type: ignore[attr-defined]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    "bot_handler_seconds", "Time spent in update handlers.", ("router", "event", "state")
+)
+HANDLER_ERRORS = REGISTRY.counter("bot_handler_errors_total", "Handlers that raised.", ("router", "event", "state"))
+SURVEY_STATE_ENTERED = REGISTRY.counter(
+    "bot_survey_state_entered_total", "Survey sessions that reached a state; drop-off is the gap to the next state.", ("state",)
+)
+SURVEY_COMPLETED = REGISTRY.counter("bot_survey_completed_total", "Surveys persisted successfully.")
+SURVEY_ABANDONED = REGISTRY.counter(
+    "bot_survey_abandoned_total", "Idle survey sessions evicted, by the state they stopped in.", ("state",)
+)
+REMINDERS_SENT = REGISTRY.counter("bot_reminders_sent_total", "Reminders sent to idle survey sessions.", ("state",))
+STALE_CALLBACKS = REGISTRY.counter(
+    "bot_stale_callbacks_total", "Callback queries dropped because their question was already answered.", ("prefix",)
+)
+FSM_STORAGE_CALLS = REGISTRY.counter("bot_fsm_storage_calls_total", "Calls made to the FSM storage backend.", ("op",))
+SHEETS_LATENCY = REGISTRY.histogram("bot_sheets_request_seconds", "Google Sheets request latency.", ("op",))
+SHEETS_ERRORS = REGISTRY.counter("bot_sheets_errors_total", "Failed Google Sheets requests.", ("op",))
+SHEETS_RETRIES = REGISTRY.counter("bot_sheets_retries_total", "Google Sheets HTTP requests retried.", ("status",))
+SHEETS_TOKEN_REFRESHES = REGISTRY.counter(
+    "bot_sheets_token_refreshes_total", "Background OAuth token refreshes.", ("result",)
+)
+EXCEL_LATENCY = REGISTRY.histogram("bot_excel_backup_seconds", "Excel backup append/compaction duration.", ("op",))
+ARCHIVE_LATENCY = REGISTRY.histogram("bot_parquet_archive_seconds", "Parquet archive flush/compaction duration.", ("op",))
+TELEGRAM_LATENCY = REGISTRY.histogram("bot_telegram_request_seconds", "Outbound Telegram Bot API latency.", ("method",))
+TELEGRAM_ERRORS = REGISTRY.counter("bot_telegram_errors_total", "Failed Telegram Bot API calls.", ("method",))
+
+EXECUTOR_INFLIGHT = REGISTRY.gauge("bot_executor_inflight", "Calls running or queued in an I/O pool.", ("pool",))
+EXECUTOR_WAIT = REGISTRY.histogram("bot_executor_queue_seconds", "Time calls wait for a free I/O worker.", ("pool",))
+EXECUTOR_REJECTED = REGISTRY.counter("bot_executor_rejected_total", "Calls refused because an I/O pool was full.", ("pool",))
+EXECUTOR_TIMEOUTS = REGISTRY.counter("bot_executor_timeouts_total", "Calls abandoned after their timeout.", ("pool",))
+
+
+@contextmanager
+def track(histogram: Histogram, errors: Optional[Counter], *labels: str) -> Iterator[None]:
+    """Time the block into ``histogram`` and count exceptions into ``errors``."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        if errors is not None:
+            errors.inc(*labels)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, *labels)
+
+
+def build_metrics_app(registry: Registry = REGISTRY) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    return app
+
+
+async def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY) -> web.AppRunner:
+    """Serve ``/metrics`` in Prometheus text format; call ``cleanup()`` on the runner to stop."""
+    runner = web.AppRunner(build_metrics_app(registry))
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from services.executors import BoundedExecutor, default_executor
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    row TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    delivered_at REAL,
+    mode TEXT NOT NULL DEFAULT 'append'
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox(id) WHERE delivered_at IS NULL;
+"""
+
+APPEND = "append"
+REPLACE = "replace"
+
+
+class PendingRow(NamedTuple):
+    id: int
+    row: List[str]
+    mode: str = APPEND
+    # Failed delivery attempts so far; after one, the row may be in the sheet already.
+    attempts: int = 0
+
+
+class Outbox:
+    """Append-only SQLite journal of survey rows awaiting delivery to Sheets.
+
+    Every submission is committed here first; delivered rows are kept and only
+    flagged with ``delivered_at`` so the journal doubles as a local archive.
+    SQLite calls run on ``executor``, the journal's own pool. It should be
+    blocking: a burst of submissions then waits for the disk instead of
+    failing.
+    """
+
+    def __init__(self, path: Path, executor: Optional[BoundedExecutor] = None) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._executor = executor or default_executor("outbox", blocking=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if "mode" not in columns:
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN mode TEXT NOT NULL DEFAULT 'append'")
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    async def add(self, key: str, row: Sequence[str], mode: str = APPEND) -> bool:
+        """Commit ``row`` under the idempotency ``key``; return False if it was already journaled.
+
+        ``mode`` is :data:`APPEND` for a new sheet row or :data:`REPLACE` to
+        overwrite the user's previous row.
+        """
+        return await self._executor.run(self._add, key, row, mode)
+
+    async def add_many(self, items: Sequence[Tuple[str, Sequence[str], str]]) -> List[bool]:
+        """Commit ``(key, row, mode)`` items in one transaction; like :meth:`add` for each of them."""
+        return await self._executor.run(self._add_many, items)
+
+    async def rows(self) -> List[List[str]]:
+        """Every journaled row, delivered or not, in submission order."""
+        return await self._executor.run(self._rows)
+
+    async def pending(self, limit: int) -> List[PendingRow]:
+        return await self._executor.run(self._pending, limit)
+
+    async def pending_count(self) -> int:
+        return await self._executor.run(self._pending_count)
+
+    async def mark_delivered(self, ids: Sequence[int]) -> None:
+        await self._executor.run(self._mark_delivered, ids)
+
+    async def record_failure(self, ids: Sequence[int]) -> None:
+        await self._executor.run(self._record_failure, ids)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _add(self, key: str, row: Sequence[str], mode: str) -> bool:
+        payload = json.dumps(list(row), ensure_ascii=False)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (key, row, created_at, mode) VALUES (?, ?, ?, ?)",
+                (key, payload, time.time(), mode),
+            )
+        return cursor.rowcount == 1
+
+    def _add_many(self, items: Sequence[Tuple[str, Sequence[str], str]]) -> List[bool]:
+        now = time.time()
+        added = []
+        with self._lock, self._transaction():
+            for key, row, mode in items:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO outbox (key, row, created_at, mode) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(list(row), ensure_ascii=False), now, mode),
+                )
+                added.append(cursor.rowcount == 1)
+        return added
+
+    def _rows(self) -> List[List[str]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT row FROM outbox ORDER BY id").fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def _pending(self, limit: int) -> List[PendingRow]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, row, mode, attempts FROM outbox WHERE delivered_at IS NULL ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [PendingRow(row_id, json.loads(payload), mode, attempts) for row_id, payload, mode, attempts in rows]
+
+    def _pending_count(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM outbox WHERE delivered_at IS NULL").fetchone()
+        return count
+
+    def _mark_delivered(self, ids: Sequence[int]) -> None:
+        now = time.time()
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "UPDATE outbox SET delivered_at = ? WHERE id = ? AND delivered_at IS NULL",
+                [(now, row_id) for row_id in ids],
+            )
+
+    def _record_failure(self, ids: Sequence[int]) -> None:
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1 WHERE id = ?",
+                [(row_id,) for row_id in ids],
+            )
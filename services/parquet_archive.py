@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from services.analytics import DEFAULT_CHUNK_SIZE, iter_excel_rows, iter_journal_rows
+from services.executors import BoundedExecutor, default_executor
+from services.google_sheets import HEADERS, format_bool_uz
+from services.metrics import ARCHIVE_LATENCY, track
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROW_GROUP_SIZE = 10_000
+
+_COLUMN = {name: idx for idx, name in enumerate(HEADERS)}
+_BOOLS = {format_bool_uz(True): True, format_bool_uz(False): False}
+_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Columns stored in each file. ``date`` and ``time`` become one UTC timestamp;
+# ``date`` and ``region`` are also the partition directories.
+SCHEMA = pa.schema(
+    [
+        ("submitted_at", pa.timestamp("s", tz="UTC")),
+        ("telegram_user_id", pa.int64()),
+        ("telegram_username", pa.string()),
+        ("language", pa.string()),
+        ("phone", pa.string()),
+        ("first_name", pa.string()),
+        ("last_name", pa.string()),
+        ("student_university_id", pa.string()),
+        ("is_employed", pa.bool_()),
+        ("work_place", pa.string()),
+        ("position", pa.string()),
+        ("share_with_employer", pa.bool_()),
+        ("uni_rating", pa.int64()),
+        ("recommend_answer", pa.string()),
+        ("uni_improvement_suggestions", pa.string()),
+    ]
+)
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.date32()), ("region", pa.string())]), flavor="hive")
+
+# Nullable pandas dtypes, so a missing rating or answer does not turn the column into floats or objects.
+_PANDAS_TYPES = {pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}
+
+
+def _bool(value: str) -> Optional[bool]:
+    return _BOOLS.get(value)
+
+
+def _int(value: str) -> Optional[int]:
+    value = value.strip()
+    return int(value) if value.lstrip("-").isdigit() else None
+
+
+def rows_to_table(rows: Sequence[Sequence[str]]) -> pa.Table:
+    """Typed table of rows laid out as :data:`HEADERS` (without the partition columns).
+
+    ``submitted_at`` is null for rows whose date or time does not parse.
+    """
+    columns = dict(zip(HEADERS, zip(*rows))) if rows else {name: () for name in HEADERS}
+    stamps = pc.binary_join_element_wise(
+        pa.array(columns["date"], pa.string()), pa.array(columns["time"], pa.string()), " "
+    )
+    arrays: Dict[str, Any] = {
+        "submitted_at": pc.strptime(stamps, format="%Y-%m-%d %H:%M:%S", unit="s", error_is_null=True).cast(
+            SCHEMA.field("submitted_at").type
+        )
+    }
+    for field in SCHEMA:
+        if field.name == "submitted_at":
+            continue
+        values = columns[field.name]
+        if pa.types.is_boolean(field.type):
+            arrays[field.name] = [_bool(value) for value in values]
+        elif pa.types.is_integer(field.type):
+            arrays[field.name] = [_int(value) for value in values]
+        else:
+            arrays[field.name] = list(values)
+    return pa.table(arrays, schema=SCHEMA)
+
+
+def _pad(row: Sequence[str]) -> Sequence[str]:
+    if len(row) == len(HEADERS):
+        return row
+    return [*row[: len(HEADERS)], *[""] * (len(HEADERS) - len(row))]
+
+
+def _partition_dir(root: Path, day: str, region: str) -> Path:
+    return root / f"date={day}" / f"region={quote(region, safe='') if region else _NULL_PARTITION}"
+
+
+class ParquetArchive:
+    """Typed Parquet copy of every submission, partitioned as ``date=YYYY-MM-DD/region=<key>``.
+
+    ``append`` only buffers the row in memory. The buffer is written out once
+    ``row_group_size`` rows are waiting, every ``flush_interval`` seconds and on
+    close, as one new file (and row group) per partition. Files appear
+    atomically, so readers never see a partial one. After each timed flush
+    and on close, :meth:`compact` merges each partition's files into one.
+    Rows still buffered when the process dies are lost here but not in the
+    journal; ``python -m services.parquet_archive`` rebuilds the archive from it.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        flush_interval: float = 300.0,
+        executor: Optional[BoundedExecutor] = None,
+    ) -> None:
+        self._directory = directory
+        self._row_group_size = max(row_group_size, 1)
+        self._flush_interval = flush_interval
+        self._executor = executor or default_executor("parquet")
+        self._buffer: List[Sequence[str]] = []
+        self._files_lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._task: Optional[asyncio.Task[None]] = None
+        self._wakeup = asyncio.Event()
+        self._closing = False
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name="parquet-archive-flusher")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        await self._compact()
+
+    async def append(self, row: Sequence[str]) -> None:
+        self._buffer.append(_pad(row))
+        if len(self._buffer) >= self._row_group_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write out the buffered rows and return how many were written."""
+        rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        try:
+            with track(ARCHIVE_LATENCY, None, "flush"):
+                return await self._executor.run(self.write_rows, rows)
+        except BaseException:
+            # Keep them for the next flush, ahead of rows appended meanwhile.
+            self._buffer[:0] = rows
+            raise
+
+    def write_rows(self, rows: Iterable[Sequence[str]]) -> int:
+        """Write rows laid out as :data:`HEADERS` straight to the archive, one file per partition.
+
+        Rows without a valid UTC date and time are logged and skipped; the
+        number of rows written is returned.
+        """
+        rows = [_pad(row) for row in rows]
+        table = rows_to_table(rows)
+        valid = table["submitted_at"].is_valid().to_pylist()
+        partitions: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for idx, row in enumerate(rows):
+            if valid[idx]:
+                partitions[(row[_COLUMN["date"]], row[_COLUMN["region"]])].append(idx)
+            else:
+                logger.warning("Skipping row without a valid date/time in Parquet archive: %s", row[:3])
+        with self._files_lock:
+            for (day, region), indices in partitions.items():
+                self._write(_partition_dir(self._directory, day, region), table.take(indices))
+        return sum(map(len, partitions.values()))
+
+    def compact(self) -> int:
+        """Merge each partition's files into one; return how many partitions were rewritten."""
+        merged = 0
+        with self._files_lock:
+            for partition in sorted(self._directory.glob("date=*/region=*")):
+                files = sorted(partition.glob("part-*.parquet"))
+                if len(files) < 2:
+                    continue
+                self._write(partition, pa.concat_tables(pq.read_table(path, schema=SCHEMA) for path in files))
+                for path in files:
+                    path.unlink()
+                merged += 1
+        return merged
+
+    def _write(self, partition: Path, table: pa.Table) -> None:
+        partition.mkdir(parents=True, exist_ok=True)
+        name = f"part-{time.time_ns()}-{next(self._sequence)}.parquet"
+        # Dot-prefixed files are skipped by dataset readers until the rename.
+        tmp_path = partition / f".{name}.tmp"
+        pq.write_table(table, tmp_path, row_group_size=self._row_group_size, compression="zstd")
+        os.replace(tmp_path, partition / name)
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._closing:
+                return
+            try:
+                await self.flush()
+                await self._compact()
+            except Exception as exc:
+                logger.warning("Failed to flush Parquet archive: %s", exc)
+
+    async def _compact(self) -> int:
+        with track(ARCHIVE_LATENCY, None, "compact"):
+            return await self._executor.run(self.compact)
+
+
+def load_archive(
+    directory: Path,
+    columns: Optional[Sequence[str]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    regions: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """Read the archive into a DataFrame with typed columns.
+
+    ``submitted_at`` and ``date`` are datetimes, ``uni_rating`` an integer and
+    the yes/no answers booleans (all nullable). ``start``/``end`` (inclusive)
+    and ``regions`` are matched against the partition directories, so other
+    partitions are never opened.
+    """
+    columns = list(columns) if columns is not None else ["date", "region", *SCHEMA.names]
+    if not directory.exists():
+        empty = pa.unify_schemas([SCHEMA, PARTITIONING.schema]).empty_table().select(columns)
+        return empty.to_pandas(types_mapper=_PANDAS_TYPES.get, date_as_object=False)
+    dataset = ds.dataset(directory, schema=pa.unify_schemas([SCHEMA, PARTITIONING.schema]), partitioning=PARTITIONING)
+    condition = None
+    for expression in (
+        ds.field("date") >= start if start else None,
+        ds.field("date") <= end if end else None,
+        ds.field("region").isin(list(regions)) if regions is not None else None,
+    ):
+        if expression is not None:
+            condition = expression if condition is None else condition & expression
+    table = dataset.to_table(columns=columns, filter=condition)
+    return table.to_pandas(types_mapper=_PANDAS_TYPES.get, date_as_object=False)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the Parquet archive from the journal or Excel backup.")
+    parser.add_argument("--source", choices=("journal", "excel"), default="journal")
+    parser.add_argument("--path", type=Path, help="journal (.sqlite3) or Excel backup (.xlsx) to read")
+    parser.add_argument("--out", type=Path, default=Path("data/archive"), help="archive directory (must be empty)")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    args = parser.parse_args(argv)
+    if args.out.exists() and any(args.out.iterdir()):
+        parser.error(f"{args.out} is not empty; archiving into it again would duplicate rows")
+
+    if args.source == "journal":
+        rows = iter_journal_rows(args.path or Path("data/outbox.sqlite3"), DEFAULT_CHUNK_SIZE)
+    else:
+        if args.path is None:
+            parser.error("--path is required for --source excel")
+        rows = iter_excel_rows(args.path)
+    archive = ParquetArchive(args.out, args.row_group_size)
+    written = 0
+    while batch := list(itertools.islice(rows, args.row_group_size)):
+        written += archive.write_rows(batch)
+    archive.compact()
+    print(f"Archived {written} row(s) to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
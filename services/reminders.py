@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+
+from i18n import translator
+from services.fsm_storage import RecordStorage
+from services.metrics import REMINDERS_SENT, SURVEY_ABANDONED
+
+logger = logging.getLogger(__name__)
+
+Clock = Callable[[], float]
+
+
+class _Session:
+    __slots__ = ("state", "language", "last_seen", "reminded", "due")
+
+    def __init__(self, state: str, language: str, last_seen: float) -> None:
+        self.state = state
+        self.language = language
+        self.last_seen = last_seen
+        self.reminded = False
+        self.due: Optional[float] = None
+
+
+class SessionScheduler:
+    """Reminds idle survey sessions once, then evicts them after ``ttl`` seconds.
+
+    Every session has at most one entry in a single heap ordered by deadline,
+    served by one background task. Activity only updates ``last_seen``; an
+    entry that pops early is pushed back with the session's real deadline, so
+    a busy user costs no heap operations. Sessions evicted in a state are
+    counted in :attr:`abandoned`. A reminder or eviction that fails is logged
+    and tried again ``retry_delay`` seconds later. With neither ``ttl`` nor
+    ``remind_after`` set nothing is tracked.
+    """
+
+    def __init__(
+        self,
+        storage: BaseStorage,
+        remind_after: Optional[float] = None,
+        ttl: Optional[float] = None,
+        events_isolation: Optional[BaseEventIsolation] = None,
+        clock: Clock = time.monotonic,
+        retry_delay: float = 60.0,
+    ) -> None:
+        self._storage = storage
+        self._remind_after = remind_after or None
+        self._ttl = ttl or None
+        self._isolation = events_isolation or DisabledEventIsolation()
+        self._clock = clock
+        self._retry_delay = retry_delay
+        self._sessions: Dict[StorageKey, _Session] = {}
+        self._heap: List[Tuple[float, int, StorageKey]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self.abandoned: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def enabled(self) -> bool:
+        return self._remind_after is not None or self._ttl is not None
+
+    def state(self, key: StorageKey) -> Optional[str]:
+        """Last state seen for ``key``, without touching storage; ``None`` if the session is not tracked."""
+        session = self._sessions.get(key)
+        return session.state if session is not None else None
+
+    def touch(self, key: StorageKey, state: Optional[str], language: str) -> None:
+        """Record activity of ``key``; a ``None`` state means the survey ended and tracking stops."""
+        if state is None:
+            self._sessions.pop(key, None)
+            return
+        if not self.enabled:
+            return
+        now = self._clock()
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = _Session(state, language, now)
+        else:
+            session.state, session.language, session.last_seen = state, language, now
+            session.reminded = False
+        if session.due is None or self._deadline(session) < session.due:
+            self._schedule(key, session)
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        if self._task is None and self.enabled:
+            self._task = asyncio.create_task(self._run(), name="session-scheduler")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def process_due(self) -> int:
+        """Handle every deadline that has passed; return how many reminders/evictions fired."""
+        fired = 0
+        while self._heap and self._heap[0][0] <= self._clock():
+            deadline, _, key = heapq.heappop(self._heap)
+            session = self._sessions.get(key)
+            if session is None or session.due != deadline:
+                continue
+            session.due = None
+            if self._deadline(session) > self._clock():
+                self._schedule(key, session)
+                continue
+            try:
+                if self._remind_after is not None and not session.reminded:
+                    await self._remind(key, session)
+                else:
+                    await self._evict(key, session)
+            except Exception:
+                logger.exception("Failed to expire the session of %s, retrying in %.0fs", key.chat_id, self._retry_delay)
+                self._push(key, session, self._clock() + self._retry_delay)
+                continue
+            fired += 1
+        return fired
+
+    def _deadline(self, session: _Session) -> float:
+        if self._remind_after is not None and not session.reminded:
+            return session.last_seen + self._remind_after
+        if self._ttl is not None:
+            return session.last_seen + self._ttl
+        return float("inf")
+
+    def _schedule(self, key: StorageKey, session: _Session) -> None:
+        deadline = self._deadline(session)
+        if deadline != float("inf"):
+            self._push(key, session, deadline)
+
+    def _push(self, key: StorageKey, session: _Session, deadline: float) -> None:
+        session.due = deadline
+        if not self._heap or deadline < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            await self.process_due()
+            timeout = self._heap[0][0] - self._clock() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _remind(self, key: StorageKey, session: _Session) -> None:
+        session.reminded = True
+        self._schedule(key, session)
+        if self._bot is None:
+            return
+        try:
+            await self._bot.send_message(key.chat_id, translator(session.language)("reminder"))
+            REMINDERS_SENT.inc(session.state)
+        except Exception as exc:
+            logger.warning("Failed to send reminder to %s: %s", key.chat_id, exc)
+
+    async def _evict(self, key: StorageKey, session: _Session) -> None:
+        async with self._isolation.lock(key):
+            if self._sessions.get(key) is not session or session.due is not None:
+                # The user came back (or finished) while we waited for the lock.
+                return
+            if isinstance(self._storage, MemoryStorage):
+                # Setting an empty state would leave the record in the dict; drop it to free the memory.
+                self._storage.storage.pop(key, None)
+            elif isinstance(self._storage, RecordStorage):
+                await self._storage.set_record(key, None, {})
+            else:
+                await self._storage.set_state(key, None)
+                await self._storage.set_data(key, {})
+            # Only now: a failed write leaves the session tracked, so it is retried.
+            del self._sessions[key]
+            self.abandoned[session.state] += 1
+            SURVEY_ABANDONED.inc(session.state)
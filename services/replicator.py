@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from collections import Counter
+from itertools import takewhile
+from typing import List, Optional, Protocol, Sequence, Set, Tuple
+
+from services.outbox import REPLACE, Outbox, PendingRow
+
+logger = logging.getLogger(__name__)
+
+
+class RowsSink(Protocol):
+    async def append_rows(self, rows: Sequence[Sequence[str]]) -> None: ...
+
+    async def replace_rows(self, rows: Sequence[Sequence[str]]) -> None: ...
+
+    async def get_rows(self) -> List[List[str]]: ...
+
+
+def _row_identity(row: Sequence[str]) -> Tuple[str, ...]:
+    # Date, time (to the second) and Telegram user ID: what tells one submission row from another.
+    return tuple(row[:3])
+
+
+class SheetsReplicator:
+    """Ships pending outbox rows to Google Sheets in batched ``append_rows`` calls.
+
+    A single background task waits for :meth:`notify`, gives concurrent
+    submissions ``flush_interval`` seconds to coalesce (unless a full batch is
+    already waiting) and then drains the outbox. Failed batches stay pending and
+    are retried with exponential backoff and jitter. Rows left undelivered at
+    shutdown are replayed on the next start. Consecutive rows journaled in
+    replace mode go out together through ``replace_rows``, keeping journal
+    order between them and the appended rows.
+
+    A failed append may still have landed (a read timeout, a 5xx, a dropped
+    connection), so before rows that failed are sent again the sheet is read
+    and only the rows missing from it are appended. An error of the journal
+    itself is logged and retried with the same backoff; it never stops the
+    task.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        sink: RowsSink,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+        retry_base: float = 1.0,
+        retry_max: float = 300.0,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        self._outbox = outbox
+        self._sink = sink
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._retry_base = retry_base
+        self._retry_max = retry_max
+        self._wake = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+        # Rows sent whose outcome the journal has not recorded yet.
+        self._unconfirmed: Set[int] = set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing.clear()
+            # Replay whatever a previous run left undelivered.
+            self._wake.set()
+            self._task = asyncio.create_task(self._run(), name="sheets-replicator")
+            self._task.add_done_callback(self._on_stopped)
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    async def close(self) -> None:
+        """Make a final delivery attempt and stop the background task.
+
+        Raises the error of a final drain that failed, or of a task that had already died.
+        """
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        self._closing.set()
+        self._wake.set()
+        await task
+
+    def _on_stopped(self, task: asyncio.Task[None]) -> None:
+        if not task.cancelled() and task.exception() is not None and not self._closing.is_set():
+            logger.error("The Sheets replicator stopped; rows stay in the journal", exc_info=task.exception())
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                if not self._closing.is_set() and await self._outbox.pending_count() < self._batch_size:
+                    await self._sleep(self._flush_interval)
+                await self._drain()
+            except Exception:
+                if self._closing.is_set():
+                    raise
+                failures += 1
+                delay = self._backoff(failures)
+                logger.exception("Failed to read or update the journal, retrying in %.1fs", delay)
+                await self._sleep(delay)
+                self._wake.set()
+                continue
+            failures = 0
+            if self._closing.is_set():
+                return
+
+    async def _drain(self) -> None:
+        failures = 0
+        while True:
+            batch = await self._outbox.pending(self._batch_size)
+            if not batch:
+                return
+            mode = batch[0].mode
+            batch = list(takewhile(lambda pending: pending.mode == mode, batch))
+            ids = [pending.id for pending in batch]
+            try:
+                rows = [pending.row for pending in batch] if mode == REPLACE else await self._missing_rows(batch)
+                self._unconfirmed.update(ids)
+                if mode == REPLACE:
+                    await self._sink.replace_rows(rows)
+                elif rows:
+                    await self._sink.append_rows(rows)
+            except Exception as exc:
+                failures += 1
+                await self._outbox.record_failure(ids)
+                self._unconfirmed.difference_update(ids)
+                if self._closing.is_set():
+                    logger.warning("Leaving %d row(s) in the outbox for the next start: %s", len(ids), exc)
+                    return
+                delay = self._backoff(failures)
+                logger.warning("Failed to append %d row(s) to Google Sheets, retrying in %.1fs: %s", len(ids), delay, exc)
+                await self._sleep(delay)
+                continue
+            failures = 0
+            await self._outbox.mark_delivered(ids)
+            self._unconfirmed.difference_update(ids)
+
+    def _backoff(self, failures: int) -> float:
+        delay = min(self._retry_max, self._retry_base * 2 ** (failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _missing_rows(self, batch: Sequence[PendingRow]) -> List[List[str]]:
+        """Rows of ``batch`` to append: rows that failed or went unconfirmed before are left out if the sheet has them."""
+        attempted = {pending.id for pending in batch if pending.attempts or pending.id in self._unconfirmed}
+        if not attempted:
+            return [pending.row for pending in batch]
+        landed = Counter(_row_identity(row) for row in await self._sink.get_rows())
+        rows = []
+        for pending in batch:
+            identity = _row_identity(pending.row)
+            if pending.id in attempted and landed[identity]:
+                landed[identity] -= 1
+            else:
+                rows.append(pending.row)
+        if len(rows) < len(batch):
+            logger.info("%d row(s) of a failed append were in Google Sheets already", len(batch) - len(rows))
+        return rows
+
+    async def _sleep(self, seconds: float) -> None:
+        """Sleep for ``seconds`` unless shutdown starts first."""
+        try:
+            await asyncio.wait_for(self._closing.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import logging
+import os
+import re
+from pathlib import Path
+from typing import FrozenSet, Iterable, Iterator, Optional
+
+from openpyxl import load_workbook
+
+logger = logging.getLogger(__name__)
+
+ID_COLUMN_CANDIDATES = ("student_university_id", "student_id", "studentid", "id")
+
+_ID_JUNK = re.compile(r"[\s\-_./]+")
+
+
+class RosterUnavailableError(RuntimeError):
+    """The roster could not be loaded, so IDs cannot be checked."""
+
+
+def normalize_student_id(raw: str | None) -> str:
+    if not raw:
+        return ""
+    return _ID_JUNK.sub("", raw).upper()
+
+
+class StudentRoster:
+    """In-memory hash index of student IDs exported from the university roster.
+
+    The file (``.csv`` or ``.xlsx``) is re-read in a worker thread whenever its
+    modification time changes; lookups only touch a frozenset and never block.
+    """
+
+    def __init__(self, path: Path, id_column: Optional[str] = None, reload_interval: float = 30.0) -> None:
+        self._path = path
+        self._id_column = id_column
+        self._reload_interval = reload_interval
+        self._ids: Optional[FrozenSet[str]] = None
+        self._mtime: Optional[float] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def __len__(self) -> int:
+        return len(self._ids or ())
+
+    def contains(self, raw: str | None) -> bool:
+        ids = self._ids
+        if ids is None:
+            raise RosterUnavailableError(f"Student roster {self._path} is not loaded")
+        return normalize_student_id(raw) in ids
+
+    def load(self) -> None:
+        mtime = os.stat(self._path).st_mtime
+        ids = frozenset(normalize_student_id(value) for value in self._read_ids())
+        ids -= {""}
+        self._ids, self._mtime = ids, mtime
+        logger.info("Loaded %d student IDs from %s", len(ids), self._path)
+
+    async def start(self) -> None:
+        """Load the roster and start watching it for changes."""
+        try:
+            await asyncio.to_thread(self.load)
+        except Exception as exc:
+            logger.error("Failed to load student roster %s: %s", self._path, exc)
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch(), name="student-roster-watch")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self._reload_interval)
+            try:
+                if os.stat(self._path).st_mtime != self._mtime:
+                    await asyncio.to_thread(self.load)
+            except Exception as exc:
+                # Keep serving the previous index until the file is readable again.
+                logger.warning("Failed to reload student roster %s: %s", self._path, exc)
+
+    def _read_ids(self) -> Iterator[str]:
+        if self._path.suffix.lower() in (".xlsx", ".xlsm"):
+            workbook = load_workbook(self._path, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                yield from self._column(rows)
+            finally:
+                workbook.close()
+        else:
+            with self._path.open("r", encoding="utf-8-sig", newline="") as handle:
+                yield from self._column(csv.reader(handle))
+
+    def _column(self, rows: Iterable[Iterable[object]]) -> Iterator[str]:
+        iterator = iter(rows)
+        header = [str(cell or "").strip().lower() for cell in next(iterator, ())]
+        index = self._column_index(header)
+        for row in iterator:
+            cells = list(row)
+            if index < len(cells) and cells[index] is not None:
+                yield str(cells[index])
+
+    def _column_index(self, header: list[str]) -> int:
+        candidates = (self._id_column.lower(),) if self._id_column else ID_COLUMN_CANDIDATES
+        for name in candidates:
+            if name in header:
+                return header.index(name)
+        if self._id_column:
+            raise RosterUnavailableError(f"Column {self._id_column!r} not found in {self._path}")
+        return 0
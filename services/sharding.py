@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Set
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramUnauthorizedError
+from aiogram.methods import GetUpdates
+
+from services.analytics import SurveyReport
+from services.dedup import SubmissionIndex
+from services.google_sheets import build_row
+from services.stats import SurveyStats
+from services.storage import DuplicateSubmissionError, SurveyStorage, submission_key
+
+logger = logging.getLogger(__name__)
+
+# Event kinds sent from the front process to a worker.
+HELLO = "hello"
+ADDED = "added"
+REPLY = "reply"
+
+
+def shard_for(user_id: int, shards: int) -> int:
+    """Worker that owns ``user_id``; stable across restarts as long as ``shards`` does not change."""
+    return user_id % shards
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """``from.id`` of a raw update (or the chat ID for updates without a sender)."""
+    for name, event in update.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+        sender = event.get("from") or event.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return int(sender["id"])
+        chat = event.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+    return None
+
+
+@dataclass
+class ShardChannel:
+    """The queues between the front process and one worker. Picklable, so it is the worker's only argument."""
+
+    index: int
+    shards: int
+    updates: "multiprocessing.Queue[Optional[Dict[str, Any]]]"
+    requests: "multiprocessing.Queue[Optional[tuple]]"
+    events: "multiprocessing.Queue[Optional[tuple]]"
+
+
+def _pump(
+    source: "multiprocessing.Queue[Any]",
+    loop: asyncio.AbstractEventLoop,
+    deliver: Callable[[Any], None],
+    slots: Optional[threading.Semaphore] = None,
+) -> threading.Thread:
+    """Hand items from a process queue to ``deliver`` on the event loop, until a ``None`` arrives.
+
+    With ``slots``, a slot is taken before each read, so the thread stops
+    reading (and the queue fills up) while that many items are in flight.
+    """
+
+    def run() -> None:
+        while True:
+            if slots is not None:
+                slots.acquire()
+            item = source.get()
+            try:
+                loop.call_soon_threadsafe(deliver, item)
+            except RuntimeError:  # the loop is already closed
+                return
+            if item is None:
+                return
+
+    thread = threading.Thread(target=run, name="shard-pump", daemon=True)
+    thread.start()
+    return thread
+
+
+class RemoteSurveyStorage:
+    """Worker-side stand-in for :class:`SurveyStorage`.
+
+    Rows are built here, on the worker's core, and sent to the front process,
+    which journals them through the one real storage. The dedup index and the
+    ``/stats`` counters are local replicas: the front ships them on startup
+    and then streams every stored row to all workers, so :meth:`rejects` and
+    ``/stats`` never leave the process. The front stays authoritative: a
+    duplicate that slips past the replica is refused there. :meth:`persist`
+    fails after ``timeout`` seconds without a reply, e.g. if the front died;
+    the submission key is the same on a retry, so a row the front journaled
+    late is not stored twice.
+    """
+
+    def __init__(self, channel: ShardChannel, journal_path: Optional[Path] = None, timeout: float = 30.0) -> None:
+        self._channel = channel
+        self.journal_path = journal_path
+        self._timeout = timeout
+        self.dedup_index: Optional[SubmissionIndex] = None
+        self.dedup_policy = "append"
+        self.stats = SurveyStats()
+        self._ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future[None]] = {}
+        self._ready: Optional[asyncio.Future[None]] = None
+        self._reader: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        """Start reading events and wait for the front's initial state."""
+        loop = asyncio.get_running_loop()
+        self._ready = loop.create_future()
+        self._reader = _pump(self._channel.events, loop, self._on_event)
+        await self._ready
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._channel.events.put(None)
+            await asyncio.to_thread(self._reader.join)
+            self._reader = None
+        for future in self._pending.values():
+            future.cancel()
+
+    def rejects(self, user_id: int, student_id: Optional[str] = None) -> bool:
+        if self.dedup_index is None or self.dedup_policy != "reject":
+            return False
+        return self.dedup_index.contains(user_id, student_id)
+
+    async def persist(self, data: Dict[str, Any], user_id: int, username: Optional[str]) -> None:
+        row = build_row(data, user_id, username)
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        self._channel.requests.put(
+            (self._channel.index, request_id, submission_key(data, user_id), row, user_id, data.get("student_university_id"))
+        )
+        try:
+            await asyncio.wait_for(future, self._timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"The front process did not confirm the submission within {self._timeout:g}s") from None
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _on_event(self, event: Optional[tuple]) -> None:
+        if event is None:
+            return
+        kind = event[0]
+        if kind == ADDED:
+            _, user_id, student_id, row = event
+            if self.dedup_index is not None:
+                self.dedup_index.add(user_id, student_id)
+            self.stats.add(row)
+        elif kind == REPLY:
+            _, request_id, error, message = event
+            future = self._pending.get(request_id)
+            if future is None or future.done():
+                return
+            if error is None:
+                future.set_result(None)
+            elif error == "duplicate":
+                future.set_exception(DuplicateSubmissionError(message))
+            else:
+                future.set_exception(RuntimeError(message))
+        elif kind == HELLO:
+            _, self.dedup_index, self.dedup_policy, report = event
+            if report is not None:
+                self.stats = SurveyStats(report=SurveyReport.from_dict(report))
+            if self._ready is not None and not self._ready.done():
+                self._ready.set_result(None)
+
+
+async def serve_shard(channel: ShardChannel, dp: Dispatcher, bot: Bot, max_inflight: int = 100, **kwargs: Any) -> None:
+    """Feed updates routed to this worker into ``dp`` until the front sends ``None``.
+
+    Updates run as concurrent tasks, at most ``max_inflight`` at a time; the
+    dispatcher's events isolation keeps one user's updates in order.
+    """
+    loop = asyncio.get_running_loop()
+    slots = threading.Semaphore(max_inflight)
+    tasks: Set[asyncio.Task[Any]] = set()
+    finished = asyncio.Event()
+
+    async def feed(update: Dict[str, Any]) -> None:
+        try:
+            await dp.feed_raw_update(bot, update, **kwargs)
+        except Exception:
+            logger.exception("Failed to process update %s", update.get("update_id"))
+        finally:
+            slots.release()
+
+    def deliver(update: Optional[Dict[str, Any]]) -> None:
+        if update is None:
+            finished.set()
+            return
+        task = asyncio.create_task(feed(update))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    _pump(channel.updates, loop, deliver, slots)
+    try:
+        await finished.wait()
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ShardPool:
+    """Front-process side: worker processes, update routing and the shared storage sink.
+
+    ``target`` runs in each spawned worker with its :class:`ShardChannel`.
+    Updates are routed by :func:`shard_for` on the sender's ID, so one user's
+    FSM state only ever lives on one worker. Each worker has its own
+    forwarding task and a buffer of ``max_pending`` updates in front of its
+    process queue, so a slow worker never holds up the others; updates for a
+    worker whose buffer is full are dropped. :meth:`watch` restarts a worker
+    that dies, at most ``max_restarts`` times each.
+    """
+
+    def __init__(
+        self,
+        shards: int,
+        target: Callable[[ShardChannel], None],
+        storage: SurveyStorage,
+        max_pending: int = 1_000,
+        max_restarts: int = 3,
+    ) -> None:
+        context = multiprocessing.get_context("spawn")
+        self._storage = storage
+        self._target = target
+        self._context = context
+        self._max_pending = max_pending
+        self._max_restarts = max_restarts
+        self._requests: "multiprocessing.Queue[Optional[tuple]]" = context.Queue()
+        self.channels = [self._channel(index, shards) for index in range(shards)]
+        # One slot more than dispatch fills, for the sentinel that close() queues.
+        self._buffers: List["asyncio.Queue[Optional[Dict[str, Any]]]"] = [
+            asyncio.Queue(max_pending + 1) for _ in range(shards)
+        ]
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+        self._restarts = [0] * shards
+        self._forwarders: List[asyncio.Task[None]] = []
+        self._reader: Optional[threading.Thread] = None
+        self._serving: Set[asyncio.Task[None]] = set()
+        self._closing = False
+        self.dropped = 0
+
+    def start(self) -> None:
+        hello = self._hello()
+        for channel in self.channels:
+            self._processes.append(self._spawn(channel, hello))
+        self._forwarders = [
+            asyncio.create_task(self._forward(index), name=f"shard-{index}-forward") for index in range(len(self.channels))
+        ]
+        self._reader = _pump(self._requests, asyncio.get_running_loop(), self._on_request)
+
+    def dispatch(self, update: Dict[str, Any]) -> int:
+        """Queue ``update`` for the worker that owns its sender; return that worker's index."""
+        user_id = update_user_id(update)
+        index = shard_for(user_id, len(self.channels)) if user_id is not None else 0
+        buffer = self._buffers[index]
+        if buffer.qsize() >= self._max_pending:
+            self.dropped += 1
+            logger.warning("Worker %d has %d updates waiting, dropping update %s", index, buffer.qsize(), update.get("update_id"))
+        else:
+            buffer.put_nowait(update)
+        return index
+
+    async def watch(self, interval: float = 1.0) -> None:
+        """Restart workers that exit while the pool is running; raise once one has died too often."""
+        while True:
+            await asyncio.sleep(interval)
+            if self._closing:
+                return
+            for index, process in enumerate(self._processes):
+                if process.exitcode is None:
+                    continue
+                if self._restarts[index] >= self._max_restarts:
+                    raise RuntimeError(
+                        f"Worker {process.name} exited with code {process.exitcode} "
+                        f"after {self._restarts[index]} restart(s)"
+                    )
+                self._restarts[index] += 1
+                logger.error("Worker %s exited with code %s, restarting it", process.name, process.exitcode)
+                self._restart(index)
+
+    async def close(self, timeout: float = 30.0) -> None:
+        """Let every worker finish its queued updates and exit, then stop serving storage requests."""
+        self._closing = True
+        for buffer in self._buffers:
+            # Behind every queued update; the forwarder passes it on to the worker last.
+            buffer.put_nowait(None)
+        if self._forwarders:
+            _, stuck = await asyncio.wait(self._forwarders, timeout=timeout)
+            for task in stuck:
+                task.cancel()
+        for process in self._processes:
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in %.0fs, terminating it", process.name, timeout)
+                process.terminate()
+        self._processes.clear()
+        if self._serving:
+            await asyncio.gather(*self._serving, return_exceptions=True)
+        if self._reader is not None:
+            self._requests.put(None)
+            await asyncio.to_thread(self._reader.join)
+            self._reader = None
+        for channel in self.channels:
+            # Nobody reads these any more; do not let unread items hold up interpreter exit.
+            channel.updates.cancel_join_thread()
+            channel.events.cancel_join_thread()
+
+    def _channel(self, index: int, shards: int) -> ShardChannel:
+        return ShardChannel(index, shards, self._context.Queue(self._max_pending), self._requests, self._context.Queue())
+
+    def _hello(self) -> tuple:
+        report = self._storage.stats.report.to_dict() if self._storage.stats is not None else None
+        # A copy: the queue pickles it on its feeder thread while the loop may still add to the index.
+        return (HELLO, copy.deepcopy(self._storage.dedup_index), self._storage.dedup_policy, report)
+
+    def _spawn(self, channel: ShardChannel, hello: tuple) -> multiprocessing.process.BaseProcess:
+        channel.events.put(hello)
+        process = self._context.Process(target=self._target, args=(channel,), name=f"shard-{channel.index}")
+        process.start()
+        return process
+
+    def _restart(self, index: int) -> None:
+        # Fresh queues: the dead worker may have held a queue's lock.
+        old, channel = self.channels[index], self._channel(index, len(self.channels))
+        while True:
+            try:
+                channel.updates.put_nowait(old.updates.get(block=False))
+            except queue.Empty:
+                break
+        old.updates.cancel_join_thread()
+        old.events.cancel_join_thread()
+        self.channels[index] = channel
+        self._processes[index] = self._spawn(channel, self._hello())
+
+    async def _forward(self, index: int) -> None:
+        """Move updates from the worker's buffer to its process queue, waiting while that queue is full."""
+        buffer = self._buffers[index]
+        while True:
+            update = await buffer.get()
+            while True:
+                # Looked up each time: a restart replaces the channel.
+                updates = self.channels[index].updates
+                try:
+                    updates.put_nowait(update)
+                    break
+                except queue.Full:
+                    pass
+                try:
+                    await asyncio.to_thread(updates.put, update, True, 0.5)
+                    break
+                except queue.Full:
+                    continue
+            if update is None:
+                return
+
+    def _on_request(self, request: Optional[tuple]) -> None:
+        if request is None:
+            return
+        task = asyncio.create_task(self._serve(*request))
+        self._serving.add(task)
+        task.add_done_callback(self._serving.discard)
+
+    async def _serve(
+        self, index: int, request_id: int, key: str, row: List[str], user_id: int, student_id: Optional[str]
+    ) -> None:
+        events = self.channels[index].events
+        try:
+            added = await self._storage.persist_row(key, row, user_id, student_id)
+        except DuplicateSubmissionError as exc:
+            events.put((REPLY, request_id, "duplicate", str(exc)))
+            return
+        except Exception as exc:
+            logger.exception("Failed to store a submission from shard %d", index)
+            events.put((REPLY, request_id, "error", str(exc)))
+            return
+        if added:
+            # Before the reply, so the submitting worker's replicas are current when its handler resumes.
+            for channel in self.channels:
+                channel.events.put((ADDED, user_id, student_id, row))
+        events.put((REPLY, request_id, None, None))
+
+
+async def polling_updates(
+    bot: Bot,
+    allowed_updates: Sequence[str],
+    timeout: int = 30,
+    backoff_max: float = 5.0,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Long-poll ``getUpdates`` and yield the raw update dicts.
+
+    Updates are never parsed into aiogram models here; the workers do that,
+    so the front process only moves JSON. Needs the default aiohttp session.
+    Raises :class:`TelegramUnauthorizedError` when Telegram rejects the token;
+    other errors are retried with backoff.
+    """
+    session = await bot.session.create_session()  # type: ignore[attr-defined]
+    url = bot.session.api.api_url(token=bot.token, method="getUpdates")
+    offset: Optional[int] = None
+    delay = backoff_max / 10
+    while True:
+        payload: Dict[str, Any] = {"timeout": timeout, "allowed_updates": list(allowed_updates)}
+        if offset is not None:
+            payload["offset"] = offset
+        try:
+            async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout + 10)) as response:
+                body = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+            logger.warning("getUpdates failed: %s", exc)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, backoff_max)
+            continue
+        if not body.get("ok"):
+            # 401 for a revoked token, 404 for one that was never valid: retrying will not help.
+            if body.get("error_code") in (401, 404):
+                raise TelegramUnauthorizedError(
+                    method=GetUpdates(**payload), message=body.get("description") or "Unauthorized"
+                )
+            logger.warning("getUpdates failed: %s", body.get("description"))
+            await asyncio.sleep((body.get("parameters") or {}).get("retry_after", delay))
+            delay = min(delay * 2, backoff_max)
+            continue
+        delay = backoff_max / 10
+        for update in body["result"]:
+            offset = update["update_id"] + 1
+            yield update
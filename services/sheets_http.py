@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+import requests
+from google.auth.credentials import Credentials
+from google.auth.transport.requests import AuthorizedSession, Request
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+from urllib3.exceptions import NewConnectionError
+
+from services.metrics import SHEETS_RETRIES
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive")
+SHEETS_API_ROOT = "https://sheets.googleapis.com"
+
+_RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+# Statuses that mean the request was turned away unprocessed, so even an append may be resent.
+_UNPROCESSED_STATUSES = frozenset({408, 429})
+_IDEMPOTENT_METHODS = frozenset({"get", "head", "options", "put", "delete"})
+
+
+@dataclass(slots=True)
+class SheetsHTTPOptions:
+    """Connection pool, timeout, retry and token refresh settings of the Sheets HTTP session."""
+
+    pool_size: int = 4
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    # Seconds one request may take, retries and waits included; no retry starts that could end later.
+    deadline: Optional[float] = None
+    # Refresh the access token this many seconds before it expires.
+    token_refresh_margin: float = 300.0
+    # Replaces https://sheets.googleapis.com, e.g. to point the client at a local fake server.
+    api_root: Optional[str] = None
+
+
+class SheetsSession(AuthorizedSession):
+    """Authorized session with a keep-alive pool sized for every Sheets worker thread.
+
+    Token requests go through a plain session on the same adapter: refreshing
+    through the authorized session itself would refresh once more first.
+    """
+
+    def __init__(self, credentials: Credentials, options: SheetsHTTPOptions) -> None:
+        # Retries are done by SheetsHTTPClient, where they can be jittered and counted.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(options.pool_size, 1), max_retries=0)
+        self._token_session = requests.Session()
+        self._token_session.mount("https://", adapter)
+        self._token_session.mount("http://", adapter)
+        self._token_request = Request(self._token_session)
+        super().__init__(
+            credentials,
+            auth_request=self._token_request,
+            refresh_timeout=options.connect_timeout + options.read_timeout,
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def refresh_token(self) -> None:
+        self.credentials.refresh(self._token_request)
+
+    def close(self) -> None:
+        super().close()
+        self._token_session.close()
+
+
+def _never_sent(exc: Exception) -> bool:
+    """Whether the connection failed before any of the request was sent."""
+    if isinstance(exc, ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def seconds_until_refresh(credentials: Credentials, margin: float) -> Optional[float]:
+    """Seconds until the token should be refreshed; ``None`` for credentials without an expiry."""
+    if credentials.expiry is None:
+        return None
+    # google-auth keeps expiry as naive UTC.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return max((credentials.expiry.replace(tzinfo=None) - now).total_seconds() - margin, 0.0)
+
+
+class SheetsHTTPClient(HTTPClient):
+    """gspread HTTP client with explicit timeouts and jittered retries on 429, 408 and 5xx.
+
+    A retry waits ``Retry-After`` when the server sends one, otherwise a
+    random delay up to ``backoff_base * 2**attempt`` (capped at
+    ``backoff_max``), so workers that failed together do not retry together.
+    Connection errors and timeouts are retried the same way. Requests that
+    are not idempotent, like ``values:append``, are only retried when the
+    server turned them away (408, 429) or the connection failed before they
+    were sent: after a 5xx or a read timeout the rows may already be in the
+    sheet. No retry starts that could not finish by ``deadline``; a
+    ``Retry-After`` beyond it fails the request instead. ``on_retry``
+    receives the failed status; the default bumps ``bot_sheets_retries_total``
+    directly, so pass a loop-bound callback when running on worker threads.
+    """
+
+    def __init__(
+        self,
+        auth: Credentials,
+        session: Optional[SheetsSession] = None,
+        options: Optional[SheetsHTTPOptions] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Callable[[], float] = random.random,
+        on_retry: Callable[[str], None] = SHEETS_RETRIES.inc,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._options = options or SheetsHTTPOptions()
+        super().__init__(auth, session or SheetsSession(auth, self._options))
+        self.auth = auth
+        self.set_timeout((self._options.connect_timeout, self._options.read_timeout))
+        self._sleep = sleep
+        self._rng = rng
+        self._on_retry = on_retry
+        self._clock = clock
+
+    def request(self, method: str, endpoint: str, *args: Any, **kwargs: Any) -> requests.Response:
+        if self._options.api_root and endpoint.startswith(SHEETS_API_ROOT):
+            endpoint = self._options.api_root.rstrip("/") + endpoint[len(SHEETS_API_ROOT) :]
+        idempotent = method.lower() in _IDEMPOTENT_METHODS
+        started = self._clock()
+        attempt = 0
+        while True:
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as exc:
+                status: Any = exc.response.status_code
+                if status not in _RETRY_STATUSES or not (idempotent or status in _UNPROCESSED_STATUSES):
+                    raise
+                error: Exception = exc
+                retry_after = exc.response.headers.get("Retry-After")
+            except (ConnectionError, Timeout) as exc:
+                if not (idempotent or _never_sent(exc)):
+                    raise
+                error, status, retry_after = exc, type(exc).__name__, None
+            if attempt >= self._options.max_retries:
+                raise error
+            delay = self._delay(attempt, retry_after)
+            if not self._fits_deadline(started, delay):
+                logger.info("Sheets %s %s failed with %s, no time left to retry in %.2fs", method.upper(), endpoint, status, delay)
+                raise error
+            attempt += 1
+            self._on_retry(str(status))
+            logger.info("Sheets %s %s failed with %s, retry %d in %.2fs", method.upper(), endpoint, status, attempt, delay)
+            self._sleep(delay)
+
+    def _fits_deadline(self, started: float, delay: float) -> bool:
+        if self._options.deadline is None:
+            return True
+        attempt = self._options.connect_timeout + self._options.read_timeout
+        return self._clock() - started + delay + attempt <= self._options.deadline
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                # The server's wait is honored as is; the deadline decides whether it is worth it.
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                pass
+        return self._rng() * min(self._options.backoff_base * 2**attempt, self._options.backoff_max)
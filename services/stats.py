@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Sequence
+
+from services.analytics import SurveyReport, count_journal_rows, iter_journal_rows
+from services.google_sheets import HEADERS, schema_hash
+
+logger = logging.getLogger(__name__)
+
+
+class SurveyStats:
+    """Running survey aggregates, updated in O(1) for every journaled row.
+
+    The counters are written to ``snapshot_file`` every ``snapshot_interval``
+    seconds (when they changed) and on close. :meth:`load` restores the
+    snapshot and replays only the journal rows added after it, so ``/stats``
+    never has to scan the sheet.
+    """
+
+    def __init__(
+        self,
+        snapshot_file: Optional[Path] = None,
+        snapshot_interval: float = 60.0,
+        report: Optional[SurveyReport] = None,
+    ) -> None:
+        self._snapshot_file = snapshot_file
+        self._snapshot_interval = snapshot_interval
+        self._report = report or SurveyReport()
+        self._dirty = False
+        self._task: Optional[asyncio.Task[None]] = None
+        self._closing = asyncio.Event()
+
+    @property
+    def report(self) -> SurveyReport:
+        return self._report
+
+    def add(self, row: Sequence[str]) -> None:
+        self._report.add(row)
+        self._dirty = True
+
+    def load(self, journal: Path) -> int:
+        """Restore the snapshot and catch up from ``journal``; return how many rows were replayed."""
+        report = self._read_snapshot() or SurveyReport()
+        if journal.exists() and report.total > count_journal_rows(journal):
+            # The journal was reset behind the snapshot's back; start over.
+            logger.warning("Stats snapshot is ahead of %s, rebuilding from the journal", journal)
+            report = SurveyReport()
+        replayed = 0
+        if journal.exists():
+            for row in iter_journal_rows(journal, skip=report.total):
+                report.add(row)
+                replayed += 1
+        self._report = report
+        self._dirty = replayed > 0
+        return replayed
+
+    def snapshot(self) -> None:
+        """Write the counters to ``snapshot_file`` right away; blocks on file I/O."""
+        if self._snapshot_file is not None:
+            self._write(self._payload())
+
+    async def snapshot_async(self) -> None:
+        """Like :meth:`snapshot`, but the file is written on a worker thread."""
+        if self._snapshot_file is not None:
+            # Serialized here, so the thread never sees counters the loop is updating.
+            await asyncio.to_thread(self._write, self._payload())
+
+    def _payload(self) -> str:
+        self._dirty = False
+        return json.dumps({"schema": schema_hash(HEADERS), "report": self._report.to_dict()}, ensure_ascii=False)
+
+    def _write(self, payload: str) -> None:
+        assert self._snapshot_file is not None
+        self._snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._snapshot_file.with_name(self._snapshot_file.name + ".tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, self._snapshot_file)
+
+    def start(self) -> None:
+        if self._task is None and self._snapshot_file is not None:
+            self._closing.clear()
+            self._task = asyncio.create_task(self._run(), name="survey-stats-snapshot")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._closing.set()
+            await self._task
+            self._task = None
+        if self._dirty:
+            await self.snapshot_async()
+
+    async def _run(self) -> None:
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), timeout=self._snapshot_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._dirty and not self._closing.is_set():
+                try:
+                    await self.snapshot_async()
+                except OSError as exc:
+                    self._dirty = True
+                    logger.warning("Failed to write stats snapshot: %s", exc)
+
+    def _read_snapshot(self) -> Optional[SurveyReport]:
+        if self._snapshot_file is None or not self._snapshot_file.exists():
+            return None
+        try:
+            data = json.loads(self._snapshot_file.read_text(encoding="utf-8"))
+            if data.get("schema") != schema_hash(HEADERS):
+                return None
+            return SurveyReport.from_dict(data["report"])
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("Ignoring unreadable stats snapshot %s: %s", self._snapshot_file, exc)
+            return None
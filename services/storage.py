@@ -1,27 +1,134 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Set, Tuple
 
-from services.excel_backup import append_to_excel
-from services.google_sheets import HEADERS, GoogleSheetsClient, build_row
+from services.dedup import SubmissionIndex
+from services.excel_backup import ExcelBackup
+from services.google_sheets import build_row
+from services.metrics import SURVEY_COMPLETED
+from services.outbox import APPEND, REPLACE, Outbox
+from services.replicator import SheetsReplicator
+from services.stats import SurveyStats
+
+if TYPE_CHECKING:  # pyarrow is optional
+    from services.parquet_archive import ParquetArchive
 
 logger = logging.getLogger(__name__)
 
 
+class DuplicateSubmissionError(RuntimeError):
+    """The user (or student ID) already submitted and the dedup policy is ``reject``."""
+
+
+def submission_key(data: Dict[str, Any], user_id: int) -> str:
+    """Idempotency key of a submission: the same answers from the same user map to one key."""
+    payload = json.dumps({"user_id": user_id, "data": data}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 @dataclass(slots=True)
 class SurveyStorage:
-    sheets_client: GoogleSheetsClient
-    local_excel_file: Optional[Path] = None
+    outbox: Outbox
+    replicator: SheetsReplicator
+    excel_backup: Optional[ExcelBackup] = None
+    dedup_index: Optional[SubmissionIndex] = None
+    dedup_policy: str = "append"
+    stats: Optional[SurveyStats] = None
+    archive: Optional["ParquetArchive"] = None
+
+    def rejects(self, user_id: int, student_id: Optional[str] = None) -> bool:
+        """Whether a submission from this user/student ID would be refused by the ``reject`` policy."""
+        if self.dedup_index is None or self.dedup_policy != "reject":
+            return False
+        return self.dedup_index.contains(user_id, student_id)
+
+    @property
+    def journal_path(self) -> Path:
+        return self.outbox.path
 
     async def persist(self, data: Dict[str, Any], user_id: int, username: Optional[str]) -> None:
         row = build_row(data, user_id, username)
-        await self.sheets_client.append_row(row)
+        await self.persist_row(submission_key(data, user_id), row, user_id, data.get("student_university_id"))
+
+    async def persist_row(self, key: str, row: List[str], user_id: int, student_id: Optional[str]) -> bool:
+        """Store a row built by :func:`build_row`; return ``False`` if ``key`` was already journaled."""
+        mode = APPEND
+        if self.dedup_index is not None and self.dedup_index.contains(user_id, student_id):
+            if self.dedup_policy == "reject":
+                raise DuplicateSubmissionError(f"User {user_id} has already submitted the survey")
+            if self.dedup_policy == "overwrite":
+                mode = REPLACE
+
+        if not await self.outbox.add(key, row, mode):
+            logger.info("Submission from user %s is already journaled, skipping", user_id)
+            return False
+        if self.dedup_index is not None:
+            self.dedup_index.add(user_id, student_id)
+        if self.stats is not None:
+            self.stats.add(row)
+        SURVEY_COMPLETED.inc()
+        self.replicator.notify()
+
+        if self.excel_backup:
+            try:
+                await self.excel_backup.append(row)
+            except Exception as exc:
+                logger.warning("Failed to append to Excel backup: %s", exc)
+        if self.archive:
+            await self.archive.append(row)
+        return True
+
+    async def persist_rows(self, items: Sequence[Tuple[str, List[str], int, Optional[str]]]) -> int:
+        """Store many ``(key, row, user_id, student_id)`` items at once, e.g. for an import.
+
+        The batch is journaled in one transaction and mirrored to the Excel
+        backup with one write. Rows the ``reject`` policy refuses are skipped
+        instead of raising. Returns how many rows were journaled.
+        """
+        batch = []
+        batch_digests = []
+        # Keys of this batch: the index itself only learns about rows once they are journaled.
+        seen: Set[int] = set()
+        for key, row, user_id, student_id in items:
+            mode = APPEND
+            digests: Tuple[int, ...] = ()
+            if self.dedup_index is not None:
+                digests = self.dedup_index.digests(user_id, student_id)
+                if self.dedup_index.contains_digests(digests) or not seen.isdisjoint(digests):
+                    if self.dedup_policy == "reject":
+                        continue
+                    if self.dedup_policy == "overwrite":
+                        mode = REPLACE
+                seen.update(digests)
+            batch.append((key, row, mode))
+            batch_digests.append(digests)
+        if not batch:
+            return 0
+        added = await self.outbox.add_many(batch)
+        rows = [row for (_, row, _), was_added in zip(batch, added) if was_added]
+        if self.dedup_index is not None:
+            # Only rows that really went in; a failed or skipped row must not block the user later.
+            for digests, was_added in zip(batch_digests, added):
+                if was_added:
+                    self.dedup_index.add_digests(digests)
+        if not rows:
+            return 0
+        if self.stats is not None:
+            for row in rows:
+                self.stats.add(row)
+        self.replicator.notify()
 
-        if self.local_excel_file:
+        if self.excel_backup:
             try:
-                append_to_excel(self.local_excel_file, HEADERS, row)
+                await self.excel_backup.append_rows(rows)
             except Exception as exc:
                 logger.warning("Failed to append to Excel backup: %s", exc)
+        if self.archive:
+            for row in rows:
+                await self.archive.append(row)
+        return len(rows)
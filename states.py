@@ -18,3 +18,13 @@ class Reg(StatesGroup):
     recommendation = State()
     uni_improvement = State()
     finished = State()
+
+
+# Inline keyboard callback prefixes and the state whose question each one answers.
+CALLBACK_STATES = {
+    "employed": Reg.is_employed,
+    "share": Reg.share_with_employer,
+    "region": Reg.region,
+    "rating": Reg.uni_rating,
+    "recommend": Reg.recommendation,
+}
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import itertools
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import EditMessageText, SendMessage, TelegramMethod
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage
+from aiogram.types import Chat, Message
+
+from handlers import admin_router, start_router, survey_router
+from middlewares import ActivityMiddleware, FSMCacheMiddleware, HandlerMetricsMiddleware, StaleCallbackMiddleware
+from services.reminders import SessionScheduler
+from states import CALLBACK_STATES
+
+_update_ids = itertools.count(1)
+
+
+class FakeSession(BaseSession):
+    """Bot session that records API calls instead of talking to Telegram."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests: List[TelegramMethod[Any]] = []
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        self.requests.append(method)
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return Message(
+                message_id=method.message_id if isinstance(method, EditMessageText) else 1,
+                date=datetime.now(),
+                chat=Chat(id=int(method.chat_id or 0), type="private"),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:  # pragma: no cover
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class NullSheets:
+    """Sheets sink for ``SheetsReplicator`` that accepts and drops every row."""
+
+    async def append_rows(self, rows: Sequence[Sequence[str]]) -> None:
+        pass
+
+    async def replace_rows(self, rows: Sequence[Sequence[str]]) -> None:
+        pass
+
+    async def get_rows(self) -> List[List[str]]:
+        return []
+
+
+class RecordingSurveyStorage:
+    """Stand-in for ``SurveyStorage`` that keeps persisted submissions in memory."""
+
+    def __init__(self) -> None:
+        self.persisted: List[tuple[Dict[str, Any], int, Optional[str]]] = []
+
+    def rejects(self, user_id: int, student_id: Optional[str] = None) -> bool:
+        return False
+
+    async def persist(self, data: Dict[str, Any], user_id: int, username: Optional[str]) -> None:
+        self.persisted.append((data, user_id, username))
+
+
+def make_dispatcher(
+    storage: BaseStorage,
+    events_isolation: Optional[BaseEventIsolation] = None,
+    scheduler: Optional[SessionScheduler] = None,
+) -> Dispatcher:
+    """Dispatcher wired like ``main()``, reattaching the module-level routers.
+
+    With ``scheduler``, stale button presses are dropped and activity is reported to it.
+    """
+    dp = Dispatcher(storage=storage, events_isolation=events_isolation, disable_fsm=True)
+    if scheduler is not None:
+        dp.update.outer_middleware(StaleCallbackMiddleware(scheduler, CALLBACK_STATES))
+    FSMCacheMiddleware.setup(dp)
+    if scheduler is not None:
+        dp.update.outer_middleware(ActivityMiddleware(scheduler))
+    HandlerMetricsMiddleware.setup(dp)
+    root = Router()
+    for router in (admin_router, start_router, survey_router):
+        router._parent_router = None
+    root.include_routers(admin_router, start_router, survey_router)
+    dp.include_router(root)
+    return dp
+
+
+@pytest.fixture
+def bot() -> Bot:
+    return Bot(token="42:TEST", session=FakeSession())
+
+
+def message_update(user_id: int, text: Optional[str] = None, contact: bool = False) -> Dict[str, Any]:
+    message: Dict[str, Any] = {
+        "message_id": next(_update_ids),
+        "date": int(datetime.now().timestamp()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Test", "username": f"user{user_id}"},
+    }
+    if contact:
+        message["contact"] = {"phone_number": "+998901234567", "first_name": "Test", "user_id": user_id}
+    else:
+        message["text"] = text or ""
+        if text and text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next(_update_ids), "message": message}
+
+
+def callback_update(user_id: int, data: str) -> Dict[str, Any]:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "chat_instance": str(user_id),
+            "data": data,
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "message": {
+                "message_id": 1,
+                "date": int(datetime.now().timestamp()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "question",
+            },
+        },
+    }
+
+
+def survey_updates(user_id: int) -> List[Dict[str, Any]]:
+    """Updates of one user walking the whole survey, including callback queries."""
+    return [
+        message_update(user_id, "/start"),
+        message_update(user_id, "en"),
+        message_update(user_id, contact=True),
+        message_update(user_id, "John"),
+        message_update(user_id, "Doe"),
+        message_update(user_id, "SE12345"),
+        callback_update(user_id, "employed:yes"),
+        message_update(user_id, "Acme"),
+        message_update(user_id, "Developer"),
+        callback_update(user_id, "region:toshkent_shahri"),
+        callback_update(user_id, "rating:5"),
+        callback_update(user_id, "recommend:absolutely"),
+        message_update(user_id, "More labs"),
+    ]
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendDocument
+
+from services.analytics import build_report, iter_journal_rows, main
+from services.google_sheets import build_row
+from services.outbox import Outbox
+from tests.conftest import make_dispatcher, message_update
+
+
+def _answers(region: str, rating: int, employed: bool) -> dict:
+    return {
+        "language": "en",
+        "student_university_id": "SE1",
+        "is_employed": employed,
+        "region": region,
+        "uni_rating": rating,
+        "recommend_answer": "yes",
+    }
+
+
+@pytest.fixture
+def journal(tmp_path):
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    samples = [("toshkent", 5, True), ("toshkent", 3, False), ("samarqand", 4, True)]
+    for idx, (region, rating, employed) in enumerate(samples):
+        asyncio.run(outbox.add(f"k{idx}", build_row(_answers(region, rating, employed), idx, None)))
+    yield outbox
+    outbox.close()
+
+
+def test_journal_is_streamed_in_chunks(journal) -> None:
+    rows = list(iter_journal_rows(journal.path, chunk_size=2))
+
+    assert [row[2] for row in rows] == ["0", "1", "2"]
+
+
+def test_report_aggregates(journal) -> None:
+    report = build_report(iter_journal_rows(journal.path))
+
+    assert report.total == 3
+    assert report.regions == {"toshkent": 2, "samarqand": 1}
+    assert report.employment_rate == pytest.approx(2 / 3)
+    assert report.mean_rating_by_region() == {"toshkent": 4.0, "samarqand": 4.0}
+    assert report.recommendations == {"Ha": 3}
+    assert "mean_rating_by_region,toshkent,4.00" in report.to_csv().splitlines()
+
+
+def test_cli_writes_report(journal, tmp_path) -> None:
+    out = tmp_path / "report.csv"
+
+    assert main(["--path", str(journal.path), "--out", str(out)]) == 0
+    assert out.read_text(encoding="utf-8").splitlines()[:2] == ["metric,key,value", "total,,3"]
+
+
+@pytest.mark.asyncio
+async def test_export_is_admin_only(journal, bot) -> None:
+    dp = make_dispatcher(MemoryStorage())
+    storage = SimpleNamespace(journal_path=journal.path, rejects=lambda *args: False)
+
+    await dp.feed_raw_update(bot, message_update(1, "/export"), survey_storage=storage, admin_ids=frozenset({2}))
+    assert not any(isinstance(method, SendDocument) for method in bot.session.requests)
+
+    await dp.feed_raw_update(bot, message_update(2, "/export"), survey_storage=storage, admin_ids=frozenset({2}))
+    documents = [method for method in bot.session.requests if isinstance(method, SendDocument)]
+    assert len(documents) == 1
+    assert documents[0].document.data.decode("utf-8").startswith("metric,key,value")
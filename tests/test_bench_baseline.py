@@ -0,0 +1,37 @@
+import argparse
+
+import pytest
+
+from benchmarks import baseline
+
+HIGHER = ("updates_per_second",)
+LOWER = ("p99_ms", "bytes_per_session")
+
+
+@pytest.fixture
+def recorded():
+    return {"updates_per_second": 1000, "p99_ms": 5.0, "bytes_per_session": 4000}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance(recorded) -> None:
+    faster = dict(recorded, updates_per_second=1100, p99_ms=4.0)
+    slower = dict(recorded, updates_per_second=700, p99_ms=7.0, bytes_per_session=4200)
+
+    assert baseline.compare(faster, recorded, 0.1, HIGHER, LOWER) == []
+    assert baseline.compare(slower, recorded, 0.1, HIGHER, LOWER) == [
+        "updates_per_second 700 < baseline 1000",
+        "p99_ms 7.0 > baseline 5.0",
+    ]
+
+
+def test_report_saves_then_checks_against_the_baseline(recorded, tmp_path, capsys) -> None:
+    parser = argparse.ArgumentParser()
+    baseline.add_arguments(parser, "example")
+    path = tmp_path / "example.json"
+
+    assert baseline.report(recorded, parser.parse_args(["--baseline", str(path), "--save"]), HIGHER, LOWER) == 0
+    args = parser.parse_args(["--baseline", str(path)])
+    assert baseline.report(dict(recorded, updates_per_second=900), args, HIGHER, LOWER) == 0
+    assert baseline.report(dict(recorded, updates_per_second=500), args, HIGHER, LOWER) == 1
+    assert "REGRESSION: updates_per_second 500 < baseline 1000" in capsys.readouterr().err
+    assert parser.parse_args([]).baseline.name == "example.json"
@@ -0,0 +1,9 @@
+from benchmarks.bench_bulk_import import run_bench
+
+
+def test_bench_normalizes_identically_and_journals_every_row() -> None:
+    result = run_bench(rows=200, batch_size=50)
+
+    assert result["journaled"] == 200
+    assert result["speedup"] > 0
+    assert result["import_rows_per_second"] > 0
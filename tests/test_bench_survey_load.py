@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.bench_survey_load import run_load
+from services.storage import SurveyStorage
+
+
+def test_load_harness_replays_full_sessions() -> None:
+    result = run_load(users=3, memory_users=2)
+
+    assert result["updates"] == 3 * 13
+    assert result["p99_ms"] >= result["p50_ms"] > 0
+    assert result["bytes_per_session"] > 0
+
+
+def test_load_harness_refuses_runs_with_failed_sessions(monkeypatch) -> None:
+    async def fail(self, data, user_id, username) -> None:
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(SurveyStorage, "persist", fail)
+
+    with pytest.raises(RuntimeError, match="0 of 2 sessions were journaled and 2 user"):
+        run_load(users=2, memory_users=1)
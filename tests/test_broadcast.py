@@ -0,0 +1,113 @@
+import asyncio
+from typing import Any, AsyncIterator, Iterable, List, Optional
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage, TelegramMethod
+
+from services.broadcast import Broadcaster, journal_recipients
+from services.google_sheets import HEADERS
+from services.outbox import Outbox
+from tests.conftest import FakeSession, make_dispatcher, message_update
+
+
+class BroadcastSession(FakeSession):
+    """Blocks some chats, rate-limits others once and can hold a chat until released."""
+
+    def __init__(self, blocked: Iterable[int] = (), flooded: Iterable[int] = (), held: Optional[int] = None) -> None:
+        super().__init__()
+        self.blocked = set(blocked)
+        self.flooded = set(flooded)
+        self.held = held
+        self.release = asyncio.Event()
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id == self.held:
+            await self.release.wait()
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(method=method, message="bot was blocked by the user")
+        if chat_id in self.flooded:
+            self.flooded.discard(chat_id)
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+        return await super().make_request(bot, method, timeout)
+
+    def sent_to(self) -> List[int]:
+        return [method.chat_id for method in self.requests if isinstance(method, SendMessage)]
+
+
+def _source(*user_ids: int):
+    async def recipients() -> AsyncIterator[int]:
+        for user_id in user_ids:
+            yield user_id
+
+    return recipients
+
+
+@pytest.mark.asyncio
+async def test_broadcast_counts_outcomes_and_skips_duplicates(tmp_path) -> None:
+    session = BroadcastSession(blocked={3}, flooded={4})
+    bot = Bot(token="42:TEST", session=session)
+    broadcaster = Broadcaster(tmp_path, _source(1, 2, 2, 3, 4), rate=1000, concurrency=3)
+    progress = broadcaster.create("Reunion on Friday", notify_chat_id=99)
+
+    await broadcaster.start(bot, progress)
+
+    assert (progress.delivered, progress.blocked, progress.failed) == (3, 1, 0)
+    assert progress.done and progress.position == 4
+    assert sorted(session.sent_to()) == [1, 2, 4, 99]
+    assert session.requests[-1].text == progress.summary()
+    assert broadcaster.checkpoints()[0].done
+
+
+@pytest.mark.asyncio
+async def test_interrupted_broadcast_resumes_from_checkpoint(tmp_path) -> None:
+    session = BroadcastSession(held=3)
+    bot = Bot(token="42:TEST", session=session)
+    broadcaster = Broadcaster(tmp_path, _source(1, 2, 3, 4), rate=1000, concurrency=1)
+    progress = broadcaster.create("Hello")
+    broadcaster.start(bot, progress)
+    while session.sent_to() != [1, 2]:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+    await broadcaster.close()
+
+    [saved] = broadcaster.checkpoints()
+    assert (saved.position, saved.delivered, saved.done) == (2, 2, False)
+
+    session.release.set()
+    restarted = Broadcaster(tmp_path, _source(1, 2, 3, 4), rate=1000, concurrency=1)
+    [resumed] = restarted.resume(bot)
+    await asyncio.gather(*restarted._running.values())
+
+    assert session.sent_to() == [1, 2, 3, 4]
+    assert (resumed.delivered, resumed.done) == (4, True)
+
+
+@pytest.mark.asyncio
+async def test_journal_recipients_stream_user_ids(tmp_path) -> None:
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    try:
+        for idx, user_id in enumerate((5, 6, 5)):
+            row = [""] * len(HEADERS)
+            row[HEADERS.index("telegram_user_id")] = str(user_id)
+            await outbox.add(f"k{idx}", row)
+        assert [user_id async for user_id in journal_recipients(outbox.path, chunk_size=2)] == [5, 6, 5]
+    finally:
+        outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_command_starts_and_reports(tmp_path, bot) -> None:
+    broadcaster = Broadcaster(tmp_path, _source(10, 11), rate=1000)
+    dp = make_dispatcher(MemoryStorage())
+
+    update = message_update(2, "/broadcast See you at the reunion")
+    await dp.feed_raw_update(bot, update, admin_ids=frozenset({2}), broadcaster=broadcaster)
+    await asyncio.gather(*broadcaster._running.values())
+
+    texts = [(method.chat_id, method.text) for method in bot.session.requests if isinstance(method, SendMessage)]
+    assert (10, "See you at the reunion") in texts and (11, "See you at the reunion") in texts
+    assert texts[-1][1].endswith("delivered 2, blocked 0, failed 0")
@@ -0,0 +1,164 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from services.bulk_import import (
+    import_frame,
+    main,
+    normalize_bools,
+    normalize_frame,
+    normalize_phones,
+    normalize_recommendations,
+    normalize_row,
+    read_table,
+)
+from services.dedup import SubmissionIndex
+from services.google_sheets import HEADERS, format_bool_uz, format_phone, format_recommend_answer, parse_bool_uz
+from services.outbox import Outbox
+from services.replicator import SheetsReplicator
+from services.stats import SurveyStats
+from services.storage import SurveyStorage
+from tests.conftest import NullSheets
+
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import given, settings  # noqa: E402
+from hypothesis import strategies as st  # noqa: E402
+
+_SEPARATORS = st.sampled_from(["", " ", "-", "(", ")", "+", ".", " "])
+# ASCII digits, plus full-width, Arabic-Indic and superscript ones that format_phone drops like any separator.
+_DIGITS = st.sampled_from(list("0123456789") + ["８", "٩", "²", "9", "8"])
+_PHONES = st.one_of(
+    st.lists(st.one_of(_DIGITS, _SEPARATORS), max_size=20).map("".join),
+    st.builds(lambda prefix, rest: prefix + rest, st.sampled_from(["+998", "998", "8", "", "+7"]), st.text("0123456789 -", max_size=14)),
+    st.text(max_size=16),
+    st.none(),
+)
+_ANSWERS = st.one_of(
+    st.builds(
+        lambda word, upper, pad: (word.upper() if upper else word).join([pad, pad]),
+        st.sampled_from(["ha", "yes", "no", "yoq", "yo‘q", "yo'q", "absolutely", "albatta", "true", "0", "1", "Yo‘q", "maybe"]),
+        st.booleans(),
+        st.sampled_from(["", " ", "\t", " ", "\x1c"]),
+    ),
+    st.text(max_size=10),
+    st.none(),
+)
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.lists(_PHONES, max_size=40))
+def test_vectorized_phones_match_format_phone(values) -> None:
+    assert normalize_phones(pd.Series(values, dtype=object)).tolist() == [format_phone(value) for value in values]
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.lists(_ANSWERS, max_size=40))
+def test_vectorized_answers_match_the_per_row_formatters(values) -> None:
+    series = pd.Series(values, dtype=object)
+    assert normalize_recommendations(series).tolist() == [format_recommend_answer(value) for value in values]
+    assert normalize_bools(series).tolist() == [format_bool_uz(parse_bool_uz(value)) for value in values]
+
+
+@settings(max_examples=100, deadline=None)
+@given(
+    st.lists(
+        st.fixed_dictionaries(
+            {"telegram_user_id": st.text("0123456789", min_size=1, max_size=6), "phone": _PHONES},
+            optional={
+                "is_employed": _ANSWERS,
+                "share_with_employer": _ANSWERS,
+                "recommend_answer": _ANSWERS,
+                "first_name": st.text(max_size=8),
+            },
+        ),
+        min_size=1,
+        max_size=20,
+    )
+)
+def test_normalized_frame_matches_normalize_row(records) -> None:
+    frame = pd.DataFrame.from_records(records)
+    assert normalize_frame(frame).to_numpy().tolist() == [normalize_row(record) for record in records]
+
+
+def _legacy_csv(path) -> None:
+    frame = pd.DataFrame(
+        [
+            {"telegram_user_id": "11", "phone": "90 123 45 67", "is_employed": "yes", "recommend_answer": "ALBATTA", "uni_rating": "5", "student_university_id": "SE1"},
+            {"telegram_user_id": "12", "phone": "+998 (90) 123-45-67", "is_employed": "no", "recommend_answer": "no", "uni_rating": "", "date": "2024-06-01", "time": "09:00:00"},
+            {"telegram_user_id": "abc", "phone": "", "is_employed": "", "recommend_answer": "", "uni_rating": "9"},
+            {"telegram_user_id": "13", "phone": "", "is_employed": "perhaps", "recommend_answer": "", "uni_rating": "3"},
+            {"telegram_user_id": "14", "phone": "", "is_employed": "Ha", "recommend_answer": "", "uni_rating": "4", "student_university_id": "SE1"},
+        ]
+    )
+    frame.to_csv(path, index=False)
+
+
+@pytest.mark.asyncio
+async def test_import_validates_and_journals_in_batches(tmp_path) -> None:
+    _legacy_csv(tmp_path / "legacy.csv")
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    stats = SurveyStats()
+    storage = SurveyStorage(
+        outbox=outbox,
+        replicator=SheetsReplicator(outbox, NullSheets()),
+        dedup_index=SubmissionIndex(capacity=100),
+        dedup_policy="reject",
+        stats=stats,
+    )
+    frame = read_table(tmp_path / "legacy.csv")
+    now = datetime(2026, 10, 18, 12, 0, 0)
+    try:
+        result = await import_frame(storage, frame, batch_size=1, now=now)
+        rows = await outbox.rows()
+        again = await import_frame(SurveyStorage(outbox=outbox, replicator=storage.replicator), frame, now=now)
+    finally:
+        outbox.close()
+
+    assert (result.rows, result.invalid, result.journaled, result.skipped) == (5, 2, 2, 1)  # user 14 reuses SE1
+    assert [line for line, _ in result.problems] == [4, 5]
+    assert "telegram_user_id" in result.problems[0][1] and "uni_rating" in result.problems[0][1]
+    assert "is_employed is not yes/no" in result.problems[1][1]
+    column = {name: idx for idx, name in enumerate(HEADERS)}
+    assert [row[column["phone"]] for row in rows] == ["+998 90 123 45 67", "+998 90 123 45 67"]
+    assert [row[column["is_employed"]] for row in rows] == ["Ha", "Yo‘q"]
+    assert [row[column["recommend_answer"]] for row in rows] == ["Albatta", "Yo‘q"]
+    assert [(row[column["date"]], row[column["time"]]) for row in rows] == [("2026-10-18", "12:00:00"), ("2024-06-01", "09:00:00")]
+    assert stats.report.total == 2
+    assert (again.journaled, again.skipped) == (1, 2)  # only user 14, now without dedup; the others are journaled
+
+
+def test_cli_dry_run_reads_xlsx_and_writes_normalized_rows(tmp_path, capsys) -> None:
+    _legacy_csv(tmp_path / "legacy.csv")
+    pd.read_csv(tmp_path / "legacy.csv", dtype=str, keep_default_na=False).to_excel(tmp_path / "legacy.xlsx", index=False)
+
+    assert main(["--path", str(tmp_path / "legacy.xlsx"), "--dry-run", "--out", str(tmp_path / "out.csv")]) == 1
+    out = pd.read_csv(tmp_path / "out.csv", dtype=str, keep_default_na=False)
+    assert list(out.columns) == HEADERS
+    assert out["telegram_user_id"].tolist() == ["11", "12", "14"]
+    assert "5 row(s), 2 invalid, 0 journaled, 0 skipped" in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        main(["--path", str(tmp_path / "legacy.xlsx")])  # journaling needs the bot's storage
+
+
+def test_cli_fails_when_the_dedup_policy_skips_every_row(tmp_path, capsys) -> None:
+    _legacy_csv(tmp_path / "legacy.csv")
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    index = SubmissionIndex(capacity=100)
+    for user_id in (11, 12, 14):
+        index.add(user_id, None)
+
+    @asynccontextmanager
+    async def open_storage():
+        yield SurveyStorage(outbox=outbox, replicator=SheetsReplicator(outbox, NullSheets()), dedup_index=index, dedup_policy="reject")
+
+    try:
+        status = main(["--path", str(tmp_path / "legacy.csv")], open_storage)
+    finally:
+        outbox.close()
+
+    assert status == 1
+    captured = capsys.readouterr()
+    assert "5 row(s), 2 invalid, 0 journaled, 3 skipped" in captured.out
+    assert "Nothing was journaled" in captured.err and "DEDUP_POLICY=overwrite" in captured.err
@@ -0,0 +1,95 @@
+import pytest
+
+from services.dedup import BloomFilter, SubmissionIndex
+from services.google_sheets import HEADERS
+from services.outbox import APPEND, REPLACE, Outbox
+from services.storage import DuplicateSubmissionError, SurveyStorage
+
+
+def _row(user_id: str, student_id: str) -> list:
+    row = [""] * len(HEADERS)
+    row[HEADERS.index("telegram_user_id")] = user_id
+    row[HEADERS.index("student_university_id")] = student_id
+    return row
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(capacity=1000)
+    for value in range(1000):
+        bloom.add(value * 7919)
+
+    assert all(value * 7919 in bloom for value in range(1000))
+
+
+def test_index_matches_user_or_normalized_student_id() -> None:
+    index = SubmissionIndex(capacity=100)
+    assert index.warm([_row("42", "se-10000"), ["short"]]) == 2
+
+    assert index.contains(42)
+    assert index.contains(7, "SE10000")
+    assert not index.contains(7, "SE10001")
+    assert len(index) == 2
+
+
+class _Replicator:
+    def notify(self) -> None:
+        pass
+
+
+def _storage(tmp_path, policy: str) -> SurveyStorage:
+    index = SubmissionIndex(capacity=100)
+    index.add(42, "SE10000")
+    return SurveyStorage(
+        outbox=Outbox(tmp_path / "outbox.sqlite3"),
+        replicator=_Replicator(),
+        dedup_index=index,
+        dedup_policy=policy,
+    )
+
+
+@pytest.mark.asyncio
+async def test_reject_policy_refuses_repeat_submission(tmp_path) -> None:
+    storage = _storage(tmp_path, "reject")
+
+    assert storage.rejects(42)
+    with pytest.raises(DuplicateSubmissionError):
+        await storage.persist({"student_university_id": "SE99999"}, 42, None)
+    assert await storage.outbox.pending_count() == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("policy", "mode"), [("overwrite", REPLACE), ("append", APPEND)])
+async def test_other_policies_journal_with_matching_mode(tmp_path, policy, mode) -> None:
+    storage = _storage(tmp_path, policy)
+
+    assert not storage.rejects(42)
+    await storage.persist({"student_university_id": "SE10000"}, 7, None)
+    await storage.persist({"student_university_id": "SE20000"}, 8, None)
+
+    assert [pending.mode for pending in await storage.outbox.pending(10)] == [mode, APPEND]
+    assert storage.dedup_index.contains(8)
+
+
+@pytest.mark.asyncio
+async def test_bulk_rows_index_only_what_was_journaled(tmp_path, monkeypatch) -> None:
+    storage = _storage(tmp_path, "reject")
+    await storage.outbox.add("taken", _row("9", "SE90000"))
+
+    journaled = await storage.persist_rows(
+        [
+            ("a", _row("7", "SE70000"), 7, "SE70000"),
+            ("b", _row("7", "SE70001"), 7, "SE70001"),  # same user later in the batch
+            ("taken", _row("9", "SE90000"), 9, "SE90000"),  # key already journaled
+        ]
+    )
+    assert journaled == 1
+    assert storage.dedup_index.contains(7)
+    assert not storage.dedup_index.contains(9)
+
+    async def fail(items):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(storage.outbox, "add_many", fail)
+    with pytest.raises(OSError):
+        await storage.persist_rows([("c", _row("8", "SE80000"), 8, "SE80000")])
+    assert not storage.rejects(8, "SE80000")
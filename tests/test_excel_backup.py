@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+from openpyxl import load_workbook
+
+import services.excel_backup as excel_backup
+from services.excel_backup import ExcelBackup
+
+HEADERS = ["a", "b"]
+
+
+def _read(path):
+    sheet = load_workbook(path).active
+    return [[cell.value for cell in row] for row in sheet.iter_rows()]
+
+
+def test_compact_creates_workbook_with_header(tmp_path) -> None:
+    backup = ExcelBackup(tmp_path / "backup.xlsx", HEADERS)
+    backup.append_sync(["1", "2"])
+    backup.append_sync(["3"])
+
+    assert backup.compact() == 2
+    assert _read(backup.path) == [["a", "b"], ["1", "2"], ["3", None]]
+    assert not backup.segment_path.exists()
+
+
+def test_compact_appends_to_existing_workbook(tmp_path) -> None:
+    backup = ExcelBackup(tmp_path / "backup.xlsx", HEADERS)
+    backup.append_sync(["1", "2"])
+    backup.compact()
+    backup.append_sync(["3", "4"])
+    backup.compact()
+
+    assert _read(backup.path) == [["a", "b"], ["1", "2"], ["3", "4"]]
+    assert backup.compact() == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_are_not_interleaved(tmp_path) -> None:
+    backup = ExcelBackup(tmp_path / "backup.xlsx", HEADERS)
+    await asyncio.gather(*(backup.append([str(idx), "x" * 500]) for idx in range(50)))
+    await backup.close()
+
+    rows = _read(backup.path)[1:]
+    assert sorted(int(row[0]) for row in rows) == list(range(50))
+    assert all(row[1] == "x" * 500 for row in rows)
+
+
+def test_appends_do_not_wait_for_the_workbook_rewrite(tmp_path, monkeypatch) -> None:
+    backup = ExcelBackup(tmp_path / "backup.xlsx", HEADERS)
+    backup.append_sync(["1", "2"])
+    rewriting, release = threading.Event(), threading.Event()
+    real_workbook = excel_backup.Workbook
+
+    def slow_workbook():
+        rewriting.set()
+        release.wait(5)
+        return real_workbook()
+
+    monkeypatch.setattr(excel_backup, "Workbook", slow_workbook)
+    compaction = threading.Thread(target=backup.compact)
+    compaction.start()
+    assert rewriting.wait(5)
+
+    appender = threading.Thread(target=backup.append_sync, args=(["3", "4"],))
+    appender.start()
+    appender.join(2)
+    appended = not appender.is_alive()
+    release.set()
+    appender.join()
+    assert appended, "append waited for the workbook rewrite"
+    compaction.join()
+
+    assert _read(backup.path) == [["a", "b"], ["1", "2"]]
+    assert backup.compact() == 1
+    assert _read(backup.path)[-1] == ["3", "4"]
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.executors import BoundedExecutor, ExecutorSaturatedError
+from services.metrics import EXECUTOR_INFLIGHT, EXECUTOR_REJECTED
+from services.outbox import Outbox
+from services.storage import SurveyStorage
+
+
+@pytest.fixture
+def gate():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.mark.asyncio
+async def test_full_pool_rejects_new_calls(gate) -> None:
+    executor = BoundedExecutor("test-full", max_workers=1, max_queue=1)
+    running = asyncio.ensure_future(executor.run(gate.wait))
+    queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ExecutorSaturatedError):
+        await executor.run(lambda: "rejected")
+    assert EXECUTOR_REJECTED.value("test-full") == 1
+
+    gate.set()
+    assert await queued == "queued"
+    await running
+    await asyncio.sleep(0)
+    assert executor.inflight == 0
+    assert EXECUTOR_INFLIGHT.value("test-full") == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_blocking_pool_makes_callers_wait_for_a_slot(gate) -> None:
+    executor = BoundedExecutor("test-blocking", max_workers=1, max_queue=1, blocking=True)
+    running = asyncio.ensure_future(executor.run(gate.wait))
+    calls = [asyncio.ensure_future(executor.run(lambda idx=idx: idx)) for idx in range(5)]
+    await asyncio.sleep(0.01)
+    assert executor.inflight == 2
+    assert not any(call.done() for call in calls)
+
+    gate.set()
+    assert await asyncio.gather(*calls) == [0, 1, 2, 3, 4]
+    await running
+    assert EXECUTOR_REJECTED.value("test-blocking") == 0
+    executor.shutdown()
+
+
+class _Replicator:
+    def notify(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_burst_beyond_the_journal_pool_is_journaled_in_full(tmp_path) -> None:
+    executor = BoundedExecutor("test-journal", max_workers=1, max_queue=2, blocking=True)
+    outbox = Outbox(tmp_path / "outbox.sqlite3", executor)
+    storage = SurveyStorage(outbox=outbox, replicator=_Replicator())
+    try:
+        await asyncio.gather(*(storage.persist({"first_name": str(user_id)}, user_id, None) for user_id in range(50)))
+        rows = await outbox.rows()
+    finally:
+        outbox.close()
+        executor.shutdown()
+
+    assert len(rows) == 50
+
+
+@pytest.mark.asyncio
+async def test_timeout_and_cancel_drop_calls_that_have_not_started(gate) -> None:
+    executor = BoundedExecutor("test-cancel", max_workers=1, max_queue=5, timeout=0.05)
+    ran = []
+    blocker = asyncio.ensure_future(executor.run(gate.wait))
+    await asyncio.sleep(0)
+    with pytest.raises(asyncio.TimeoutError):
+        await executor.run(ran.append, "timed out")
+    waiting = asyncio.ensure_future(executor.run(ran.append, "cancelled"))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    await asyncio.sleep(0)
+
+    gate.set()
+    with pytest.raises(asyncio.TimeoutError):
+        await blocker
+    await asyncio.sleep(0.05)
+    assert ran == []
+    assert executor.inflight == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stalled_pool_does_not_starve_another(gate) -> None:
+    sheets = BoundedExecutor("test-sheets", max_workers=1)
+    files = BoundedExecutor("test-files", max_workers=1)
+    stalled = asyncio.ensure_future(sheets.run(gate.wait))
+
+    assert await asyncio.wait_for(files.run(lambda: "written"), timeout=1) == "written"
+
+    gate.set()
+    await stalled
+    sheets.shutdown()
+    files.shutdown()
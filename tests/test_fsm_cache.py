@@ -0,0 +1,68 @@
+from collections import Counter
+
+import pytest
+
+from services.fsm_storage import SQLiteStorage
+from tests.conftest import RecordingSurveyStorage, make_dispatcher, survey_updates
+
+
+class CountingStorage(SQLiteStorage):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.calls = Counter()
+
+    async def get_state(self, key):
+        self.calls["get_state"] += 1
+        return await super().get_state(key)
+
+    async def get_data(self, key):
+        self.calls["get_data"] += 1
+        return await super().get_data(key)
+
+    async def set_state(self, key, state=None):
+        self.calls["set_state"] += 1
+        await super().set_state(key, state)
+
+    async def set_data(self, key, data):
+        self.calls["set_data"] += 1
+        await super().set_data(key, data)
+
+    async def get_record(self, key):
+        self.calls["get_record"] += 1
+        return await super().get_record(key)
+
+    async def set_record(self, key, state, data):
+        self.calls["set_record"] += 1
+        await super().set_record(key, state, data)
+
+
+@pytest.mark.asyncio
+async def test_one_storage_read_and_write_per_update(tmp_path, bot) -> None:
+    storage = CountingStorage(tmp_path / "fsm.sqlite3")
+    dp = make_dispatcher(storage)
+    survey_storage = RecordingSurveyStorage()
+    updates = survey_updates(7)
+
+    for update in updates:
+        await dp.feed_raw_update(bot, update, survey_storage=survey_storage)
+
+    assert storage.calls == Counter(get_record=len(updates), set_record=len(updates))
+    [(data, user_id, _)] = survey_storage.persisted
+    assert user_id == 7
+    assert data["language"] == "en"
+    assert data["student_university_id"] == "SE12345"
+    assert data["uni_improvement_suggestions"] == "More labs"
+    assert await storage.get_record(dp.fsm.get_context(bot, 7, 7).key) == (None, {})
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_handlers_answer_in_user_language(tmp_path, bot) -> None:
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3")
+    dp = make_dispatcher(storage)
+
+    for update in survey_updates(8)[:4]:
+        await dp.feed_raw_update(bot, update, survey_storage=RecordingSurveyStorage())
+
+    assert bot.session.requests[-1].text == "Please enter your last name:"
+    await storage.close()
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from services.fsm_storage import KeyedEventIsolation, SQLiteStorage
+from states import Reg
+
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=3)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_storage_round_trip_survives_reopen(tmp_path) -> None:
+    path = tmp_path / "fsm.sqlite3"
+    storage = SQLiteStorage(path)
+    await storage.set_state(KEY, Reg.region)
+    await storage.update_data(KEY, {"language": "ru"})
+    await storage.close()
+
+    storage = SQLiteStorage(path)
+    assert await storage.get_state(KEY) == Reg.region.state
+    assert await storage.get_data(KEY) == {"language": "ru"}
+    await storage.set_state(KEY, None)
+    assert await storage.get_state(KEY) is None
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_storage_expires_idle_sessions(tmp_path, monkeypatch) -> None:
+    import services.fsm_storage as fsm_storage
+
+    now = [1000.0]
+    monkeypatch.setattr(fsm_storage.time, "time", lambda: now[0])
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3", ttl=60)
+    await storage.set_state(KEY, Reg.contact)
+    await storage.set_data(KEY, {"language": "en"})
+
+    now[0] += 61
+    assert await storage.get_state(KEY) is None
+    assert await storage.get_data(KEY) == {}
+
+    await storage.set_state(KEY, Reg.first_name)
+    assert await storage.get_data(KEY) == {}
+    assert await storage.purge_expired() == 0
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_storage_against_fake_server() -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    redis = fakeredis.FakeAsyncRedis()
+    storage = RedisStorage(redis, state_ttl=60, data_ttl=60)
+    await storage.set_state(KEY, Reg.region)
+    await storage.set_data(KEY, {"language": "uz"})
+
+    assert await storage.get_state(KEY) == Reg.region.state
+    assert await storage.get_data(KEY) == {"language": "uz"}
+    assert 0 < await redis.ttl("fsm:2:3:state") <= 60
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_keyed_isolation_orders_one_key_and_forgets_idle_keys() -> None:
+    isolation = KeyedEventIsolation()
+    first, second = StorageKey(bot_id=1, chat_id=1, user_id=1), StorageKey(bot_id=1, chat_id=2, user_id=2)
+    gate = asyncio.Event()
+    order = []
+
+    async def run(key: StorageKey, name: str, hold: bool = False) -> None:
+        async with isolation.lock(key):
+            order.append(f"{name}+")
+            if hold:
+                await gate.wait()
+            order.append(f"{name}-")
+
+    held = asyncio.create_task(run(first, "a1", hold=True))
+    queued = asyncio.create_task(run(first, "a2"))
+    await asyncio.sleep(0)
+    await run(second, "b1")
+    assert order == ["a1+", "b1+", "b1-"]
+    assert isolation.active_keys == 1
+
+    gate.set()
+    await asyncio.gather(held, queued)
+    assert order[3:] == ["a1-", "a2+", "a2-"]
+    assert isolation.active_keys == 0
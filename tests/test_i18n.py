@@ -1,4 +1,17 @@
-from i18n import t
+import json
+
+import pytest
+
+from i18n import (
+    TRANSLATIONS,
+    CatalogError,
+    compile_catalog,
+    language_choices,
+    load_catalogs,
+    resolve_language,
+    t,
+    translator,
+)
 
 
 def test_translation_supported_language() -> None:
@@ -11,3 +24,37 @@ def test_translation_fallback_to_uz_when_language_missing() -> None:
 
 def test_translation_missing_key_returns_key() -> None:
     assert t("uz", "nonexistent_key") == "nonexistent_key"
+
+
+def test_catalog_build_fails_fast_on_missing_keys() -> None:
+    translations = {"uz": {"a": "A", "b": "B"}, "ru": {"a": "А"}}
+
+    with pytest.raises(CatalogError, match="'ru' is missing keys: b"):
+        compile_catalog(translations)
+
+
+def test_bound_translator_falls_back_to_uz_for_unknown_language() -> None:
+    assert translator("ru")("ask_first_name") == "Введите ваше имя:"
+    assert translator("de")("ask_first_name") == "Ismingizni kiriting:"
+    assert translator("de").language == "uz"
+
+
+def test_external_catalog_adds_language(tmp_path) -> None:
+    strings = dict(TRANSLATIONS["en"], ask_first_name="Bitte Vornamen eingeben:")
+    (tmp_path / "de.json").write_text(json.dumps({"label": "Deutsch", "strings": strings}), encoding="utf-8")
+    try:
+        assert load_catalogs(tmp_path) == ("de",)
+        assert t("de", "ask_first_name") == "Bitte Vornamen eingeben:"
+        assert resolve_language("Deutsch") == "de"
+        assert ("Deutsch", "de") in language_choices()
+    finally:
+        load_catalogs(tmp_path / "missing")
+    assert resolve_language("de") is None
+
+
+def test_external_catalog_with_missing_keys_is_rejected(tmp_path) -> None:
+    (tmp_path / "de.json").write_text(json.dumps({"label": "Deutsch", "strings": {"thanks": "Danke"}}), encoding="utf-8")
+
+    with pytest.raises(CatalogError):
+        load_catalogs(tmp_path)
+    assert t("de", "thanks") == t("uz", "thanks")
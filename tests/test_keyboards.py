@@ -0,0 +1,48 @@
+import pytest
+from pydantic import ValidationError
+
+import keyboards
+
+
+def test_markups_are_shared_per_label() -> None:
+    assert keyboards.region_keyboard() is keyboards.region_keyboard()
+    assert keyboards.yes_no_inline("share", "Ha", "Yo‘q") is keyboards.yes_no_inline("share", "Ha", "Yo‘q")
+    assert keyboards.yes_no_inline("share", "Ha", "Yo‘q") is not keyboards.yes_no_inline("share", "Yes", "No")
+
+
+def test_cached_markup_matches_fresh_build() -> None:
+    cached = keyboards.recommendation_keyboard("Yes", "No", "Absolutely")
+    fresh = keyboards.recommendation_keyboard.__wrapped__("Yes", "No", "Absolutely")
+
+    assert cached.model_dump() == fresh.model_dump()
+    assert [button.callback_data for button in cached.inline_keyboard[0]] == [
+        "recommend:yes",
+        "recommend:no",
+        "recommend:absolutely",
+    ]
+
+
+def test_shared_markups_reject_assignment() -> None:
+    with pytest.raises(ValidationError):
+        keyboards.language_keyboard().one_time_keyboard = False
+
+
+def test_shared_rows_and_buttons_are_immutable() -> None:
+    markup = keyboards.region_keyboard()
+
+    with pytest.raises(AttributeError):
+        markup.inline_keyboard[0].append(markup.inline_keyboard[1][0])
+    with pytest.raises(TypeError):
+        markup.inline_keyboard[0][0] = markup.inline_keyboard[1][0]
+    with pytest.raises(ValidationError):
+        markup.inline_keyboard[0][0].callback_data = "region:elsewhere"
+    with pytest.raises(ValidationError):
+        keyboards.contact_keyboard("Share").keyboard[0][0].request_contact = False
+
+
+def test_frozen_rows_are_sent_as_lists() -> None:
+    markup = keyboards.yes_no_inline("share", "Ha", "Yo‘q")
+
+    assert markup.model_dump(exclude_none=True) == {
+        "inline_keyboard": [[{"text": "Ha", "callback_data": "share:yes"}, {"text": "Yo‘q", "callback_data": "share:no"}]]
+    }
@@ -0,0 +1,85 @@
+import io
+import json
+import logging
+
+import pytest
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import Settings
+from logging_config import JsonFormatter, SamplingFilter, setup_logging
+from middlewares import LoggingContextMiddleware
+from tests.conftest import RecordingSurveyStorage, make_dispatcher, message_update
+
+
+def _settings(**overrides) -> Settings:
+    return Settings(
+        bot_token="42:TEST",
+        google_service_account_file="creds.json",
+        google_sheet_id="sheet",
+        google_worksheet_name=None,
+        local_excel_file=None,
+        **overrides,
+    )
+
+
+@pytest.fixture
+def json_logs():
+    root = logging.getLogger()
+    saved = (root.handlers[:], root.level)
+    stream = io.StringIO()
+    listener = setup_logging(_settings(log_level="DEBUG", log_debug_sample=1.0), stream=stream)
+
+    def lines():
+        listener.stop()  # joins the listener thread, so everything queued has been written
+        listener.start()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield lines
+    listener.stop()
+    root.handlers[:], _ = saved
+    root.setLevel(saved[1])
+
+
+def test_records_go_through_the_listener_as_json_lines(json_logs) -> None:
+    logger = logging.getLogger("tests.logging")
+    logger.info("saved %d rows", 3)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+
+    first, second = [line for line in json_logs() if line["logger"] == "tests.logging"]
+    assert first["message"] == "saved 3 rows" and first["level"] == "INFO"
+    assert second["message"] == "failed" and "ValueError: boom" in second["exc_info"]
+
+
+@pytest.mark.asyncio
+async def test_update_context_is_attached(json_logs, bot) -> None:
+    dp = make_dispatcher(MemoryStorage())
+    dp.update.outer_middleware(LoggingContextMiddleware())
+    update = message_update(321, "/start")
+
+    await dp.feed_raw_update(bot, update, survey_storage=RecordingSurveyStorage())
+
+    [handled] = [line for line in json_logs() if line["message"].startswith("Update handled")]
+    assert handled["update_id"] == update["update_id"]
+    assert handled["user_id"] == 321
+    assert handled["elapsed_ms"] >= 0
+
+
+def test_sampling_only_drops_debug_records() -> None:
+    values = iter([0.05, 0.5, 0.05])
+    sampler = SamplingFilter(0.1, rng=lambda: next(values))
+
+    def record(level: int) -> logging.LogRecord:
+        return logging.LogRecord("x", level, __file__, 1, "msg", None, None)
+
+    assert sampler.filter(record(logging.DEBUG))
+    assert not sampler.filter(record(logging.DEBUG))
+    assert sampler.filter(record(logging.WARNING))
+    assert SamplingFilter(0.0).filter(record(logging.INFO))
+
+
+def test_json_formatter_skips_unset_context() -> None:
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "hi", None, None)
+    assert set(json.loads(JsonFormatter().format(record))) == {"ts", "level", "logger", "message"}
@@ -0,0 +1,70 @@
+import pytest
+
+from config import Settings
+from main import open_survey_storage
+from services.excel_backup import ExcelBackup
+from services.executors import BoundedExecutor
+from services.google_sheets import GoogleSheetsClient
+from services.outbox import Outbox
+from services.replicator import SheetsReplicator
+
+
+def _settings(tmp_path, **overrides) -> Settings:
+    overrides = {"local_excel_file": tmp_path / "backup.xlsx", "parquet_archive_dir": tmp_path / "archive", **overrides}
+    return Settings(
+        bot_token="42:TEST",
+        google_service_account_file=tmp_path / "missing.json",
+        google_sheet_id="sheet",
+        google_worksheet_name=None,
+        sheets_header_cache=tmp_path / "sheets_header.cache",
+        outbox_file=tmp_path / "outbox.sqlite3",
+        stats_snapshot_file=tmp_path / "stats.json",
+        **overrides,
+    )
+
+
+@pytest.mark.asyncio
+async def test_every_component_is_closed_when_one_close_fails(tmp_path, monkeypatch) -> None:
+    closed = []
+
+    async def failing_close(self) -> None:
+        raise TimeoutError("compaction is still running")
+
+    async def sheets_close(self) -> None:
+        closed.append("sheets client")
+
+    def shutdown(self, wait: bool = True) -> None:
+        closed.append(self.name)
+
+    monkeypatch.setattr(ExcelBackup, "close", failing_close)
+    monkeypatch.setattr(GoogleSheetsClient, "close", sheets_close)
+    monkeypatch.setattr(BoundedExecutor, "shutdown", shutdown)
+
+    with pytest.raises(TimeoutError):
+        async with open_survey_storage(_settings(tmp_path)) as (storage, _):
+            await storage.persist({"first_name": "Ann"}, 7, "ann")
+
+    assert list((tmp_path / "archive").rglob("*.parquet"))
+    assert closed == ["sheets client", "excel", "journal", "files", "sheets"]
+
+
+@pytest.mark.asyncio
+async def test_the_journal_is_closed_when_the_final_drain_fails(tmp_path, monkeypatch) -> None:
+    closed = []
+    outbox_close = Outbox.close
+
+    async def failing_close(self) -> None:
+        raise RuntimeError("disk I/O error")
+
+    def close_outbox(self) -> None:
+        closed.append("outbox")
+        outbox_close(self)
+
+    monkeypatch.setattr(SheetsReplicator, "close", failing_close)
+    monkeypatch.setattr(Outbox, "close", close_outbox)
+
+    with pytest.raises(RuntimeError, match="disk I/O error"):
+        async with open_survey_storage(_settings(tmp_path, local_excel_file=None, parquet_archive_dir=None)):
+            pass
+
+    assert closed == ["outbox"]
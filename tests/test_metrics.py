@@ -0,0 +1,67 @@
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+
+from middlewares import TelegramMetricsMiddleware
+from services.metrics import (
+    HANDLER_LATENCY,
+    SURVEY_STATE_ENTERED,
+    TELEGRAM_LATENCY,
+    Registry,
+    build_metrics_app,
+)
+from states import Reg
+from tests.conftest import RecordingSurveyStorage, make_dispatcher, survey_updates
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("op",), buckets=(0.1, 1.0))
+    counter = registry.counter("calls_total", "Calls.", ("op",))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "read")
+    counter.inc("read")
+    counter.inc("read", amount=2)
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_bucket{op="read",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{op="read",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{op="read",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{op="read"} 4' in lines
+    assert 'calls_total{op="read"} 3' in lines
+
+
+def test_duplicate_metric_names_are_rejected() -> None:
+    registry = Registry()
+    registry.counter("calls_total", "Calls.")
+    with pytest.raises(ValueError):
+        registry.counter("calls_total", "Calls.")
+
+
+@pytest.mark.asyncio
+async def test_survey_flow_records_handler_latency_and_funnel(bot) -> None:
+    dp = make_dispatcher(MemoryStorage())
+    entered = SURVEY_STATE_ENTERED.value(Reg.region.state)
+    timed = HANDLER_LATENCY.count("survey", "callback_query", Reg.region.state)
+
+    for update in survey_updates(606):
+        await dp.feed_raw_update(bot, update, survey_storage=RecordingSurveyStorage())
+
+    assert SURVEY_STATE_ENTERED.value(Reg.region.state) == entered + 1
+    assert HANDLER_LATENCY.count("survey", "callback_query", Reg.region.state) == timed + 1
+
+
+@pytest.mark.asyncio
+async def test_outbound_latency_and_endpoint(bot) -> None:
+    bot.session.middleware(TelegramMetricsMiddleware())
+    before = TELEGRAM_LATENCY.count("SendMessage")
+    await bot(SendMessage(chat_id=1, text="hi"))
+    assert TELEGRAM_LATENCY.count("SendMessage") == before + 1
+
+    async with TestClient(TestServer(build_metrics_app())) as client:
+        response = await client.get("/metrics")
+        body = await response.text()
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE bot_telegram_request_seconds histogram" in body
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, Optional
+
+import pytest
+from aiogram import Bot
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery, TelegramMethod
+
+from services.fsm_storage import KeyedEventIsolation
+from services.metrics import FSM_STORAGE_CALLS, STALE_CALLBACKS
+from services.reminders import SessionScheduler
+from states import Reg
+from tests.conftest import (
+    FakeSession,
+    RecordingSurveyStorage,
+    callback_update,
+    make_dispatcher,
+    message_update,
+    survey_updates,
+)
+
+
+class SlowSession(FakeSession):
+    """Yields to the loop on every API call, so concurrent updates really interleave."""
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        await asyncio.sleep(0)
+        return await super().make_request(bot, method, timeout)
+
+
+def _storage_reads() -> float:
+    return FSM_STORAGE_CALLS.value("get_state") + FSM_STORAGE_CALLS.value("get_data")
+
+
+async def _walk(dp, bot, user_id: int, steps: int) -> None:
+    for update in survey_updates(user_id)[:steps]:
+        await dp.feed_raw_update(bot, update, survey_storage=RecordingSurveyStorage())
+
+
+@pytest.mark.asyncio
+async def test_one_users_updates_are_handled_in_order() -> None:
+    bot = Bot(token="42:TEST", session=SlowSession())
+    storage = MemoryStorage()
+    dp = make_dispatcher(storage, KeyedEventIsolation())
+    await _walk(dp, bot, 31, 7)  # now at the work place question
+
+    # Sent back to back, as the polling loop would hand them over.
+    await asyncio.gather(
+        dp.feed_raw_update(bot, message_update(31, "Acme")),
+        dp.feed_raw_update(bot, message_update(31, "Developer")),
+    )
+
+    key = StorageKey(bot_id=bot.id, chat_id=31, user_id=31)
+    data = await storage.get_data(key)
+    assert (data["work_place"], data["position"]) == ("Acme", "Developer")
+    assert await storage.get_state(key) == Reg.region.state
+
+
+@pytest.mark.asyncio
+async def test_double_tap_and_old_keyboards_are_dropped_before_storage() -> None:
+    bot = Bot(token="42:TEST", session=SlowSession())
+    storage = MemoryStorage()
+    scheduler = SessionScheduler(storage, ttl=600)
+    dp = make_dispatcher(storage, KeyedEventIsolation(), scheduler)
+    await _walk(dp, bot, 32, 10)  # now at the rating question
+    key = StorageKey(bot_id=bot.id, chat_id=32, user_id=32)
+    dropped = STALE_CALLBACKS.value("rating")
+
+    await asyncio.gather(
+        dp.feed_raw_update(bot, callback_update(32, "rating:5")),
+        dp.feed_raw_update(bot, callback_update(32, "rating:2")),
+    )
+    assert (await storage.get_data(key))["uni_rating"] == "5"
+    assert await storage.get_state(key) == Reg.recommendation.state
+    assert STALE_CALLBACKS.value("rating") == dropped + 1
+
+    reads = _storage_reads()
+    answered = sum(isinstance(method, AnswerCallbackQuery) for method in bot.session.requests)
+    await dp.feed_raw_update(bot, callback_update(32, "region:toshkent_shahri"))
+    assert _storage_reads() == reads
+    assert sum(isinstance(method, AnswerCallbackQuery) for method in bot.session.requests) == answered + 1
+    assert await storage.get_state(key) == Reg.recommendation.state
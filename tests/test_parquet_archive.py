@@ -0,0 +1,100 @@
+import asyncio
+from datetime import date
+
+import pandas as pd
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from services.google_sheets import HEADERS, build_row  # noqa: E402
+from services.parquet_archive import ParquetArchive, load_archive, main  # noqa: E402
+from services.outbox import Outbox  # noqa: E402
+
+
+def _row(day: str, region: str, user_id: int = 1, rating: str = "5", employed: bool | None = True) -> list:
+    row = build_row(
+        {
+            "first_name": "Ali",
+            "is_employed": employed,
+            "share_with_employer": False if employed else None,
+            "region": region,
+            "uni_rating": rating,
+            "recommend_answer": "yes",
+        },
+        user_id,
+        "ali",
+    )
+    row[HEADERS.index("date")] = day
+    row[HEADERS.index("time")] = "10:30:00"
+    return row
+
+
+@pytest.mark.asyncio
+async def test_rows_are_buffered_until_a_row_group_is_full(tmp_path) -> None:
+    archive = ParquetArchive(tmp_path / "archive", row_group_size=3, flush_interval=3600)
+    archive.start()
+    await archive.append(_row("2026-10-17", "toshkent_shahri", 1))
+    await archive.append(_row("2026-10-18", "samarqand", 2))
+    assert archive.pending == 2
+    assert not (tmp_path / "archive").exists()
+
+    await archive.append(_row("2026-10-18", "samarqand", 3))
+    for _ in range(100):
+        if archive.pending == 0 and (tmp_path / "archive").exists():
+            break
+        await asyncio.sleep(0.01)
+    await archive.append(_row("2026-10-18", "", 4, rating="", employed=None))
+    await archive.close()
+
+    partitions = sorted(path.relative_to(tmp_path / "archive").as_posix() for path in (tmp_path / "archive").glob("*/*"))
+    assert partitions == [
+        "date=2026-10-17/region=toshkent_shahri",
+        "date=2026-10-18/region=__HIVE_DEFAULT_PARTITION__",
+        "date=2026-10-18/region=samarqand",
+    ]
+    frame = load_archive(tmp_path / "archive").sort_values("telegram_user_id", ignore_index=True)
+    assert frame["telegram_user_id"].tolist() == [1, 2, 3, 4]
+    assert str(frame["uni_rating"].dtype) == "Int64"
+    assert frame["uni_rating"].tolist()[:3] == [5, 5, 5] and frame["uni_rating"].isna().tolist()[3]
+    assert str(frame["is_employed"].dtype) == "boolean"
+    assert frame["share_with_employer"].tolist()[:3] == [False, False, False]
+    assert frame["is_employed"].isna().tolist() == [False, False, False, True]
+    assert pd.api.types.is_datetime64_any_dtype(frame["submitted_at"])
+    assert pd.api.types.is_datetime64_any_dtype(frame["date"])
+    assert frame["submitted_at"][0] == pd.Timestamp("2026-10-17 10:30:00", tz="UTC")
+    assert frame["region"].tolist()[:3] == ["toshkent_shahri", "samarqand", "samarqand"]
+
+
+def test_partitions_are_compacted_and_pruned_on_read(tmp_path) -> None:
+    archive = ParquetArchive(tmp_path / "archive", row_group_size=2)
+    for user_id in range(5):
+        archive.write_rows([_row("2026-10-18", "samarqand", user_id)])
+    archive.write_rows([_row("2026-10-19", "buxoro", 9), _row("bad", "buxoro", 10)])
+    partition = tmp_path / "archive" / "date=2026-10-18" / "region=samarqand"
+    assert len(list(partition.glob("*.parquet"))) == 5
+
+    assert archive.compact() == 1
+    assert len(list(partition.glob("*.parquet"))) == 1
+    assert pq.ParquetFile(next(partition.glob("*.parquet"))).num_row_groups == 3
+
+    samarqand = load_archive(tmp_path / "archive", regions=["samarqand"])
+    assert sorted(samarqand["telegram_user_id"]) == [0, 1, 2, 3, 4]
+    later = load_archive(tmp_path / "archive", columns=["telegram_user_id", "region"], start=date(2026, 10, 19))
+    assert later.to_dict("records") == [{"telegram_user_id": 9, "region": "buxoro"}]
+    assert load_archive(tmp_path / "missing").empty
+
+
+@pytest.mark.asyncio
+async def test_cli_rebuilds_the_archive_from_the_journal(tmp_path) -> None:
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    try:
+        for user_id in range(3):
+            await outbox.add(f"k{user_id}", _row("2026-10-18", "xorazm", user_id))
+    finally:
+        outbox.close()
+
+    assert main(["--path", str(tmp_path / "outbox.sqlite3"), "--out", str(tmp_path / "archive")]) == 0
+    frame = load_archive(tmp_path / "archive")
+    assert sorted(frame["telegram_user_id"]) == [0, 1, 2]
+    with pytest.raises(SystemExit):
+        main(["--path", str(tmp_path / "outbox.sqlite3"), "--out", str(tmp_path / "archive")])
@@ -0,0 +1,162 @@
+from types import SimpleNamespace
+
+import pytest
+from aiogram import Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+
+from i18n import t
+from middlewares import ActivityMiddleware
+from services.reminders import SessionScheduler
+from services.stats import SurveyStats
+from states import Reg
+from tests.conftest import RecordingSurveyStorage, make_dispatcher, message_update, survey_updates
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _scheduler(storage: MemoryStorage, clock: FakeClock) -> SessionScheduler:
+    return SessionScheduler(storage, remind_after=60, ttl=600, clock=clock)
+
+
+def _with_scheduler(scheduler: SessionScheduler, storage: MemoryStorage) -> Dispatcher:
+    dp = make_dispatcher(storage)
+    dp.update.outer_middleware(ActivityMiddleware(scheduler))
+    return dp
+
+
+@pytest.mark.asyncio
+async def test_idle_session_is_reminded_once_then_evicted(bot) -> None:
+    storage, clock = MemoryStorage(), FakeClock()
+    scheduler = _scheduler(storage, clock)
+    scheduler.start(bot)
+    await scheduler.close()  # keep the bot, but drive deadlines by hand
+    dp = _with_scheduler(scheduler, storage)
+    for update in survey_updates(77)[:4]:
+        await dp.feed_raw_update(bot, update, survey_storage=RecordingSurveyStorage())
+    key = StorageKey(bot_id=bot.id, chat_id=77, user_id=77)
+    assert await storage.get_state(key) == Reg.last_name.state
+    sent = len(bot.session.requests)
+
+    clock.now += 59
+    assert await scheduler.process_due() == 0
+    clock.now += 1
+    assert await scheduler.process_due() == 1
+    assert bot.session.requests[sent:] and bot.session.requests[-1].text == t("en", "reminder")
+    assert await scheduler.process_due() == 0
+
+    clock.now += 600
+    assert await scheduler.process_due() == 1
+    assert key not in storage.storage
+    assert scheduler.abandoned == {Reg.last_name.state: 1}
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_activity_postpones_deadlines_and_completion_stops_tracking(bot) -> None:
+    storage, clock = MemoryStorage(), FakeClock()
+    scheduler = _scheduler(storage, clock)
+    dp = _with_scheduler(scheduler, storage)
+    updates = survey_updates(78)
+    for update in updates[:3]:
+        await dp.feed_raw_update(bot, update, survey_storage=RecordingSurveyStorage())
+
+    clock.now += 50
+    await dp.feed_raw_update(bot, updates[3], survey_storage=RecordingSurveyStorage())
+    clock.now += 50
+    assert await scheduler.process_due() == 0
+
+    for update in updates[4:]:
+        await dp.feed_raw_update(bot, update, survey_storage=RecordingSurveyStorage())
+    assert len(scheduler) == 0
+    clock.now += 10_000
+    assert await scheduler.process_due() == 0
+    assert not scheduler.abandoned
+
+
+@pytest.mark.asyncio
+async def test_many_sessions_share_one_heap(bot) -> None:
+    storage, clock = MemoryStorage(), FakeClock()
+    scheduler = SessionScheduler(storage, ttl=600, clock=clock)
+    for user_id in range(10_000):
+        key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+        await storage.set_state(key, Reg.region)
+        scheduler.touch(key, Reg.region.state, "uz")
+        scheduler.touch(key, Reg.region.state, "uz")
+
+    assert len(scheduler._heap) == 10_000
+    clock.now += 600
+    assert await scheduler.process_due() == 10_000
+    assert scheduler.abandoned == {Reg.region.state: 10_000}
+    assert not storage.storage
+
+
+class FlakyStorage:
+    """FSM storage whose first write fails, like Redis going away for a moment."""
+
+    def __init__(self) -> None:
+        self.failures = 1
+        self.cleared = []
+
+    async def set_state(self, key, state=None) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("redis is down")
+        self.cleared.append(key)
+
+    async def set_data(self, key, data) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_failed_eviction_is_logged_and_retried(caplog) -> None:
+    storage, clock = FlakyStorage(), FakeClock()
+    scheduler = SessionScheduler(storage, ttl=600, clock=clock, retry_delay=30)  # type: ignore[arg-type]
+    key = StorageKey(bot_id=1, chat_id=5, user_id=5)
+    scheduler.touch(key, Reg.region.state, "uz")
+
+    clock.now += 600
+    assert await scheduler.process_due() == 0
+    assert "Failed to expire the session of 5" in caplog.text
+    assert len(scheduler) == 1 and not scheduler.abandoned
+
+    clock.now += 29
+    assert await scheduler.process_due() == 0
+    clock.now += 1
+    assert await scheduler.process_due() == 1
+    assert storage.cleared == [key]
+    assert scheduler.abandoned == {Reg.region.state: 1}
+    assert len(scheduler) == 0
+
+
+def test_disabled_scheduler_tracks_nothing() -> None:
+    scheduler = SessionScheduler(MemoryStorage())
+    scheduler.touch(StorageKey(bot_id=1, chat_id=5, user_id=5), Reg.region.state, "uz")
+
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_stats_command_reports_abandonment(bot) -> None:
+    scheduler = SessionScheduler(MemoryStorage(), ttl=600)
+    scheduler.abandoned[Reg.region.state] = 3
+    storage = SimpleNamespace(stats=SurveyStats(), rejects=lambda *args: False)
+    dp = make_dispatcher(MemoryStorage())
+
+    await dp.feed_raw_update(
+        bot,
+        message_update(2, "/stats"),
+        survey_storage=storage,
+        admin_ids=frozenset({2}),
+        session_scheduler=scheduler,
+    )
+
+    [answer] = [method for method in bot.session.requests if isinstance(method, SendMessage)]
+    assert f"{Reg.region.state}: 3" in answer.text
@@ -0,0 +1,176 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from services.outbox import REPLACE, Outbox
+from services.replicator import SheetsReplicator
+
+
+class FakeSink:
+    def __init__(self, failures: int = 0, landed_failures: int = 0) -> None:
+        self.batches = []
+        self.failures = failures
+        # Appends that reach the sheet but still fail for the caller, like a read timeout.
+        self.landed_failures = landed_failures
+
+    async def append_rows(self, rows) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("quota exceeded")
+        self.batches.append([list(row) for row in rows])
+        if self.landed_failures:
+            self.landed_failures -= 1
+            raise TimeoutError("read timed out")
+
+    async def get_rows(self):
+        return [row for batch in self.batches for row in batch]
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(tmp_path / "outbox.sqlite3")
+    yield box
+    box.close()
+
+
+@pytest.mark.asyncio
+async def test_pending_rows_are_batched(outbox) -> None:
+    for idx in range(5):
+        await outbox.add(f"k{idx}", [str(idx)])
+    sink = FakeSink()
+    replicator = SheetsReplicator(outbox, sink, batch_size=2, flush_interval=10)
+    replicator.start()
+    await replicator.close()
+
+    assert sink.batches == [[["0"], ["1"]], [["2"], ["3"]], [["4"]]]
+    assert await outbox.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_flushed_after_interval(outbox) -> None:
+    sink = FakeSink()
+    replicator = SheetsReplicator(outbox, sink, batch_size=100, flush_interval=0.01)
+    replicator.start()
+    await outbox.add("a", ["a"])
+    replicator.notify()
+    await asyncio.sleep(0.1)
+
+    assert sink.batches == [[["a"]]]
+    await replicator.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_retried(outbox) -> None:
+    await outbox.add("a", ["a"])
+    sink = FakeSink(failures=2)
+    replicator = SheetsReplicator(outbox, sink, batch_size=10, flush_interval=0, retry_base=0.01)
+    replicator.start()
+    await asyncio.sleep(0.2)
+
+    assert sink.batches == [[["a"]]]
+    await replicator.close()
+
+
+@pytest.mark.asyncio
+async def test_rows_that_landed_despite_a_failed_append_are_not_resent(outbox) -> None:
+    await outbox.add("a", ["d", "t", "1"])
+    await outbox.add("b", ["d", "t", "2"])
+    sink = FakeSink(landed_failures=1)
+    replicator = SheetsReplicator(outbox, sink, batch_size=10, flush_interval=0, retry_base=0.01)
+    replicator.start()
+    for _ in range(50):
+        if not await outbox.pending_count():
+            break
+        await asyncio.sleep(0.01)
+    await outbox.add("c", ["d", "t", "3"])
+    replicator.notify()
+    await replicator.close()
+
+    assert sink.batches == [[["d", "t", "1"], ["d", "t", "2"]], [["d", "t", "3"]]]
+    assert await outbox.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_journal_errors_are_retried_without_resending_rows(outbox, monkeypatch, caplog) -> None:
+    mark_delivered = outbox.mark_delivered
+    errors = [sqlite3.OperationalError("database is locked")]
+
+    async def flaky_mark_delivered(ids) -> None:
+        if errors:
+            raise errors.pop()
+        await mark_delivered(ids)
+
+    monkeypatch.setattr(outbox, "mark_delivered", flaky_mark_delivered)
+    await outbox.add("a", ["d", "t", "1"])
+    sink = FakeSink()
+    replicator = SheetsReplicator(outbox, sink, batch_size=10, flush_interval=0, retry_base=0.01)
+    replicator.start()
+    for _ in range(50):
+        if not await outbox.pending_count():
+            break
+        await asyncio.sleep(0.01)
+    await replicator.close()
+
+    assert sink.batches == [[["d", "t", "1"]]]
+    assert await outbox.pending_count() == 0
+    assert "Failed to read or update the journal" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_close_raises_when_the_final_drain_fails(outbox, monkeypatch) -> None:
+    async def broken_pending(limit):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    replicator = SheetsReplicator(outbox, FakeSink(), flush_interval=10)
+    replicator.start()
+    monkeypatch.setattr(outbox, "pending", broken_pending)
+    with pytest.raises(sqlite3.OperationalError):
+        await replicator.close()
+
+
+@pytest.mark.asyncio
+async def test_undelivered_rows_are_replayed_after_restart(tmp_path) -> None:
+    path = tmp_path / "outbox.sqlite3"
+    outbox = Outbox(path)
+    await outbox.add("a", ["a"])
+    replicator = SheetsReplicator(outbox, FakeSink(failures=1), flush_interval=10)
+    replicator.start()
+    await replicator.close()
+    outbox.close()
+
+    outbox = Outbox(path)
+    sink = FakeSink()
+    replicator = SheetsReplicator(outbox, sink, flush_interval=10)
+    replicator.start()
+    await replicator.close()
+
+    assert sink.batches == [[["a"]]]
+    outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_outbox_ignores_duplicate_keys(outbox) -> None:
+    assert await outbox.add("same", ["first"])
+    assert not await outbox.add("same", ["second"])
+
+    assert await outbox.pending(10) == [(1, ["first"], "append", 0)]
+
+
+@pytest.mark.asyncio
+async def test_replace_rows_are_shipped_in_journal_order(outbox) -> None:
+    class ReplacingSink(FakeSink):
+        async def replace_rows(self, rows) -> None:
+            self.batches.append(("replace", [list(row) for row in rows]))
+
+    await outbox.add("a", ["a"])
+    await outbox.add("b", ["b"], REPLACE)
+    await outbox.add("c", ["c"], REPLACE)
+    await outbox.add("d", ["d"])
+    await outbox.add("e", ["e"])
+    sink = ReplacingSink()
+    replicator = SheetsReplicator(outbox, sink, flush_interval=10)
+    replicator.start()
+    await replicator.close()
+
+    assert sink.batches == [[["a"]], ("replace", [["b"], ["c"]]), [["d"], ["e"]]]
@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import pytest
+from openpyxl import Workbook
+
+from services.roster import RosterUnavailableError, StudentRoster, normalize_student_id
+
+
+def test_normalize_student_id() -> None:
+    assert normalize_student_id(" se-10 000 ") == "SE10000"
+    assert normalize_student_id(None) == ""
+
+
+def test_csv_roster_lookup_uses_id_column(tmp_path) -> None:
+    path = tmp_path / "roster.csv"
+    path.write_text("name,student_id\nJohn,SE10000\nJane,se10001\n", encoding="utf-8")
+    roster = StudentRoster(path)
+    roster.load()
+
+    assert roster.contains("se10000")
+    assert roster.contains("SE 10001")
+    assert not roster.contains("John")
+    assert len(roster) == 2
+
+
+def test_xlsx_roster_lookup(tmp_path) -> None:
+    path = tmp_path / "roster.xlsx"
+    workbook = Workbook()
+    workbook.active.append(["ID"])
+    workbook.active.append(["SE20000"])
+    workbook.save(path)
+    roster = StudentRoster(path)
+    roster.load()
+
+    assert roster.contains("se20000")
+
+
+def test_lookup_before_load_raises(tmp_path) -> None:
+    roster = StudentRoster(tmp_path / "missing.csv")
+
+    with pytest.raises(RosterUnavailableError):
+        roster.contains("SE10000")
+
+
+@pytest.mark.asyncio
+async def test_roster_reloads_when_file_changes(tmp_path) -> None:
+    path = tmp_path / "roster.csv"
+    path.write_text("student_id\nSE1\n", encoding="utf-8")
+    roster = StudentRoster(path, reload_interval=0.01)
+    await roster.start()
+    assert not roster.contains("SE2")
+
+    path.write_text("student_id\nSE1\nSE2\n", encoding="utf-8")
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 5))
+    await asyncio.sleep(0.1)
+
+    assert roster.contains("SE2")
+    await roster.close()
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import queue
+from pathlib import Path
+from itertools import chain, zip_longest
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramUnauthorizedError
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.dedup import SubmissionIndex
+from services.fsm_storage import KeyedEventIsolation
+from services.google_sheets import HEADERS
+from services.outbox import Outbox
+from services.replicator import SheetsReplicator
+from config import Settings
+from main import shard_settings
+from services.sharding import (
+    HELLO,
+    RemoteSurveyStorage,
+    ShardChannel,
+    ShardPool,
+    polling_updates,
+    serve_shard,
+    shard_for,
+    update_user_id,
+)
+from services.stats import SurveyStats
+from services.storage import SurveyStorage
+from tests.conftest import FakeSession, NullSheets, callback_update, make_dispatcher, message_update, survey_updates
+
+_USER_ID_COLUMN = HEADERS.index("telegram_user_id")
+
+
+def fake_shard(channel: ShardChannel) -> None:
+    """Worker process target: the real routers with a fake Bot session."""
+    asyncio.run(_fake_shard(channel))
+
+
+async def _fake_shard(channel: ShardChannel) -> None:
+    dp = make_dispatcher(MemoryStorage(), KeyedEventIsolation())
+    survey_storage = RemoteSurveyStorage(channel)
+    await survey_storage.start()
+    try:
+        await serve_shard(channel, dp, Bot(token="42:TEST", session=FakeSession()), survey_storage=survey_storage)
+    finally:
+        await survey_storage.close()
+
+
+def crash_once_shard(channel: ShardChannel) -> None:
+    """Worker process target that dies on its first start (marked by a file in ``$CRASH_DIR``)."""
+    marker = Path(os.environ["CRASH_DIR"]) / f"crashed-{channel.index}"
+    if not marker.exists():
+        marker.touch()
+        os._exit(1)
+    fake_shard(channel)
+
+
+def exiting_shard(channel: ShardChannel) -> None:
+    raise SystemExit(3)
+
+
+def _storage(outbox: Outbox, dedup_policy: str = "append") -> SurveyStorage:
+    return SurveyStorage(outbox=outbox, replicator=SheetsReplicator(outbox, NullSheets()), dedup_policy=dedup_policy)
+
+
+def _with_student_id(updates, student_id):
+    for update in updates:
+        if update.get("message", {}).get("text") == "SE12345":
+            update["message"]["text"] = student_id
+    return updates
+
+
+def test_updates_are_routed_by_sender() -> None:
+    assert update_user_id(message_update(7, "hi")) == 7
+    assert update_user_id(callback_update(8, "rating:5")) == 8
+    assert update_user_id({"update_id": 1, "channel_post": {"chat": {"id": -100}}}) == -100
+    assert update_user_id({"update_id": 1, "poll": {"id": "p"}}) is None
+    assert [shard_for(user_id, 4) for user_id in (8, 9, 10, 11, 12)] == [0, 1, 2, 3, 0]
+
+
+@pytest.mark.asyncio
+async def test_workers_share_one_storage_and_keep_each_user_in_order(tmp_path) -> None:
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    index = SubmissionIndex(capacity=100)
+    index.add(3, None)  # already submitted before startup; the workers' replica must refuse it
+    stats = SurveyStats()
+    storage = SurveyStorage(
+        outbox=outbox,
+        replicator=SheetsReplicator(outbox, NullSheets()),
+        dedup_index=index,
+        dedup_policy="reject",
+        stats=stats,
+    )
+    pool = ShardPool(2, fake_shard, storage)
+    pool.start()
+    shards = {}
+    try:
+        # Round-robin across users, so each worker sees every user's updates interleaved.
+        sessions = [_with_student_id(survey_updates(user_id), f"SE{user_id}") for user_id in (1, 2, 3, 4, 5)]
+        for update in chain.from_iterable(zip_longest(*sessions)):
+            if update is not None:
+                shards.setdefault(update_user_id(update), set()).add(pool.dispatch(update))
+    finally:
+        await pool.close()
+
+    try:
+        journaled = sorted(int(row[_USER_ID_COLUMN]) for row in await outbox.rows())
+    finally:
+        outbox.close()
+    assert journaled == [1, 2, 4, 5]
+    assert stats.report.total == 4
+    assert shards == {user_id: {user_id % 2} for user_id in (1, 2, 3, 4, 5)}
+
+
+@pytest.mark.asyncio
+async def test_a_dead_worker_is_restarted_with_its_queued_updates(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("CRASH_DIR", str(tmp_path))
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    pool = ShardPool(1, crash_once_shard, _storage(outbox))
+    pool.start()
+    watching = asyncio.create_task(pool.watch(interval=0.05))
+    try:
+        for update in chain(survey_updates(1), _with_student_id(survey_updates(2), "SE2")):
+            pool.dispatch(update)
+        for _ in range(600):
+            if len(await outbox.rows()) == 2:
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        watching.cancel()
+        await pool.close()
+
+    try:
+        journaled = sorted(int(row[_USER_ID_COLUMN]) for row in await outbox.rows())
+    finally:
+        outbox.close()
+    assert journaled == [1, 2]
+    assert (tmp_path / "crashed-0").exists()
+
+
+@pytest.mark.asyncio
+async def test_watch_fails_once_a_worker_keeps_dying(tmp_path) -> None:
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    pool = ShardPool(1, exiting_shard, _storage(outbox), max_restarts=1)
+    pool.start()
+    try:
+        with pytest.raises(RuntimeError, match="exited with code 3 after 1 restart"):
+            await asyncio.wait_for(pool.watch(interval=0.05), 60)
+    finally:
+        await pool.close()
+        outbox.close()
+
+
+def test_a_full_worker_queue_does_not_hold_up_other_workers(tmp_path) -> None:
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    # Not started: nothing drains the queues.
+    pool = ShardPool(2, fake_shard, _storage(outbox), max_pending=2)
+    try:
+        assert [pool.dispatch(message_update(2, "hi")) for _ in range(3)] == [0, 0, 0]
+        assert pool.dispatch(message_update(1, "hi")) == 1
+    finally:
+        outbox.close()
+
+    assert pool.dropped == 1
+
+
+def test_workers_split_the_outbound_and_broadcast_rates() -> None:
+    config = Settings(
+        bot_token="42:TEST",
+        google_service_account_file="creds.json",
+        google_sheet_id="sheet",
+        google_worksheet_name=None,
+        local_excel_file=None,
+        shards=4,
+    )
+    worker = shard_settings(config, 1)
+
+    assert worker.telegram_send_rate == config.telegram_send_rate / 4
+    assert worker.broadcast_rate == config.broadcast_rate / 4
+    assert worker.broadcast_rate < worker.telegram_send_rate
+
+
+@pytest.mark.asyncio
+async def test_persist_fails_when_the_front_does_not_answer() -> None:
+    channel = ShardChannel(0, 2, queue.Queue(), queue.Queue(), queue.Queue())  # type: ignore[arg-type]
+    channel.events.put((HELLO, None, "append", None))
+    storage = RemoteSurveyStorage(channel, timeout=0.05)
+    await storage.start()
+    try:
+        with pytest.raises(RuntimeError, match="did not confirm"):
+            await storage.persist({"first_name": "Ali"}, 7, None)
+    finally:
+        await storage.close()
+
+    assert channel.requests.qsize() == 1
+
+
+@pytest.mark.asyncio
+async def test_polling_yields_raw_updates_and_advances_the_offset() -> None:
+    batches = [[message_update(1, "a"), message_update(2, "b")], [message_update(1, "c")]]
+    offsets = []
+
+    async def get_updates(request: web.Request) -> web.Response:
+        payload = await request.json()
+        offsets.append(payload.get("offset"))
+        if len(offsets) == 1:
+            return web.json_response({"ok": False, "error_code": 429, "parameters": {"retry_after": 0}})
+        return web.json_response({"ok": True, "result": batches.pop(0) if batches else []})
+
+    app = web.Application()
+    app.router.add_post("/bot42:TEST/getUpdates", get_updates)
+    async with TestServer(app) as server:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(str(server.make_url("")).rstrip("/")))
+        async with Bot(token="42:TEST", session=session) as bot:
+            updates = polling_updates(bot, ["message"], timeout=0)
+            received = [await anext(updates) for _ in range(3)]
+            await updates.aclose()
+
+    assert [update["message"]["text"] for update in received] == ["a", "b", "c"]
+    assert offsets[2] == received[1]["update_id"] + 1
+
+
+@pytest.mark.asyncio
+async def test_polling_stops_when_telegram_rejects_the_token() -> None:
+    async def get_updates(request: web.Request) -> web.Response:
+        return web.json_response({"ok": False, "error_code": 401, "description": "Unauthorized"})
+
+    app = web.Application()
+    app.router.add_post("/bot42:TEST/getUpdates", get_updates)
+    async with TestServer(app) as server:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(str(server.make_url("")).rstrip("/")))
+        async with Bot(token="42:TEST", session=session) as bot:
+            updates = polling_updates(bot, ["message"], timeout=0)
+            with pytest.raises(TelegramUnauthorizedError):
+                await anext(updates)
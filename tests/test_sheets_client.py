@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from services import google_sheets as gs
+
+
+class FakeWorksheet:
+    def __init__(self, header=None) -> None:
+        self.rows = [list(header)] if header else []
+        self.header_reads = 0
+        self.requests = []
+
+    def row_values(self, index):
+        self.header_reads += 1
+        return self.rows[0] if self.rows else []
+
+    def append_row(self, values, value_input_option=None) -> None:
+        self.rows.append(list(values))
+
+    def append_rows(self, rows, value_input_option=None) -> None:
+        self.rows.extend(list(row) for row in rows)
+
+    def delete_rows(self, index) -> None:
+        del self.rows[index - 1]
+
+    def insert_row(self, values, index, value_input_option=None) -> None:
+        self.rows.insert(index - 1, list(values))
+
+    def col_values(self, col):
+        self.requests.append("col_values")
+        return [row[col - 1] if len(row) >= col else "" for row in self.rows]
+
+    def batch_update(self, data, value_input_option=None) -> None:
+        self.requests.append("batch_update")
+        for update in data:
+            self.rows[int(update["range"][1:]) - 1] = list(update["values"][0])
+
+
+def _patch_connect(monkeypatch, worksheet, attempts=None):
+    def connect(self):
+        if attempts is not None:
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("sheets unavailable")
+        self._ensure_header(worksheet)
+        return worksheet
+
+    monkeypatch.setattr(gs.GoogleSheetsClient, "_connect", connect)
+
+
+@pytest.mark.asyncio
+async def test_client_connects_in_background(monkeypatch) -> None:
+    worksheet = FakeWorksheet()
+    _patch_connect(monkeypatch, worksheet)
+    client = gs.GoogleSheetsClient.create("sa.json", "sheet")
+    assert not client.ready
+
+    await client.append_rows([["a"]])
+
+    assert client.ready
+    assert worksheet.rows == [gs.HEADERS, ["a"]]
+
+
+@pytest.mark.asyncio
+async def test_failed_connection_is_retried_on_next_request(monkeypatch) -> None:
+    attempts = []
+    _patch_connect(monkeypatch, FakeWorksheet(gs.HEADERS), attempts)
+    client = gs.GoogleSheetsClient.create("sa.json", "sheet")
+
+    with pytest.raises(ConnectionError):
+        await client.wait_ready()
+    await asyncio.sleep(0)
+    await client.wait_ready()
+
+    assert client.ready
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_header_check_is_cached_by_schema_hash(monkeypatch, tmp_path) -> None:
+    cache = tmp_path / "header.cache"
+    first = FakeWorksheet(["old"])
+    _patch_connect(monkeypatch, first)
+    await gs.GoogleSheetsClient.create("sa.json", "sheet", header_cache_file=cache).wait_ready()
+    assert first.rows == [gs.HEADERS]
+
+    second = FakeWorksheet(gs.HEADERS)
+    _patch_connect(monkeypatch, second)
+    await gs.GoogleSheetsClient.create("sa.json", "sheet", header_cache_file=cache).wait_ready()
+    assert second.header_reads == 0
+
+    monkeypatch.setattr(gs, "HEADERS", gs.HEADERS + ["new_column"])
+    third = FakeWorksheet(["date"])
+    _patch_connect(monkeypatch, third)
+    await gs.GoogleSheetsClient.create("sa.json", "sheet", header_cache_file=cache).wait_ready()
+    assert third.header_reads == 1
+
+
+@pytest.mark.asyncio
+async def test_replace_rows_reads_the_sheet_once_and_writes_in_one_batch(monkeypatch) -> None:
+    def row(user_id, name):
+        values = [""] * len(gs.HEADERS)
+        values[gs.HEADERS.index("telegram_user_id")] = str(user_id)
+        values[gs.HEADERS.index("first_name")] = name
+        return values
+
+    worksheet = FakeWorksheet(gs.HEADERS)
+    worksheet.rows += [row(1, "first"), row(2, "old"), row(1, "latest")]
+    _patch_connect(monkeypatch, worksheet)
+    client = gs.GoogleSheetsClient.create("sa.json", "sheet")
+
+    await client.replace_rows([row(1, "a"), row(2, "b"), row(3, "c"), row(2, "b2")])
+
+    assert worksheet.requests == ["col_values", "batch_update"]
+    assert worksheet.rows[1:] == [row(1, "first"), row(2, "b2"), row(1, "a"), row(3, "c")]
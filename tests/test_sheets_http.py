@@ -0,0 +1,242 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Tuple
+from urllib.parse import urlsplit
+
+import pytest
+from google.oauth2.credentials import Credentials
+from gspread.exceptions import APIError
+from requests.exceptions import Timeout
+
+from services.executors import BoundedExecutor
+from services.google_sheets import HEADERS, GoogleSheetsClient, build_row
+from services.metrics import SHEETS_RETRIES, SHEETS_TOKEN_REFRESHES
+from services.outbox import Outbox
+from services.replicator import SheetsReplicator
+from services.sheets_http import SheetsHTTPClient, SheetsHTTPOptions, SheetsSession
+
+_SHEET = {"properties": {"title": "Sheet1", "sheetId": 0, "index": 0, "gridProperties": {"rowCount": 1000, "columnCount": 26}}}
+
+
+class FakeSheetsServer(ThreadingHTTPServer):
+    """Just enough of the Sheets API and the OAuth token endpoint for gspread, over keep-alive HTTP/1.1."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.token_lifetime = 3600
+        self.tokens_issued = 0
+        self.append_failures: List[Tuple[int, dict]] = []
+        self.read_failures: List[Tuple[int, dict]] = []
+        self.append_delay = 0.0
+        # (method, path, client port, Authorization header) of every Sheets request.
+        self.requests: List[Tuple[str, str, int, str]] = []
+        self.appended: List[list] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeSheetsServer
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle()
+
+    def do_POST(self) -> None:
+        self._handle()
+
+    def _handle(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        path = urlsplit(self.path).path
+        if path == "/token":
+            self.server.tokens_issued += 1
+            return self._reply(200, {"access_token": f"token-{self.server.tokens_issued}", "expires_in": self.server.token_lifetime})
+        self.server.requests.append((self.command, path, self.client_address[1], self.headers.get("Authorization", "")))
+        if path.endswith(":append"):
+            time.sleep(self.server.append_delay)
+            if self.server.append_failures:
+                status, headers = self.server.append_failures.pop(0)
+                return self._reply(status, {"error": {"code": status, "message": "try again"}}, headers)
+            self.server.appended.extend(json.loads(body)["values"])
+            return self._reply(200, {"updates": {}})
+        if self.server.read_failures:
+            status, headers = self.server.read_failures.pop(0)
+            return self._reply(status, {"error": {"code": status, "message": "try again"}}, headers)
+        if "/values/" in path:
+            return self._reply(200, {"range": "Sheet1", "majorDimension": "ROWS", "values": [HEADERS, *self.server.appended]})
+        return self._reply(200, {"spreadsheetId": "sheet", "properties": {"title": "Survey"}, "sheets": [_SHEET]})
+
+    def _reply(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def server() -> Iterator[FakeSheetsServer]:
+    server = FakeSheetsServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _credentials(server: FakeSheetsServer) -> Credentials:
+    return Credentials(None, refresh_token="refresh", token_uri=f"{server.url}/token", client_id="id", client_secret="secret")
+
+
+@pytest.mark.asyncio
+async def test_writes_reuse_one_connection_and_a_token_refreshed_in_the_background(server) -> None:
+    # The first token is refreshed a second after it is issued.
+    options = SheetsHTTPOptions(api_root=server.url, token_refresh_margin=3599, backoff_max=0.1)
+    executor = BoundedExecutor("sheets-test", 2, 10)
+    refreshed = SHEETS_TOKEN_REFRESHES.value("ok")
+    client = GoogleSheetsClient.create("unused.json", "sheet", executor=executor, http_options=options, credentials=_credentials(server))
+    try:
+        await client.append_row(["first"])
+        for _ in range(100):
+            if server.tokens_issued >= 2:
+                break
+            await asyncio.sleep(0.02)
+        server.token_lifetime = 36000  # no further refresh during the test
+        await asyncio.sleep(0.05)
+        await client.append_rows([["second"], ["third"]])
+    finally:
+        await client.close()
+        executor.shutdown()
+
+    assert server.appended == [["first"], ["second"], ["third"]]
+    appends = [request for request in server.requests if request[1].endswith(":append")]
+    assert [auth for *_, auth in appends] == ["Bearer token-1", f"Bearer token-{server.tokens_issued}"]
+    assert server.tokens_issued >= 2
+    assert SHEETS_TOKEN_REFRESHES.value("ok") >= refreshed + 1
+    assert len({port for _, _, port, _ in server.requests}) == 1
+
+
+def test_retries_429_and_5xx_with_jittered_backoff(server) -> None:
+    server.append_failures = [(429, {"Retry-After": "2"}), (408, {})]
+    options = SheetsHTTPOptions(api_root=server.url, max_retries=2, backoff_base=1.0)
+    credentials = _credentials(server)
+    sleeps: List[float] = []
+    http = SheetsHTTPClient(credentials, SheetsSession(credentials, options), options, sleep=sleeps.append, rng=lambda: 0.5)
+    retried = SHEETS_RETRIES.value("429") + SHEETS_RETRIES.value("408")
+
+    http.values_append("sheet", "Sheet1", {"valueInputOption": "RAW"}, {"values": [["row"]]})
+
+    assert server.appended == [["row"]]
+    assert sleeps == [2.0, 1.0]  # Retry-After, then half of base * 2**1
+    assert SHEETS_RETRIES.value("429") + SHEETS_RETRIES.value("408") == retried + 2
+
+    server.read_failures = [(503, {}), (502, {})]
+    assert http.fetch_sheet_metadata("sheet")["sheets"] == [_SHEET]
+    assert len(sleeps) == 4
+    server.read_failures = [(503, {}), (503, {}), (503, {})]
+    with pytest.raises(APIError):
+        http.fetch_sheet_metadata("sheet")
+
+    started = len(sleeps)
+    server.append_failures = [(503, {})]  # the rows may have been written: not resent
+    with pytest.raises(APIError):
+        http.values_append("sheet", "Sheet1", {"valueInputOption": "RAW"}, {"values": [["maybe"]]})
+    server.append_failures = [(400, {})]
+    with pytest.raises(APIError):
+        http.values_append("sheet", "Sheet1", {"valueInputOption": "RAW"}, {"values": [["bad"]]})
+    assert len(sleeps) == started  # client errors are not retried
+    http.session.close()
+
+
+def test_retry_after_is_honored_within_the_deadline(server) -> None:
+    options = SheetsHTTPOptions(api_root=server.url, connect_timeout=1, read_timeout=4, deadline=30, backoff_max=1)
+    credentials = _credentials(server)
+    sleeps: List[float] = []
+    http = SheetsHTTPClient(credentials, SheetsSession(credentials, options), options, sleep=sleeps.append)
+
+    server.append_failures = [(429, {"Retry-After": "20"})]
+    http.values_append("sheet", "Sheet1", {"valueInputOption": "RAW"}, {"values": [["row"]]})
+    assert sleeps == [20.0]  # not capped at backoff_max
+
+    server.append_failures = [(429, {"Retry-After": "40"})]
+    with pytest.raises(APIError):
+        http.values_append("sheet", "Sheet1", {"valueInputOption": "RAW"}, {"values": [["late"]]})
+    assert sleeps == [20.0]
+    assert server.appended == [["row"]]
+    http.session.close()
+
+
+def test_appends_are_not_resent_after_a_read_timeout(server) -> None:
+    server.append_delay = 0.5
+    options = SheetsHTTPOptions(api_root=server.url, read_timeout=0.2, max_retries=2)
+    credentials = _credentials(server)
+    sleeps: List[float] = []
+    http = SheetsHTTPClient(credentials, SheetsSession(credentials, options), options, sleep=sleeps.append)
+
+    with pytest.raises(Timeout):
+        http.values_append("sheet", "Sheet1", {"valueInputOption": "RAW"}, {"values": [["once"]]})
+    time.sleep(0.6)
+
+    assert sleeps == []
+    assert server.appended == [["once"]]  # written although the client gave up
+    http.session.close()
+
+
+@pytest.mark.asyncio
+async def test_replicator_checks_the_sheet_before_resending_a_timed_out_append(server, tmp_path) -> None:
+    server.append_delay = 0.3
+    options = SheetsHTTPOptions(api_root=server.url, read_timeout=0.1)
+    executor = BoundedExecutor("sheets-test", 2, 10)
+    client = GoogleSheetsClient.create("unused.json", "sheet", executor=executor, http_options=options, credentials=_credentials(server))
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    row = build_row({"first_name": "Ann"}, 7, "ann")
+    await outbox.add("k", row)
+    # The first retry comes 0.5-1 s later, once the timed-out append has landed.
+    replicator = SheetsReplicator(outbox, client, flush_interval=0, retry_base=1.0)
+    try:
+        replicator.start()
+        for _ in range(100):
+            if not await outbox.pending_count():
+                break
+            await asyncio.sleep(0.05)
+        server.append_delay = 0
+        await outbox.add("k2", build_row({"first_name": "Bob"}, 8, "bob"))
+        replicator.notify()
+        await replicator.close()
+    finally:
+        outbox.close()
+        await client.close()
+        executor.shutdown()
+
+    assert [appended[2] for appended in server.appended] == ["7", "8"]
+    assert len([request for request in server.requests if request[1].endswith(":append")]) == 2
+
+
+def test_connection_errors_are_retried_until_the_limit() -> None:
+    options = SheetsHTTPOptions(api_root="http://127.0.0.1:9", connect_timeout=0.5, max_retries=2)
+    credentials = Credentials("token")
+    sleeps: List[float] = []
+    http = SheetsHTTPClient(credentials, options=options, sleep=sleeps.append, rng=lambda: 1.0)
+    started = time.monotonic()
+    with pytest.raises(Exception):
+        http.fetch_sheet_metadata("sheet")
+    assert sleeps == [0.5, 1.0]
+    # Nothing reached the server, so an append is retried as well.
+    with pytest.raises(Exception):
+        http.values_append("sheet", "Sheet1", {"valueInputOption": "RAW"}, {"values": [["row"]]})
+    assert sleeps == [0.5, 1.0, 0.5, 1.0]
+    assert time.monotonic() - started < 5
+    http.session.close()
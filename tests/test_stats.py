@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import threading
+from types import SimpleNamespace
+
+import pytest
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+
+from services.google_sheets import HEADERS
+from services.outbox import Outbox
+from services.stats import SurveyStats
+from services.storage import SurveyStorage
+from tests.conftest import make_dispatcher, message_update
+
+
+def _row(region: str, rating: str) -> list:
+    row = [""] * len(HEADERS)
+    row[HEADERS.index("region")] = region
+    row[HEADERS.index("uni_rating")] = rating
+    return row
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(tmp_path / "outbox.sqlite3")
+    yield box
+    box.close()
+
+
+_keys = itertools.count()
+
+
+def _journal(outbox: Outbox, *rows: list) -> None:
+    for row in rows:
+        asyncio.run(outbox.add(f"k{next(_keys)}", row))
+
+
+def test_snapshot_then_replay_only_new_rows(outbox, tmp_path) -> None:
+    snapshot = tmp_path / "stats.json"
+    _journal(outbox, _row("a", "5"), _row("b", "3"))
+    stats = SurveyStats(snapshot)
+    assert stats.load(outbox.path) == 2
+    stats.snapshot()
+
+    _journal(outbox, _row("a", "1"))
+    restored = SurveyStats(snapshot)
+
+    assert restored.load(outbox.path) == 1
+    assert restored.report.total == 3
+    assert restored.report.regions == {"a": 2, "b": 1}
+    assert restored.report.mean_rating_by_region() == {"a": 3.0, "b": 3.0}
+
+
+def test_snapshot_ahead_of_journal_is_rebuilt(outbox, tmp_path) -> None:
+    snapshot = tmp_path / "stats.json"
+    stats = SurveyStats(snapshot)
+    for _ in range(5):
+        stats.add(_row("a", "5"))
+    stats.snapshot()
+    _journal(outbox, _row("b", "4"))
+
+    restored = SurveyStats(snapshot)
+    assert restored.load(outbox.path) == 1
+    assert restored.report.regions == {"b": 1}
+
+
+@pytest.mark.asyncio
+async def test_close_writes_pending_snapshot(tmp_path) -> None:
+    snapshot = tmp_path / "stats.json"
+    stats = SurveyStats(snapshot, snapshot_interval=3600)
+    stats.start()
+    stats.add(_row("a", "4"))
+    await stats.close()
+
+    restored = SurveyStats(snapshot)
+    restored.load(tmp_path / "missing.sqlite3")
+    assert restored.report.ratings == {"4": 1}
+
+
+@pytest.mark.asyncio
+async def test_snapshots_are_written_off_the_event_loop(tmp_path, monkeypatch) -> None:
+    threads = []
+    write = SurveyStats._write
+
+    def recording_write(self, payload) -> None:
+        threads.append(threading.current_thread())
+        write(self, payload)
+
+    monkeypatch.setattr(SurveyStats, "_write", recording_write)
+    stats = SurveyStats(tmp_path / "stats.json", snapshot_interval=0.01)
+    stats.start()
+    stats.add(_row("a", "4"))
+    await asyncio.sleep(0.1)
+    stats.add(_row("b", "5"))
+    await stats.close()
+
+    assert len(threads) >= 2
+    assert threading.main_thread() not in threads
+
+
+@pytest.mark.asyncio
+async def test_stats_command_answers_from_memory(bot) -> None:
+    stats = SurveyStats()
+    stats.add(_row("toshkent_shahri", "5"))
+    storage = SimpleNamespace(stats=stats, rejects=lambda *args: False)
+    dp = make_dispatcher(MemoryStorage())
+
+    await dp.feed_raw_update(bot, message_update(2, "/stats"), survey_storage=storage, admin_ids=frozenset({2}))
+
+    [answer] = [method for method in bot.session.requests if isinstance(method, SendMessage)]
+    assert "Responses: 1" in answer.text
+    assert "toshkent_shahri: 1 (avg 5.0)" in answer.text
+
+
+@pytest.mark.asyncio
+async def test_persist_updates_stats_once_per_journaled_row(outbox) -> None:
+    storage = SurveyStorage(outbox=outbox, replicator=SimpleNamespace(notify=lambda: None), stats=SurveyStats())
+    answers = {"region": "andijon", "uni_rating": 4, "is_employed": True}
+    await storage.persist(answers, 7, None)
+    await storage.persist(answers, 7, None)
+
+    assert storage.stats.report.total == 1
+    assert storage.stats.report.employment == {"employed": 1}
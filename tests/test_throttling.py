@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+from aiogram.types import Update, User
+
+from middlewares.throttling import OutboundRateLimiter, ThrottlingMiddleware
+from tests.conftest import FakeSession, callback_update
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def _handler(event, data):
+    return "handled"
+
+
+def _data(user_id: int) -> dict:
+    return {"event_from_user": User(id=user_id, is_bot=False, first_name="T")}
+
+
+@pytest.mark.asyncio
+async def test_user_is_limited_to_burst_then_rate() -> None:
+    clock = FakeClock()
+    middleware = ThrottlingMiddleware(rate=1.0, burst=3, clock=clock)
+
+    results = [await middleware(_handler, object(), _data(1)) for _ in range(10)]
+    assert results.count("handled") == 3
+
+    clock.now += 2
+    results = [await middleware(_handler, object(), _data(1)) for _ in range(10)]
+    assert results.count("handled") == 2
+    assert await middleware(_handler, object(), _data(2)) == "handled"
+
+
+@pytest.mark.asyncio
+async def test_idle_buckets_are_swept() -> None:
+    clock = FakeClock()
+    middleware = ThrottlingMiddleware(rate=1.0, burst=2, max_users=100, clock=clock)
+    for user_id in range(100):
+        await middleware(_handler, object(), _data(user_id))
+
+    clock.now += 10
+    await middleware(_handler, object(), _data(1000))
+    assert len(middleware._buckets) == 1
+
+
+@pytest.mark.asyncio
+async def test_new_users_cost_constant_time_when_nobody_is_idle() -> None:
+    clock = FakeClock()
+    middleware = ThrottlingMiddleware(rate=1.0, burst=5, max_users=1_000, clock=clock)
+
+    started = time.perf_counter()
+    for user_id in range(50_000):
+        await middleware(_handler, object(), _data(user_id))
+    elapsed = time.perf_counter() - started
+
+    assert len(middleware._buckets) == 1_000
+    assert list(middleware._buckets)[0] == 49_000
+    # A full scan per new user would take ~50M bucket checks here.
+    assert elapsed < 5
+
+
+@pytest.mark.asyncio
+async def test_dropped_button_presses_are_answered() -> None:
+    bot = Bot(token="42:TEST", session=FakeSession())
+    middleware = ThrottlingMiddleware(rate=1.0, burst=1, clock=FakeClock())
+    updates = [Update.model_validate(callback_update(1, "rating:5"), context={"bot": bot}) for _ in range(3)]
+
+    results = [await middleware(_handler, update, _data(1)) for update in updates]
+
+    assert results == ["handled", None, None]
+    answered = [method.callback_query_id for method in bot.session.requests if isinstance(method, AnswerCallbackQuery)]
+    assert answered == [update.callback_query.id for update in updates[1:]]
+
+
+@pytest.mark.asyncio
+async def test_load_many_users_flooding_concurrently() -> None:
+    """2 000 users each fire 25 updates at once: exactly ``burst`` per user get through."""
+    middleware = ThrottlingMiddleware(rate=1.0, burst=5, max_users=5_000)
+    handled = []
+
+    async def handler(event, data):
+        await asyncio.sleep(0)
+        handled.append(data["event_from_user"].id)
+
+    users, per_user = 2_000, 25
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(middleware(handler, object(), _data(user_id)) for user_id in range(users) for _ in range(per_user))
+    )
+    elapsed = time.perf_counter() - started
+
+    assert len(handled) == users * 5
+    assert middleware.dropped == users * (per_user - 5)
+    assert elapsed < 10
+
+
+@pytest.mark.asyncio
+async def test_outbound_limiter_paces_concurrent_calls() -> None:
+    bot = Bot(token="42:TEST", session=FakeSession())
+    bot.session.middleware(OutboundRateLimiter(rate=200, burst=10))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(bot.send_message(chat_id=idx, text="hi") for idx in range(60)))
+    elapsed = time.perf_counter() - started
+
+    assert len(bot.session.requests) == 60
+    assert elapsed >= (60 - 10) / 200 * 0.9
+
+
+@pytest.mark.asyncio
+async def test_outbound_limiter_retries_after_flood_control() -> None:
+    class FloodedSession(FakeSession):
+        async def make_request(self, bot, method, timeout=None):
+            if not self.requests:
+                self.requests.append(None)
+                raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+            return await super().make_request(bot, method, timeout)
+
+    bot = Bot(token="42:TEST", session=FloodedSession())
+    bot.session.middleware(OutboundRateLimiter(max_retries=1))
+
+    message = await bot(SendMessage(chat_id=1, text="hi"))
+
+    assert message.text == "hi"
+    assert len(bot.session.requests) == 2
@@ -0,0 +1,29 @@
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from tests.conftest import RecordingSurveyStorage, make_dispatcher, message_update
+from webhook import build_webhook_app
+
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_wrong_secret_and_processes_valid_updates(bot) -> None:
+    dp = make_dispatcher(MemoryStorage())
+    app = build_webhook_app(dp, bot, "/webhook", "s3cret", survey_storage=RecordingSurveyStorage())
+
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post(
+            "/webhook",
+            json=message_update(5, "/start"),
+            headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+        )
+        assert response.status == 401
+        assert bot.session.requests == []
+
+        response = await client.post(
+            "/webhook",
+            json=message_update(5, "/start"),
+            headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"},
+        )
+        assert response.status == 200
+        assert bot.session.requests[-1].text == "Tilni tanlang"
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret_token: str, **workflow_data: Any) -> web.Application:
+    """aiohttp application that feeds webhook updates to ``dp`` after checking the secret token.
+
+    Updates are processed before the response is sent, so Telegram redelivers
+    anything that was in flight when the process stopped.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=False,
+        secret_token=secret_token,
+        **workflow_data,
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot, **workflow_data)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config: Settings, **workflow_data: Any) -> None:
+    """Serve webhook updates until SIGINT/SIGTERM, then finish in-flight requests and stop."""
+    app = build_webhook_app(dp, bot, config.webhook_path, config.webhook_secret or "", **workflow_data)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.webhook_host, port=config.webhook_port)
+    await site.start()
+
+    await bot.set_webhook(
+        url=f"{config.webhook_url}{config.webhook_path}",
+        secret_token=config.webhook_secret,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=config.drop_pending_updates,
+    )
+    logger.info("Listening for webhook updates on %s:%s%s", config.webhook_host, config.webhook_port, config.webhook_path)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        await runner.cleanup()